@@ -1,15 +1,24 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, abort, g
 import os
 import shutil
+import uuid
 # 导入核心模块
-from core import svg_processor, renderer
-from core.data_manager import DataManager
+from core import simulation, svg_processor, renderer
+from core.geometry import MAX_PRECISION, check_precision
+from core.workspace import WorkspacePool, DEFAULT_ID
+from core.render_cache import RenderCache
+from core.metrics import Metrics
+from core.jobs import JobQueue
+from core.spatial_index import get_spatial_index
 
 app = Flask(__name__)
 
 # 配置文件夹
 UPLOAD_FOLDER = 'static/uploads'
-WORKSPACE_FOLDER = 'static/data_workspace' # 数据库存放位置
+WORKSPACE_FOLDER = 'static/data_workspace' # 数据库存放位置 (default 工作区)
+WORKSPACES_ROOT = 'static/workspaces'        # 其他工作区：<ID>/svg + <ID>/data
+# 数据存储后端：csv (默认，CSV + 编辑日志) 或 sqlite
+STORAGE_BACKEND = os.environ.get('MAPSTUDIO_STORAGE', 'csv')
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['WORKSPACE_FOLDER'] = WORKSPACE_FOLDER
@@ -19,89 +28,354 @@ for folder in [UPLOAD_FOLDER, WORKSPACE_FOLDER]:
     if not os.path.exists(folder):
         os.makedirs(folder, exist_ok=True)
 
-# 初始化数据管理器
-data_mgr = DataManager(WORKSPACE_FOLDER)
-# 确保工作区文件存在（即便为空）
-data_mgr.init_workspace()
+# 工作区缓存：按ID区分不同的地图，最近使用的常驻内存
+workspaces = WorkspacePool(WORKSPACES_ROOT, UPLOAD_FOLDER, WORKSPACE_FOLDER, backend=STORAGE_BACKEND)
+# 确保 default 工作区文件存在（即便为空）
+workspaces.get(DEFAULT_ID)
+
+# 渲染结果缓存 (按内容哈希命名，支持 ETag / gzip)；后台任务结果引用的键不清理
+render_cache = RenderCache(os.path.join(UPLOAD_FOLDER, 'renders'), pinned=lambda: jobs.result_keys())
+
+# 分阶段耗时统计 (Server-Timing 响应头 + /api/metrics)
+metrics = Metrics()
+
+# 后台任务队列：大文件的上传/导入/渲染不占用请求线程，前端轮询 /api/jobs/<ID>
+jobs = JobQueue(max_workers=int(os.environ.get('MAPSTUDIO_JOB_WORKERS', '2')))
+
+def cached_response(key, kind, mimetype):
+    """
+    返回缓存的渲染结果：GET/HEAD 的 If-None-Match 命中时回 304，其他方法回 412 (RFC 9110)，
+    客户端支持 gzip 时直接发送预压缩的内容
+    缓存文件在读取前被 (其他进程的) 清理删掉时返回 None，由调用方重新渲染或回 404
+    """
+    try:
+        if request.if_none_match.contains(key):
+            resp = Response(status=304 if request.method in ('GET', 'HEAD') else 412)
+        elif 'gzip' in request.accept_encodings:
+            resp = Response(render_cache.read(key, kind, compressed=True), mimetype=mimetype)
+            resp.headers['Content-Encoding'] = 'gzip'
+        else:
+            resp = Response(render_cache.read(key, kind, compressed=False), mimetype=mimetype)
+    except FileNotFoundError:
+        return None
+    resp.set_etag(key)
+    resp.headers['Vary'] = 'Accept-Encoding'
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+def request_timer(endpoint):
+    """本次请求的分阶段计时；没走到 timer.finish 的响应 (参数错误、处理失败) 由 record_timing 补记"""
+    g.timer = metrics.timer(endpoint)
+    return g.timer
+
+@app.after_request
+def record_timing(resp):
+    """失败的请求同样计入耗时统计 (计数器 errors)，并带上 Server-Timing 头"""
+    timer = g.pop('timer', None)
+    if timer is not None and not timer.recorded:
+        if resp.status_code >= 400:
+            timer.count('errors')
+        timer.finish(resp)
+    return resp
+
+def current_workspace():
+    """本次请求的工作区：X-Workspace 头 或 workspace 参数，缺省为 default"""
+    ws_id = request.headers.get('X-Workspace') or request.values.get('workspace') or DEFAULT_ID
+    try:
+        return workspaces.get(ws_id)
+    except ValueError:
+        abort(400)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
-# === 核心处理接口：上传文件并初始化 ===
-@app.route('/api/process', methods=['POST'])
-def process_map():
-    try:
-        # 1. 获取上传的文件 (如果有的话)
-        # 注意：v3.0支持只上传SVG，数据复用之前工作区的
-        svg_file = request.files.get('svg_file')
-        csv_file = request.files.get('csv_file') # 这是旧版格式的CSV
-        
-        map_title = request.form.get('map_title', '选情地图')
-        stroke_width = request.form.get('stroke_width', '1.0')
+class ProcessError(Exception):
+    """处理流程中可预期的失败：提示信息 + HTTP 状态码"""
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
 
-        # 2. 处理 SVG
-        # 如果用户传了新SVG，就清洗并覆盖；没传就用旧的 cleaned.svg
-        cleaned_svg_path = os.path.join(app.config['UPLOAD_FOLDER'], 'cleaned.svg')
-        
+def upload_tmp(path):
+    """上传文件的临时路径；排队中的任务可能很多，所以每次上传都用新的随机名字"""
+    return f'{path}.{uuid.uuid4().hex[:12]}.tmp'
+
+def run_process(ws, timer, raw_svg_path, temp_csv_path, map_title, stroke_width, precision, job=None):
+    """
+    清洗 -> 导入 -> 渲染 的完整流程 (同步请求和后台任务共用)
+    raw_svg_path / temp_csv_path: 已保存的上传文件 (临时文件)，没有上传时为 None
+    job: 后台任务，传入时同步汇报进度，并在各阶段之间检查是否被取消
+    :return: {'key', 'etag', 'download_url', 'result_url', 'svg_size', 'import'}
+    :raises ProcessError
+    """
+    data_mgr = ws.data
+    svg_size = None
+    import_report = None
+
+    def report(**progress):
+        ws.progress.update(progress)
+        if job is not None:
+            job.update(**progress)
+
+    def check():
+        if job is not None:
+            job.check()
+
+    # 2. 处理 SVG
+    # 如果用户传了新SVG，就清洗并覆盖；没传就用旧的 cleaned.svg
+    cleaned_svg_path = ws.cleaned_svg
+
+    if raw_svg_path:
+        # 清洗 (流式，边清洗边汇报进度)
+        def on_progress(done, total, districts):
+            report(stage='cleaning', done=done, total=total, districts=districts)
+
+        try:
+            with timer('clean'):
+                success_clean, _ = svg_processor.clean_and_extract_ids(raw_svg_path, cleaned_svg_path, on_progress, precision)
+        finally:
+            ws.progress['stage'] = 'idle'
+        check()
+        if not success_clean:
+            raise ProcessError('SVG清洗失败')
+        # 清洗完就建好空间索引，第一次框选不用再等
+        with timer('spatial_index'):
+            get_spatial_index(cleaned_svg_path)
+        svg_size = {'before': os.path.getsize(raw_svg_path), 'after': os.path.getsize(cleaned_svg_path)}
+        timer.count('svg_bytes_in', svg_size['before'])
+        timer.count('svg_bytes_cleaned', svg_size['after'])
+        os.replace(raw_svg_path, ws.raw_svg)
+    elif not os.path.exists(cleaned_svg_path):
+        raise ProcessError('请先上传 SVG 文件', 400)
+
+    # 3. 处理数据 (导入逻辑)
+    if temp_csv_path:
+        # 如果用户传了CSV，说明要导入新数据（覆盖数据库）
+        # 调用 DataManager 拆解并导入 (流式，边导入边汇报进度)
+        def on_import_progress(done, total, rows, errors):
+            report(stage='importing', done=done, total=total, districts=rows, errors=errors)
+
+        try:
+            with timer('import'):
+                success_import, msg = data_mgr.import_from_legacy_v2(temp_csv_path, on_import_progress)
+        finally:
+            ws.progress['stage'] = 'idle'
+        os.replace(temp_csv_path, ws.import_csv)
+        if not success_import:
+            raise ProcessError(f'数据导入失败: {msg}')
+        # 坏行明细留在进度信息里，前端按需获取
+        import_report = data_mgr.last_import
+        ws.progress['import'] = import_report
+        timer.count('import_rows', import_report['rows'])
+    check()
+
+    # 4. 计算渲染键：几何、数据、标题、描边都没变时，结果必然相同
+    with timer('digest'):
+        key = RenderCache.key_for(svg_processor.file_digest(cleaned_svg_path), data_mgr.data_digest(),
+                                  map_title, stroke_width)
+
+    if not render_cache.has(key):
+        # 5. 获取渲染所需数据 (从数据库读取)
+        # 无论是否刚上传了CSV，现在都统一从 DataManager 获取标准化数据
+        if job is not None:
+            job.update(stage='rendering')
+        with timer('join'):
+            district_data, party_colors, party_seats = data_mgr.get_joined_data()
+        timer.count('districts', len(district_data))
+        check()
+
+        # 6. 渲染 (含写盘)
+        with timer('render'):
+            success_render, msg = renderer.render_map_from_data(
+                cleaned_svg_path, 
+                render_cache.svg_path(key), 
+                district_data, 
+                party_colors, 
+                party_seats,
+                map_title, 
+                stroke_width
+            )
+        if not success_render:
+            raise ProcessError(f'渲染失败: {msg}')
+
+        # 回读 + 预压缩
+        with timer('cache'):
+            render_cache.put(key, {
+                'status': 'success',
+                'etag': key,
+                'download_url': f'/api/render/{key}.svg'
+            })
+    else:
+        render_cache.touch(key)
+        timer.count('cache_hits')
+
+    return {
+        'key': key,
+        'etag': key,
+        'download_url': f'/api/render/{key}.svg',
+        'result_url': f'/api/render/{key}.json',
+        'svg_size': svg_size,
+        'import': import_report,
+    }
+
+def save_uploads(ws, timer):
+    """把本次请求上传的 SVG / CSV 存成临时文件，返回 (svg路径, csv路径, 清理函数)"""
+    svg_file = request.files.get('svg_file')
+    csv_file = request.files.get('csv_file') # 这是旧版格式的CSV
+    raw_svg_path = upload_tmp(ws.raw_svg) if svg_file else None
+    temp_csv_path = upload_tmp(ws.import_csv) if csv_file else None
+    with timer('upload'):
         if svg_file:
-            raw_svg_path = os.path.join(app.config['UPLOAD_FOLDER'], 'raw.svg')
             svg_file.save(raw_svg_path)
-            # 清洗
-            success_clean, _ = svg_processor.clean_and_extract_ids(raw_svg_path, cleaned_svg_path)
-            if not success_clean:
-                return jsonify({'error': 'SVG清洗失败'}), 500
-        elif not os.path.exists(cleaned_svg_path):
-            return jsonify({'error': '请先上传 SVG 文件'}), 400
-
-        # 3. 处理数据 (导入逻辑)
         if csv_file:
-            # 如果用户传了CSV，说明要导入新数据（覆盖数据库）
-            temp_csv_path = os.path.join(app.config['UPLOAD_FOLDER'], 'import_temp.csv')
             csv_file.save(temp_csv_path)
-            # 调用 DataManager 拆解并导入
-            success_import, msg = data_mgr.import_from_legacy_v2(temp_csv_path)
-            if not success_import:
-                return jsonify({'error': f'数据导入失败: {msg}'}), 500
 
-        # 4. 获取渲染所需数据 (从数据库读取)
-        # 无论是否刚上传了CSV，现在都统一从 DataManager 获取标准化数据
-        district_data, party_colors, party_seats = data_mgr.get_joined_data()
+    def cleanup():
+        # 正常完成时临时文件已被移走，这里只清理失败/取消留下的
+        for path in (raw_svg_path, temp_csv_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+    return raw_svg_path, temp_csv_path, cleanup
 
-        # 5. 渲染
-        final_svg_path = os.path.join(app.config['UPLOAD_FOLDER'], 'final_result.svg')
-        
-        success_render, msg = renderer.render_map_from_data(
-            cleaned_svg_path, 
-            final_svg_path, 
-            district_data, 
-            party_colors, 
-            party_seats,
-            map_title, 
-            stroke_width
-        )
-
-        if success_render:
-            with open(final_svg_path, 'r', encoding='utf-8') as f:
-                svg_content = f.read()
-            
-            return jsonify({
-                'status': 'success',
-                'svg_content': svg_content, 
-                'download_url': f'/static/uploads/final_result.svg'
-            })
-        else:
-            return jsonify({'error': f'渲染失败: {msg}'}), 500
+def process_params():
+    map_title = request.form.get('map_title', '选情地图')
+    stroke_width = request.form.get('stroke_width', '1.0')
+    # 坐标精度 (小数位数)，留空则不压缩路径
+    precision = request.form.get('precision', '').strip()
+    if not precision:
+        return map_title, stroke_width, None
+    try:
+        precision = int(precision)
+        check_precision(precision)
+    except ValueError:
+        raise ProcessError(f'坐标精度必须是 0-{MAX_PRECISION} 的整数', 400)
+    return map_title, stroke_width, precision
+
+# === 核心处理接口：上传文件并初始化 ===
+@app.route('/api/process', methods=['POST'])
+def process_map():
+    """
+    上传 (可选) + 渲染；表单带 async=1 时放进后台任务队列，立即返回 202 和任务ID
+    注意：v3.0支持只上传SVG，数据复用之前工作区的
+    """
+    if request.form.get('async') == '1':
+        return submit_process_job()
+    timer = request_timer('process')
+    cleanup = None
+    try:
+        ws = current_workspace()
+        # 1. 获取上传的文件 (如果有的话)，每个请求先存到自己的临时文件，并发上传互不覆盖
+        raw_svg_path, temp_csv_path, cleanup = save_uploads(ws, timer)
+        try:
+            params = process_params()
+            result = run_process(ws, timer, raw_svg_path, temp_csv_path, *params)
+        except ProcessError as e:
+            return jsonify({'error': str(e)}), e.status
+
+        if request.form.get('reference') == '1':
+            # 只返回结果引用，客户端再用 GET result_url + If-None-Match 取正文 (未变化时 304)
+            return timer.finish(jsonify(result))
+        with timer('respond'):
+            resp = cached_response(result['key'], 'json', 'application/json')
+            if resp is None:
+                # 渲染结果刚被其他请求清理掉：上传已经落盘，按工作区现有文件重新渲染一次
+                try:
+                    retry = run_process(ws, timer, None, None, *params)
+                except ProcessError as e:
+                    return jsonify({'error': str(e)}), e.status
+                resp = cached_response(retry['key'], 'json', 'application/json')
+                if resp is None:
+                    return jsonify({'error': '渲染结果已被清理，请重试'}), 503
+        if result['svg_size']:
+            resp.headers['X-SVG-Bytes'] = f"{result['svg_size']['before']},{result['svg_size']['after']}"
+        if result['import']:
+            resp.headers['X-Import-Rows'] = f"{result['import']['rows']},{result['import']['error_count']}"
+        return timer.finish(resp)
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if cleanup:
+            cleanup()
+
+def submit_process_job():
+    """把上传 + 渲染放进后台任务；同一工作区参数完全相同且还没完成的任务只执行一次"""
+    timer = request_timer('job_submit')
+    try:
+        ws = current_workspace()
+        try:
+            params = process_params()
+        except ProcessError as e:
+            return jsonify({'error': str(e)}), e.status
+        raw_svg_path, temp_csv_path, cleanup = save_uploads(ws, timer)
+        # 去重键：工作区 + 上传内容 + 渲染参数 + 数据版本
+        key = ('process', ws.id,
+               svg_processor.file_digest(raw_svg_path) if raw_svg_path else None,
+               svg_processor.file_digest(temp_csv_path) if temp_csv_path else None,
+               ws.data.version) + params
+
+        def work(job):
+            job_timer = metrics.timer('process_job')
+            try:
+                return run_process(ws, job_timer, raw_svg_path, temp_csv_path, *params, job=job)
+            except ProcessError as e:
+                raise RuntimeError(str(e))
+            finally:
+                job_timer.record()
+
+        job, created = jobs.submit('process', key, work, cleanup)
+        return timer.finish(jsonify({'status': job.status, 'job_id': job.id, 'deduplicated': not created})), 202
 
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status_api(job_id):
+    """后台任务的状态、进度和结果 (前端轮询)"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def job_cancel_api(job_id):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/render/<key>.json', methods=['GET'])
+def render_result_api(key):
+    """后台任务完成后取渲染结果 (与同步 /api/process 的响应体相同)"""
+    if not key.isalnum() or not render_cache.has(key):
+        abort(404)
+    resp = cached_response(key, 'json', 'application/json')
+    if resp is None:
+        abort(404)
+    return resp
+
+@app.route('/api/render/<key>.svg', methods=['GET'])
+def render_download_api(key):
+    if not key.isalnum() or not render_cache.has(key):
+        abort(404)
+    resp = cached_response(key, 'svg', 'image/svg+xml')
+    if resp is None:
+        abort(404)
+    resp.headers['Content-Disposition'] = 'attachment; filename=map_result.svg'
+    return resp
+
+@app.route('/api/process/progress', methods=['GET'])
+def process_progress_api():
+    return jsonify(current_workspace().progress)
+
 # === 选区编辑接口 ===
 @app.route('/api/district/<did>', methods=['GET'])
 def get_district_api(did):
-    data = data_mgr.get_district_detail(did)
+    data = current_workspace().data.get_district_detail(did)
     if data:
         return jsonify({'status': 'success', 'data': data})
     else:
@@ -110,6 +384,7 @@ def get_district_api(did):
 
 @app.route('/api/district/update', methods=['POST'])
 def update_district_api():
+    timer = request_timer('district_update')
     try:
         req = request.json
         did = req.get('district_id')
@@ -123,16 +398,49 @@ def update_district_api():
             seats = 1
 
         # 调用新的更新方法
-        data_mgr.update_district_data(did, seats, votes)
+        with timer('update'):
+            current_workspace().data.update_district_data(did, seats, votes)
+        timer.count('districts')
         
-        return jsonify({'status': 'success'})
+        return timer.finish(jsonify({'status': 'success'}))
         
     except Exception as e:
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
+
+@app.route('/api/district/bulk_update', methods=['POST'])
+def bulk_update_districts_api():
+    """
+    批量修正选区数据 (全部校验通过才写入，一个事务)
+    请求: {'records': [{'district_id', 'seats', 'votes', 'province_id', 'name', 'type'}, ...],
+           'create_missing': true}
+    """
+    timer = request_timer('district_bulk_update')
+    try:
+        req = request.json or {}
+        records = req.get('records')
+        if not isinstance(records, list) or not records:
+            return jsonify({'error': '参数缺失: records'}), 400
+
+        with timer('update'):
+            result = current_workspace().data.bulk_update_districts(
+                records, create_missing=bool(req.get('create_missing', True)))
+        if result['errors']:
+            return jsonify({'error': f"{len(result['errors'])} 行数据有误，未做任何修改",
+                            'errors': result['errors']}), 400
+        timer.count('districts', result['updated'])
+
+        return timer.finish(jsonify({'status': 'success', **result}))
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/batch/swing', methods=['POST'])
 def batch_swing_api():
+    timer = request_timer('batch_swing')
     try:
         req = request.json
         # 1. 获取前端传来的参数
@@ -153,17 +461,166 @@ def batch_swing_api():
             return jsonify({'error': '数值格式错误'}), 400
         
         # 4. 调用逻辑核心
-        success = data_mgr.batch_swing_update(district_ids, party_id, swing_rate, lock_total)
+        with timer('swing'):
+            summary = current_workspace().data.batch_swing_update(district_ids, party_id, swing_rate, lock_total)
+        timer.count('districts', summary['changed'])
         
-        if success:
-            return jsonify({'status': 'success'})
+        if summary['changed']:
+            return timer.finish(jsonify({'status': 'success', 'summary': summary}))
         else:
-            return jsonify({'status': 'no_change', 'message': '没有数据被改变'}), 200
+            return timer.finish(jsonify({'status': 'no_change', 'message': '没有数据被改变', 'summary': summary})), 200
             
     except Exception as e:
         import traceback
         traceback.print_exc() # 在后台打印详细报错，方便调试
         return jsonify({'error': str(e)}), 500
+@app.route('/api/simulate', methods=['POST'])
+def simulate_api():
+    """
+    蒙特卡洛模拟；iterations 按请求执行 (1-MAX_ITERATIONS，超出返回 400)
+    带 async=true 时放进后台任务队列，立即返回 202 和任务ID (次数多、选区多时用)
+    """
+    try:
+        req = request.json
+        party_id = req.get('party_id')
+        if not party_id:
+            return jsonify({'error': '参数缺失: 需选择政党'}), 400
+
+        # 前端传百分数 (5.5 代表 5.5%)
+        try:
+            swing_rate = float(req.get('percent', 0)) / 100.0
+            noise_sd = float(req.get('noise', 0)) / 100.0
+            iterations = int(req.get('iterations', 1000))
+            seed = req.get('seed')
+            seed = int(seed) if seed is not None else None
+            province_swing = {k: float(v) / 100.0 for k, v in (req.get('province_swing') or {}).items()}
+        except (ValueError, TypeError, AttributeError):
+            return jsonify({'error': '数值格式错误'}), 400
+        if not 1 <= iterations <= simulation.MAX_ITERATIONS:
+            return jsonify({'error': f'模拟次数必须在 1-{simulation.MAX_ITERATIONS} 之间'}), 400
+
+        data = current_workspace().data
+        args = (party_id, swing_rate, noise_sd, iterations, seed, province_swing, req.get('lock_total', True))
+        if req.get('async'):
+            def work(job):
+                result = data.simulate(*args)
+                if result is None:
+                    raise RuntimeError('政党不存在')
+                return result
+
+            job, _ = jobs.submit('simulate', None, work)
+            return jsonify({'status': job.status, 'job_id': job.id}), 202
+
+        result = data.simulate(*args)
+        if result is None:
+            return jsonify({'error': '政党不存在'}), 400
+        return jsonify({'status': 'success', 'result': result})
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+@app.route('/api/tipping/<party_id>', methods=['GET'])
+def tipping_api(party_id):
+    """统一摇摆 percent% 时的预计席位 + 离翻转最近的 n 个选区 (滑条实时预览用)"""
+    try:
+        try:
+            swing_rate = float(request.args.get('percent', 0)) / 100.0
+            count = min(max(int(request.args.get('n', 10)), 0), 500)
+        except (ValueError, TypeError):
+            return jsonify({'error': '数值格式错误'}), 400
+
+        result = current_workspace().data.tipping_point(party_id, swing_rate, count)
+        if result is None:
+            return jsonify({'error': '政党不存在'}), 400
+        # 阈值换回百分数给前端
+        for d in result['closest']:
+            d['swing'] = round(d['swing'] * 100, 3)
+        return jsonify({'status': 'success', 'result': result})
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+@app.route('/api/summary', methods=['GET'])
+def summary_api():
+    """全国 + 分省汇总：各党票数、得票率、席位、赢下选区数、平均领先幅度 (?province=XX 只看一省)"""
+    try:
+        result = current_workspace().data.get_summary(request.args.get('province') or None)
+        return jsonify({'status': 'success', 'result': result})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+@app.route('/api/select', methods=['POST'])
+def select_api():
+    """
+    [框选 / 套索] 按地图坐标 (SVG 用户坐标) 选出选区，结果可直接作为 /api/batch/swing 的 district_ids
+    请求: {"rect": [x0, y0, x1, y1]} 或 {"polygon": [[x, y], ...]}，可选 "mode": center | within | intersects
+    """
+    timer = request_timer('select')
+    try:
+        req = request.json or {}
+        mode = req.get('mode', 'center')
+        rect = req.get('rect')
+        polygon = req.get('polygon')
+        if rect is None and polygon is None:
+            return jsonify({'error': '参数缺失: 需提供 rect 或 polygon'}), 400
+
+        with timer('index'):
+            index = get_spatial_index(current_workspace().cleaned_svg)
+        if index is None:
+            return jsonify({'error': '还没有清洗过的地图 (或地图缺少选区索引，请重新上传 SVG)'}), 400
+
+        try:
+            with timer('query'):
+                if rect is not None:
+                    if len(rect) != 4:
+                        raise ValueError('rect 需要 4 个数: x0, y0, x1, y1')
+                    ids = index.query_rect([float(v) for v in rect], mode)
+                else:
+                    ids = index.query_polygon(polygon, mode)
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': f'选择范围无效: {e}'}), 400
+        timer.count('districts', len(ids))
+
+        return timer.finish(jsonify({'status': 'success', 'district_ids': ids, 'count': len(ids)}))
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+@app.route('/api/metrics', methods=['GET'])
+def metrics_api():
+    """各接口分阶段耗时的滚动分位数 (毫秒) 和计数器"""
+    return jsonify(metrics.snapshot())
+@app.route('/api/data/export', methods=['POST'])
+def export_csv_api():
+    """把当前数据写回工作区的三张 CSV，方便用 Excel 打开"""
+    try:
+        current_workspace().data.export_csv()
+        return jsonify({'status': 'success'})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/data/import', methods=['POST'])
+def import_csv_api():
+    """(SQLite 后端) 用 Excel 改过的三张 CSV 覆盖数据库"""
+    try:
+        current_workspace().data.import_csv()
+        return jsonify({'status': 'success'})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/workspaces', methods=['GET'])
+def workspaces_api():
+    """列出所有工作区，以及当前载入内存的工作区 (按最近使用排序)"""
+    ids, loaded = workspaces.list_ids()
+    return jsonify({'workspaces': ids, 'loaded': loaded})
 if __name__ == '__main__':
     print("正在启动 MapStudio Web v3.0...")
     print("请在浏览器访问: http://127.0.0.1:5000")
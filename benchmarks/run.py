@@ -0,0 +1,219 @@
+"""
+[性能测试] 在 1k / 10k / 100k 规模的合成数据上计时各阶段，并记录峰值内存
+
+用法 (在项目根目录运行)：
+    python -m benchmarks.run                          # 默认 1000,10000,100000
+    python -m benchmarks.run --sizes 1000,10000 --out bench.json
+    python -m benchmarks.run --compare bench_old.json # 与上次的结果对比
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import renderer, svg_processor
+from core.spatial_index import SpatialIndex
+from core.data_manager import DataManager
+from benchmarks.synthetic import district_id, generate_legacy_csv, generate_svg
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+
+def _measure(fn, memory):
+    """执行一次 fn，返回 (耗时秒, 峰值内存MB 或 None)"""
+    gc.collect()
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        fn()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1048576 if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return elapsed, peak
+
+
+def run_size(n, work_dir, n_parties, n_provinces, repeat, memory, seed, backend='csv'):
+    """在 n 个选区的数据上跑完整流程，返回 {阶段名: {'seconds', 'peak_mb'}}"""
+    base = os.path.join(work_dir, f'n{n}')
+    shutil.rmtree(base, ignore_errors=True)
+    os.makedirs(base)
+    raw_svg = os.path.join(base, 'raw.svg')
+    cleaned_svg = os.path.join(base, 'cleaned.svg')
+    legacy_csv = os.path.join(base, 'legacy.csv')
+    output_svg = os.path.join(base, 'final_result.svg')
+    workspace = os.path.join(base, 'workspace')
+
+    svg_bytes = generate_svg(raw_svg, n, n_provinces, seed)
+    csv_bytes = generate_legacy_csv(legacy_csv, n, n_parties, n_provinces, seed)
+
+    rng = random.Random(seed)
+    some_ids = [district_id(i) for i in rng.sample(range(n), max(1, n // 10))]
+    all_ids = [district_id(i) for i in range(n)]
+    state = {}
+
+    def clean():
+        svg_processor.clean_and_extract_ids(raw_svg, cleaned_svg)
+
+    def import_csv():
+        state['dm'] = DataManager(workspace, backend)
+        state['dm'].import_from_legacy_v2(legacy_csv)
+
+    def join_cold():
+        # 新实例：包含从 CSV 载入内存的时间
+        state['dm'] = DataManager(workspace, backend)
+        state['joined'] = state['dm'].get_joined_data()
+
+    def join_warm():
+        state['joined'] = state['dm'].get_joined_data()
+
+    def render(cold):
+        def fn():
+            if cold:
+                renderer._template_cache.clear()
+            district_data, party_colors, party_seats = state['joined']
+            renderer.render_map_from_data(cleaned_svg, output_svg, district_data, party_colors,
+                                          party_seats, 'benchmark', '1.0')
+        return fn
+
+    def swing(ids, percent):
+        def fn():
+            state['dm'].batch_swing_update(ids, 'P_01', percent)
+        return fn
+
+    def update_one():
+        d_id = some_ids[0]
+        state['dm'].update_district_data(d_id, 1, {'P_02': rng.randint(1000, 30000)})
+
+    def compact():
+        state['dm'].compact()
+
+    def build_spatial_index():
+        state['spatial'] = SpatialIndex.from_index(svg_processor.load_index(cleaned_svg))
+
+    def select(kind):
+        # 地图中间约 1/10 面积的矩形 / 菱形套索
+        def fn():
+            x0, y0, x1, y1 = state['spatial'].root[0]
+            cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+            hw, hh = (x1 - x0) * 0.16, (y1 - y0) * 0.16
+            if kind == 'rect':
+                state['selected'] = state['spatial'].query_rect((cx - hw, cy - hh, cx + hw, cy + hh))
+            else:
+                diamond = [(cx - hw * 1.4, cy), (cx, cy - hh * 1.4), (cx + hw * 1.4, cy), (cx, cy + hh * 1.4)]
+                state['selected'] = state['spatial'].query_polygon(diamond)
+        return fn
+
+    # 按顺序执行：后面的阶段依赖前面的结果
+    stages = [
+        ('clean_svg', clean),
+        ('spatial_index', build_spatial_index),
+        ('select_rect', select('rect')),
+        ('select_lasso', select('lasso')),
+        ('import_legacy', import_csv),
+        ('join_cold', join_cold),
+        ('join_warm', join_warm),
+        ('render_cold', render(True)),
+        ('render_warm', render(False)),
+        ('swing_10pct', swing(some_ids, 0.02)),
+        ('swing_all', swing(all_ids, -0.01)),
+        ('join_after_swing', join_warm),
+        ('render_after_swing', render(False)),
+        ('update_district', update_one),
+        ('compact', compact),
+    ]
+
+    results = {}
+    for name, fn in stages:
+        times = []
+        for _ in range(repeat):
+            elapsed, _ = _measure(fn, False)
+            times.append(elapsed)
+        peak = _measure(fn, True)[1] if memory else None
+        results[name] = {'seconds': round(min(times), 6), 'peak_mb': round(peak, 3) if peak is not None else None}
+        print(f"  {name:<20} {min(times) * 1000:10.1f} ms" + (f"  {peak:8.1f} MB" if peak is not None else ''))
+
+    return {
+        'districts': n,
+        'parties': n_parties,
+        'svg_bytes': svg_bytes,
+        'cleaned_svg_bytes': os.path.getsize(cleaned_svg),
+        'csv_bytes': csv_bytes,
+        'stages': results,
+    }
+
+
+def compare(current, previous):
+    """打印与上次结果的耗时比值 (>1 表示变慢)"""
+    old_runs = {r['districts']: r for r in previous.get('runs', [])}
+    for run in current['runs']:
+        old = old_runs.get(run['districts'])
+        if old is None:
+            continue
+        print(f"\n对比 n={run['districts']} (当前 / 上次)")
+        for name, stage in run['stages'].items():
+            old_stage = old['stages'].get(name)
+            if not old_stage or not old_stage['seconds']:
+                continue
+            ratio = stage['seconds'] / old_stage['seconds']
+            flag = '  <-- 变慢' if ratio > 1.2 else ''
+            print(f"  {name:<20} {ratio:6.2f}x{flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='MapStudio 性能测试')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='选区数，逗号分隔')
+    parser.add_argument('--parties', type=int, default=6)
+    parser.add_argument('--provinces', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=1, help='每个阶段重复次数 (取最快一次)')
+    parser.add_argument('--no-memory', action='store_true', help='不测峰值内存 (tracemalloc 会额外跑一遍)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--backend', default='csv', choices=['csv', 'sqlite'])
+    parser.add_argument('--work-dir', default=None, help='生成文件的目录 (默认临时目录，结束后删除)')
+    parser.add_argument('--out', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help='上次结果的 JSON 文件')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='mapstudio_bench_')
+
+    report = {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'backend': args.backend,
+        'runs': [],
+    }
+    try:
+        for n in sizes:
+            print(f"n = {n}")
+            report['runs'].append(run_size(n, work_dir, args.parties, args.provinces,
+                                           max(1, args.repeat), not args.no_memory, args.seed,
+                                           args.backend))
+    finally:
+        if args.work_dir is None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {args.out}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+[并发压力测试] 多进程 × 多线程同时编辑同一个工作区，检查有没有丢失的修改
+
+每个写线程负责一组互不重叠的选区，反复把某个选区所有政党的票数写成同一个值 v，
+并随机触发压实；同时有读线程不停地读取，检查每一行都不是"写了一半"的状态。
+另外所有写线程 (跨进程) 都会对同一组共享选区反复做相同的批量摇摆 (读-改-写互相重叠)：
+摇摆是确定的，最终结果只取决于一共摇摆了几次，丢掉任何一次都会对不上。
+全部结束后用一个全新的 DataManager 从磁盘读回，核对每个选区都是它最后一次写入的值，
+共享选区等于把同一摇摆连续施加 (写线程总数 × --swings) 次的结果，且总票数不变。
+
+用法 (在项目根目录运行)：
+    python -m benchmarks.stress --processes 4 --threads 4 --edits 200
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.data_manager import DataManager
+from core.swing_engine import swing_row
+from benchmarks.synthetic import district_id, generate_legacy_csv
+
+# 共享选区的初始票数 (每党相同) 和每次摇摆的幅度
+SHARED_VOTES = 100000
+SHARED_SWING = 0.002
+
+
+def _writer(dm, party_ids, own_rows, edits, seed, expected, errors, shared_ids, swings):
+    rng = random.Random(seed)
+    # 共享选区的摇摆均匀穿插在普通编辑之间
+    swing_at = set(rng.sample(range(edits), min(swings, edits)))
+    try:
+        for k in range(edits):
+            i = rng.choice(own_rows)
+            value = seed * 1000000 + k + 1
+            dm.update_district_data(district_id(i), 1, {pid: value for pid in party_ids})
+            expected[i] = value
+            if k in swing_at:
+                dm.batch_swing_update(shared_ids, party_ids[0], SHARED_SWING)
+            if rng.random() < 0.02:
+                dm.compact()
+    except Exception as e:
+        errors.append(f'写入出错: {e!r}')
+
+
+def _reader(dm, n, stop, errors, counter):
+    """n: 独占选区数 (共享选区的各党票数不相同，不在这里检查)"""
+    rng = random.Random()
+    while not stop.is_set():
+        detail = dm.get_district_detail(district_id(rng.randrange(n)))
+        counts = {v['count'] for v in detail['votes']}
+        if len(counts) != 1:
+            errors.append(f'读到不一致的行: {detail}')
+            return
+        dm.get_joined_data()
+        counter[0] += 1
+
+
+def _process_main(workspace, backend, n, shared, worker_base, total_workers, threads, edits, swings, readers,
+                  result_queue):
+    """
+    一个进程：threads 个写线程 + readers 个读线程，共用一个 DataManager
+    第 w 个写线程 (全局编号) 负责行号 w, w + total_workers, w + 2 * total_workers ... (< n)
+    行号 n .. n + shared - 1 是所有写线程共享的选区
+    """
+    shared_ids = [district_id(i) for i in range(n, n + shared)]
+    dm = DataManager(workspace, backend)
+    party_ids = list(dm._get_store().party_ids)
+    errors = []
+    expected = [dict() for _ in range(threads)]
+    stop = threading.Event()
+    counter = [0]
+
+    reader_threads = [threading.Thread(target=_reader, args=(dm, n, stop, errors, counter)) for _ in range(readers)]
+    writer_threads = []
+    for t in range(threads):
+        w = worker_base + t
+        own_rows = list(range(w, n, total_workers))
+        writer_threads.append(threading.Thread(
+            target=_writer, args=(dm, party_ids, own_rows, edits, w + 1, expected[t], errors, shared_ids, swings)))
+
+    for th in reader_threads + writer_threads:
+        th.start()
+    for th in writer_threads:
+        th.join()
+    stop.set()
+    for th in reader_threads:
+        th.join()
+    dm.compact()
+
+    merged = {}
+    for e in expected:
+        merged.update(e)
+    result_queue.put((merged, errors, counter[0]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='工作区并发压力测试')
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4, help='每个进程的写线程数')
+    parser.add_argument('--readers', type=int, default=2, help='每个进程的读线程数')
+    parser.add_argument('--edits', type=int, default=200, help='每个写线程的编辑次数')
+    parser.add_argument('--districts', type=int, default=2000)
+    parser.add_argument('--shared', type=int, default=50, help='所有写线程共同摇摆的选区数 (取最后几个选区)')
+    parser.add_argument('--swings', type=int, default=10, help='每个写线程对共享选区的摇摆次数')
+    parser.add_argument('--backend', default='csv', choices=['csv', 'sqlite'])
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix='mapstudio_stress_')
+    try:
+        workspace = os.path.join(work_dir, 'workspace')
+        legacy_csv = os.path.join(work_dir, 'legacy.csv')
+        generate_legacy_csv(legacy_csv, args.districts)
+        dm = DataManager(workspace, args.backend)
+        dm.import_from_legacy_v2(legacy_csv)
+        # 每行各党票数先统一成 1，读线程据此判断有没有读到写了一半的行
+        party_ids = dm._get_store().party_ids
+        own = args.districts - args.shared
+        for i in range(own):
+            dm.update_district_data(district_id(i), 1, {pid: 1 for pid in party_ids})
+        for i in range(own, args.districts):
+            dm.update_district_data(district_id(i), 1, {pid: SHARED_VOTES for pid in party_ids})
+        dm.close()
+
+        total_workers = args.processes * args.threads
+        queue = multiprocessing.Queue()
+        start = time.perf_counter()
+        procs = [multiprocessing.Process(
+            target=_process_main,
+            args=(workspace, args.backend, own, args.shared, p * args.threads, total_workers, args.threads,
+                  args.edits, args.swings, args.readers, queue))
+            for p in range(args.processes)]
+        for proc in procs:
+            proc.start()
+        results = [queue.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+        elapsed = time.perf_counter() - start
+
+        expected = {}
+        errors = []
+        reads = 0
+        for merged, errs, count in results:
+            expected.update(merged)
+            errors.extend(errs)
+            reads += count
+
+        # 全新实例从磁盘读回，核对每个被编辑过的选区
+        store = DataManager(workspace, args.backend)._get_store()
+        lost = []
+        for i, value in expected.items():
+            row = store.row(store.index[district_id(i)]).tolist()
+            if set(row) != {value}:
+                lost.append((district_id(i), value, row))
+
+        # 共享选区：同一摇摆连续施加 total_workers × swings 次 (锁定总票数)
+        applied = total_workers * min(args.swings, args.edits)
+        shared_row = [SHARED_VOTES] * len(party_ids)
+        for _ in range(applied):
+            shared_row = swing_row(shared_row, 0, SHARED_SWING)
+        for i in range(own, args.districts):
+            row = store.row(store.index[district_id(i)]).tolist()
+            if row != shared_row or sum(row) != SHARED_VOTES * len(party_ids):
+                lost.append((district_id(i), shared_row, row))
+
+        total_edits = args.processes * args.threads * args.edits
+        print(f'{args.processes} 进程 × {args.threads} 写线程, 共 {total_edits} 次编辑, '
+              f'{reads} 次读取, 耗时 {elapsed:.2f} 秒')
+        for e in errors[:10]:
+            print('  ', e)
+        for d_id, value, row in lost[:10]:
+            print(f'   丢失的修改: {d_id} 应为 {value}, 实际 {row}')
+        if errors or lost:
+            print(f'失败: {len(errors)} 个错误, {len(lost)} 个选区丢失修改')
+            return 1
+        print(f'通过: {len(expected)} 个独占选区和 {args.shared} 个共享选区 ({applied} 次重叠摇摆) 的最终值全部正确')
+        return 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
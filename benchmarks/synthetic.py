@@ -0,0 +1,111 @@
+# [合成数据] 生成任意规模的测试地图和旧版 (v2.5) CSV，供性能测试使用
+# 地图结构与真实上传的文件一致：
+#   <g id="Province_xx" data-name="PRxx">      省份 (data-name 即 Province_ID)
+#     <g> 选区 path / polygon (ID 带 "-")  </g>  多一层嵌套 <g>
+#     <polyline id="Border_xx"/>               省界
+#   </g>
+#   <g id="空白_外国"> ... </g>                  不参与上色的空白区域
+
+import math
+import os
+import random
+
+
+def province_of(i, n_provinces):
+    return f'PR{i % n_provinces:02d}'
+
+
+def district_id(i):
+    return f'D-{i:06d}'
+
+
+def _hexagon(cx, cy, r, rng):
+    """稍微扰动的六边形顶点"""
+    pts = []
+    for k in range(6):
+        a = math.pi / 3 * k + math.pi / 6
+        rr = r * rng.uniform(0.85, 1.0)
+        pts.append((cx + rr * math.cos(a), cy + rr * math.sin(a)))
+    return pts
+
+
+def generate_svg(path, n_districts, n_provinces=20, seed=0):
+    """
+    生成 n_districts 个六边形选区的 SVG
+    三种写法交替出现：polygon、绝对坐标 path、相对坐标 path (部分带 transform)
+    :return: 文件字节数
+    """
+    rng = random.Random(seed)
+    cols = max(1, int(math.ceil(math.sqrt(n_districts))))
+    r = 10.0
+    width = cols * r * 1.8 + 20
+    height = (n_districts // cols + 1) * r * 1.6 + 20
+
+    by_province = [[] for _ in range(n_provinces)]
+    for i in range(n_districts):
+        by_province[i % n_provinces].append(i)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width:.0f} {height:.0f}" '
+                f'width="{width:.0f}" height="{height:.0f}">\n')
+        f.write('  <g id="空白_外国">\n')
+        f.write(f'    <path id="Blank_01" d="M 0 0 H {width:.0f} V 10 H 0 Z" fill="#eeeeee"/>\n')
+        f.write('  </g>\n')
+
+        for p, members in enumerate(by_province):
+            f.write(f'  <g id="Province_{p:02d}" data-name="{province_of(p, n_provinces)}">\n')
+            f.write('    <g>\n')
+            border = []
+            for i in members:
+                cx = 10 + (i % cols) * r * 1.8 + (r * 0.9 if (i // cols) % 2 else 0)
+                cy = 20 + (i // cols) * r * 1.6
+                pts = _hexagon(cx, cy, r, rng)
+                border.append((cx, cy))
+                d_id = district_id(i)
+                style = i % 3
+                if style == 0:
+                    text = ' '.join(f'{x:.6f},{y:.6f}' for x, y in pts)
+                    f.write(f'      <polygon id="{d_id}" points="{text}" fill="#cccccc"/>\n')
+                elif style == 1:
+                    text = ' L '.join(f'{x:.6f} {y:.6f}' for x, y in pts)
+                    f.write(f'      <path id="{d_id}" d="M {text} Z" fill="#cccccc"/>\n')
+                else:
+                    # 相对坐标，以第一个点为原点再平移回去
+                    x0, y0 = pts[0]
+                    rel = []
+                    px, py = 0.0, 0.0
+                    for x, y in pts[1:]:
+                        rel.append(f'{x - x0 - px:.6f},{y - y0 - py:.6f}')
+                        px, py = x - x0, y - y0
+                    f.write(f'      <path id="{d_id}" transform="translate({x0:.6f},{y0:.6f})" '
+                            f'd="m 0,0 l {" ".join(rel)} z" fill="#cccccc"/>\n')
+            f.write('    </g>\n')
+            if border:
+                step = max(1, len(border) // 50)
+                text = ' '.join(f'{x:.3f},{y:.3f}' for x, y in border[::step])
+                f.write(f'    <polyline id="Border_{p:02d}" points="{text}" fill="none" stroke="#000000"/>\n')
+            f.write('  </g>\n')
+        f.write('</svg>\n')
+    return os.path.getsize(path)
+
+
+def generate_legacy_csv(path, n_districts, n_parties=6, n_provinces=20, seed=0):
+    """
+    生成与 generate_svg 选区一一对应的 v2.5 单表 CSV
+    每区各党票数带一个随机的 "地区倾向"，保证赢家分布不平均
+    :return: 文件字节数
+    """
+    rng = random.Random(seed)
+    palette = ['#d32f2f', '#1565c0', '#2e7d32', '#f9a825', '#6a1b9a', '#00838f', '#5d4037', '#546e7a']
+    lean = [[rng.uniform(0.5, 1.5) for _ in range(n_parties)] for _ in range(n_provinces)]
+
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        meta = [f'政党{k + 1}:{palette[k % len(palette)]}' for k in range(n_parties)]
+        f.write('META,' + ','.join(meta) + '\n')
+        f.write('Province,District,' + ','.join(f'政党{k + 1}' for k in range(n_parties)) + '\n')
+        for i in range(n_districts):
+            p = i % n_provinces
+            votes = [int(rng.uniform(1000, 30000) * lean[p][k]) for k in range(n_parties)]
+            f.write(f'{province_of(p, n_provinces)},{district_id(i)},' + ','.join(map(str, votes)) + '\n')
+    return os.path.getsize(path)
@@ -0,0 +1,130 @@
+"""
+[命令行] 不启动 Flask，直接跑 清洗 -> 导入 -> 拼合 -> 渲染 (夜间批量出图用)
+
+用法 (在项目根目录运行)：
+    python cli.py render --workspace out/ws --svg map.svg --csv legacy.csv --out out/map.svg --title "2024年 大选"
+    python cli.py render --workspace out/ws --out out/map_thin.svg --stroke 0.5   # 复用已清洗的几何和已导入的数据
+    python cli.py batch --workspace out/ws --variants variants.json --out-dir out/maps --jobs 8
+
+各阶段的输入没变时自动跳过 (见 core.pipeline)，--force 强制全部重跑
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from core.batch_export import export_variants, load_variants
+from core.geometry import MAX_PRECISION
+from core.pipeline import Pipeline
+
+
+def _print_timings(timings):
+    for stage, seconds, skipped in timings:
+        print(f"  {stage:<10} " + ('     跳过 (输入未变)' if skipped else f"{seconds * 1000:10.1f} ms"))
+
+
+def cmd_render(args):
+    pipeline = Pipeline(args.workspace, args.backend)
+    start = time.perf_counter()
+    try:
+        if args.svg:
+            pipeline.clean(args.svg, args.precision, args.force)
+        if args.csv:
+            report = pipeline.import_csv(args.csv, args.force)
+            if report and report['error_count']:
+                print(f"导入时跳过了 {report['error_count']} 行错误数据:")
+                for e in report['errors'][:10]:
+                    print(f"  第 {e['line']} 行 {e['district_id']}: {e['error']}")
+        pipeline.render(args.out, args.title, args.stroke, args.force)
+    except RuntimeError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    finally:
+        pipeline.close()
+
+    _print_timings(pipeline.timings)
+    print(f"完成: {args.out} (共 {(time.perf_counter() - start) * 1000:.1f} ms)")
+    return 0
+
+
+def cmd_batch(args):
+    try:
+        variants = load_variants(args.variants)
+    except (OSError, ValueError) as e:
+        print(f"错误: 情景文件无效: {e}", file=sys.stderr)
+        return 1
+
+    pipeline = Pipeline(args.workspace, args.backend)
+    try:
+        if args.svg:
+            pipeline.clean(args.svg, args.precision, args.force)
+        if args.csv:
+            pipeline.import_csv(args.csv, args.force)
+        if not os.path.exists(pipeline.ws.cleaned_svg):
+            raise RuntimeError('工作区还没有清洗过的 SVG，请先指定 --svg')
+    except RuntimeError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    finally:
+        # 未压实的编辑写回磁盘，工作进程各自从磁盘载入
+        pipeline.close()
+    _print_timings(pipeline.timings)
+
+    report = export_variants(pipeline.ws.cleaned_svg, pipeline.ws.data.workspace, variants, args.out_dir,
+                             args.jobs, args.backend)
+
+    print(f"几何解析 {report['parse_seconds'] * 1000:.1f} ms, {report['jobs']} 个进程")
+    for r in report['variants']:
+        stages = ', '.join(f"{name} {sec * 1000:.1f} ms" for name, sec in r['stages'].items())
+        status = '' if r['ok'] else f"  失败: {r['message']}"
+        print(f"  {r['name']:<24} {r['seconds'] * 1000:10.1f} ms  ({stages}){status}")
+    print(f"完成 {report['maps']} 张 (失败 {report['failed']}), 共 {report['seconds']:.2f} 秒, "
+          f"{report['maps_per_sec']:.2f} 张/秒")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已保存到 {args.report}")
+    return 0 if report['failed'] == 0 else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='MapStudio 命令行出图')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('render', help='清洗 / 导入 (可选) 并渲染一张地图')
+    p.add_argument('--workspace', required=True, help='工作区目录 (保存清洗后的 SVG 和数据，可重复使用)')
+    p.add_argument('--svg', help='原始 SVG 地图 (省略则使用工作区里已清洗的几何)')
+    p.add_argument('--csv', help='旧版 v2.5 CSV 数据 (省略则使用工作区里的数据)')
+    p.add_argument('--out', required=True, help='输出 SVG 路径')
+    p.add_argument('--title', default='选情地图')
+    p.add_argument('--stroke', default='1.0', help='描边粗细 (pt)')
+    p.add_argument('--precision', type=int, default=None, help='坐标精度 (小数位数)，省略则不压缩')
+    p.add_argument('--backend', default='csv', choices=['csv', 'sqlite'])
+    p.add_argument('--force', action='store_true', help='忽略记录，所有阶段都重跑')
+    p.set_defaults(func=cmd_render)
+
+    p = sub.add_parser('batch', help='同一份几何批量渲染多个情景 (标题 / 描边 / 摇摆 / 席位视图)')
+    p.add_argument('--workspace', required=True, help='工作区目录')
+    p.add_argument('--variants', required=True, help='情景列表 JSON (格式见 core.batch_export.load_variants)')
+    p.add_argument('--out-dir', required=True, help='输出目录')
+    p.add_argument('--jobs', type=int, default=None, help='并行进程数 (默认 CPU 数)')
+    p.add_argument('--svg', help='原始 SVG 地图 (省略则使用工作区里已清洗的几何)')
+    p.add_argument('--csv', help='旧版 v2.5 CSV 数据 (省略则使用工作区里的数据)')
+    p.add_argument('--precision', type=int, default=None, help='坐标精度 (小数位数)，省略则不压缩')
+    p.add_argument('--backend', default='csv', choices=['csv', 'sqlite'])
+    p.add_argument('--force', action='store_true', help='清洗和导入忽略记录重跑')
+    p.add_argument('--report', default=None, help='把各情景耗时写入 JSON')
+    p.set_defaults(func=cmd_batch)
+
+    args = parser.parse_args(argv)
+    if getattr(args, 'precision', None) is not None and not 0 <= args.precision <= MAX_PRECISION:
+        parser.error(f'--precision 必须在 0-{MAX_PRECISION} 之间')
+    if args.command == 'render':
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
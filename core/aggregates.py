@@ -0,0 +1,127 @@
+from .seat_allocation import allocate, method_for
+
+
+class Totals:
+    """一个范围 (某省 / 全国) 内各党的累计量，按 votes.csv 的政党列顺序"""
+
+    __slots__ = ('districts', 'total_votes', 'votes', 'seats', 'won', 'margin_sum')
+
+    def __init__(self, p):
+        self.districts = 0            # 有效选区数 (有票且有席位)
+        self.total_votes = 0
+        self.votes = [0] * p          # 各党总票数
+        self.seats = [0] * p          # 各党席位 (按各选区的分配方法)
+        self.won = [0] * p            # 各党得票第一的选区数
+        self.margin_sum = [0.0] * p   # 各党赢下选区的领先幅度 (得票率差) 之和
+
+    def add(self, contribution, sign):
+        row, total, alloc, winner, margin = contribution
+        self.districts += sign
+        self.total_votes += sign * total
+        votes, seats = self.votes, self.seats
+        for j, v in enumerate(row):
+            votes[j] += sign * v
+        for j, n in enumerate(alloc):
+            if n:
+                seats[j] += sign * n
+        self.won[winner] += sign
+        self.margin_sum[winner] += sign * margin
+
+    def to_dict(self, party_ids, party_names):
+        parties = []
+        for j, pid in enumerate(party_ids):
+            won = self.won[j]
+            parties.append({
+                'Party_ID': pid,
+                'Name': party_names.get(pid, pid),
+                'votes': self.votes[j],
+                'share': self.votes[j] / self.total_votes if self.total_votes else 0.0,
+                'seats': self.seats[j],
+                'districts_won': won,
+                'avg_margin': self.margin_sum[j] / won if won else 0.0,
+            })
+        parties.sort(key=lambda x: (x['seats'], x['votes']), reverse=True)
+        return {
+            'districts': self.districts,
+            'total_votes': self.total_votes,
+            'seats': sum(self.seats),
+            'parties': parties,
+        }
+
+
+class Aggregates:
+    """
+    [分省 / 全国汇总] 各党总票数、席位、得票第一的选区数、平均领先幅度
+    每个选区对汇总的贡献可以单独减去再加回：改动 k 个选区只需 O(k × 政党数)，不必重新扫描全表
+    与 get_joined_data 口径一致：只统计有票且席位 > 0 的选区，得票最高者算"赢下"该选区
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.national = Totals(store.num_parties)
+        self.provinces = {}           # Province_ID -> Totals
+        self._methods = {}
+        for i, (seats, row) in enumerate(zip(store.seats, store.rows())):
+            self._add(store, i, 1, seats, row)
+
+    def _contribution(self, store, i, seats=None, row=None):
+        """
+        第 i 个选区的贡献 (票数行, 总票数, 席位分配, 赢家列号, 领先幅度)；无效选区返回 None
+        整表扫描时由调用方顺序传入 seats / row
+        """
+        if seats is None:
+            seats = store.seats[i]
+        if not store.has_votes[i] or seats <= 0:
+            return None
+        row = (store.row(i) if row is None else row).tolist()
+        total = sum(row)
+        if total <= 0:
+            return None
+        d_type = store.types[i]
+        method = self._methods.get(d_type)
+        if method is None:
+            method = self._methods[d_type] = method_for(d_type)
+        winner = row.index(max(row))
+        runner_up = max((v for j, v in enumerate(row) if j != winner), default=0)
+        margin = (row[winner] - runner_up) / total
+        return row, total, allocate(row, seats, method), winner, margin
+
+    def _add(self, store, i, sign, seats=None, row=None):
+        contribution = self._contribution(store, i, seats, row)
+        if contribution is None:
+            return
+        self.national.add(contribution, sign)
+        province = store.province_ids[i]
+        totals = self.provinces.get(province)
+        if totals is None:
+            totals = self.provinces[province] = Totals(store.num_parties)
+        totals.add(contribution, sign)
+        if sign < 0 and totals.districts == 0:
+            del self.provinces[province]
+
+    def rebase(self, store, rows):
+        """数据发布了新版本 (写时复制)：旧版本里这些行的贡献减掉，换成新版本的"""
+        old = self.store
+        for i in rows:
+            if i < len(old):
+                self._add(old, i, -1)
+        self.store = store
+        for i in rows:
+            self._add(store, i, 1)
+
+    def summary(self, province_id=None):
+        """
+        :param province_id: 只取某省；None 时返回全国 + 所有省份
+        :return: {'national': {...}, 'provinces': {Province_ID: {...}}}；省份不存在时 provinces 为空
+        """
+        store = self.store
+        party_names = store.party_names()
+        if province_id is not None:
+            totals = self.provinces.get(province_id)
+            provinces = {province_id: totals} if totals is not None else {}
+        else:
+            provinces = self.provinces
+        return {
+            'national': self.national.to_dict(store.party_ids, party_names),
+            'provinces': {pid: t.to_dict(store.party_ids, party_names) for pid, t in sorted(provinces.items())},
+        }
@@ -0,0 +1,156 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from . import renderer
+from .color_utils import seat_heatmap_color
+from .data_manager import DataManager
+
+# 每个工作进程的状态：DataManager 和清洗后的 SVG 路径 (由 _init_worker 设置)
+_worker = {}
+
+VIEWS = ('result', 'seats')
+
+
+def load_variants(path):
+    """
+    读取情景列表 (JSON 数组)，每项：
+        {"name": "p01_plus3",                 必填，也是默认的输出文件名
+         "title": "...", "stroke": "1.0",
+         "view": "result" | "seats",          选情图 / 席位热力图
+         "swing": {"party": "P_01", "percent": 3.0, "lock_total": true,
+                   "provinces": [...], "districts": [...]},   可选，只作用于副本
+         "output": "xxx.svg"}                 可选，相对输出目录
+    :raises ValueError: 格式不对
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        variants = json.load(f)
+    if not isinstance(variants, list):
+        raise ValueError('情景文件必须是 JSON 数组')
+    names = set()
+    for k, variant in enumerate(variants):
+        name = variant.get('name') if isinstance(variant, dict) else None
+        if not name:
+            raise ValueError(f'第 {k + 1} 个情景缺少 name')
+        if name in names:
+            raise ValueError(f'情景名重复: {name}')
+        names.add(name)
+        if variant.get('view', 'result') not in VIEWS:
+            raise ValueError(f'{name}: view 只能是 {"/".join(VIEWS)}')
+        swing = variant.get('swing')
+        if swing is None:
+            continue
+        if not (isinstance(swing, dict) and swing.get('party')):
+            raise ValueError(f'{name}: swing 需要指定 party')
+        try:
+            float(swing.get('percent', 0))
+        except (TypeError, ValueError):
+            raise ValueError(f'{name}: swing.percent 必须是数字')
+        for key in ('provinces', 'districts'):
+            if swing.get(key) is not None and not isinstance(swing[key], list):
+                raise ValueError(f'{name}: swing.{key} 必须是数组')
+    return variants
+
+
+def _init_worker(cleaned_svg, data_folder, backend):
+    _worker['dm'] = DataManager(data_folder, backend)
+    _worker['svg'] = cleaned_svg
+    # fork 出来的进程直接复用父进程已解析的模板；spawn 时每个进程解析一次
+    renderer.get_template(cleaned_svg)
+
+
+def render_variant(variant, output_path):
+    """
+    在当前 (工作) 进程里渲染一个情景
+    :return: {'name', 'output', 'ok', 'message', 'stages': {阶段: 秒}, 'seconds'}
+    """
+    dm = _worker['dm']
+    stages = {}
+    start = time.perf_counter()
+    result = {'name': variant['name'], 'output': output_path, 'ok': False, 'stages': stages}
+
+    store = None
+    swing = variant.get('swing')
+    if swing:
+        t = time.perf_counter()
+        scenario = dm.swing_scenario(swing['party'], float(swing.get('percent', 0)) / 100.0,
+                                     swing.get('districts'), swing.get('provinces'), swing.get('lock_total', True))
+        stages['swing'] = time.perf_counter() - t
+        if scenario is None:
+            result['message'] = f"政党不存在: {swing['party']}"
+            result['seconds'] = time.perf_counter() - start
+            return result
+        store, summary = scenario
+        result['swing'] = {'changed': summary['changed'], 'flipped': len(summary['flipped']),
+                           'seat_changes': summary['seat_changes']}
+
+    t = time.perf_counter()
+    district_data, party_colors, party_seats = dm.get_joined_data(store)
+    if variant.get('view') == 'seats':
+        for data in district_data.values():
+            data['color'] = seat_heatmap_color(data['seats'])
+    stages['join'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    ok, msg = renderer.render_map_from_data(_worker['svg'], output_path, district_data, party_colors, party_seats,
+                                            variant.get('title', '选情地图'), str(variant.get('stroke', '1.0')))
+    stages['render'] = time.perf_counter() - t
+
+    result.update(ok=ok, message=msg, seconds=time.perf_counter() - start)
+    return result
+
+
+def export_variants(cleaned_svg, data_folder, variants, out_dir, jobs=None, backend='csv'):
+    """
+    [批量出图] 同一份几何、多个情景：几何只解析一次，情景分给进程池并行渲染，每张图原子写入
+    :param jobs: 进程数 (默认 CPU 数)；1 表示在当前进程里顺序渲染
+    :return: {'maps', 'failed', 'seconds', 'maps_per_sec', 'parse_seconds', 'variants': [...]} (按输入顺序)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+    start = time.perf_counter()
+
+    # 先在父进程解析模板，fork 出的工作进程直接继承
+    t = time.perf_counter()
+    renderer.get_template(cleaned_svg)
+    parse_seconds = time.perf_counter() - t
+
+    outputs = [os.path.join(out_dir, v.get('output') or f"{v['name']}.svg") for v in variants]
+    # 描边相同的情景排在一起：同一进程里描边不变时只重绘有变化的选区
+    order = sorted(range(len(variants)), key=lambda k: str(variants[k].get('stroke', '1.0')))
+    results = [None] * len(variants)
+
+    def failed(k, e):
+        # 单个情景出错只记为失败，不中断整批 (顺序和并行两条路径一致)
+        return {'name': variants[k]['name'], 'output': outputs[k], 'ok': False,
+                'message': str(e), 'stages': {}, 'seconds': 0.0}
+
+    if jobs == 1 or len(variants) <= 1:
+        _init_worker(cleaned_svg, data_folder, backend)
+        for k in order:
+            try:
+                results[k] = render_variant(variants[k], outputs[k])
+            except Exception as e:
+                results[k] = failed(k, e)
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(variants)), initializer=_init_worker,
+                                 initargs=(cleaned_svg, data_folder, backend)) as pool:
+            futures = {k: pool.submit(render_variant, variants[k], outputs[k]) for k in order}
+            for k, future in futures.items():
+                try:
+                    results[k] = future.result()
+                except Exception as e:
+                    results[k] = failed(k, e)
+
+    elapsed = time.perf_counter() - start
+    done = sum(1 for r in results if r['ok'])
+    return {
+        'maps': done,
+        'failed': len(results) - done,
+        'seconds': elapsed,
+        'maps_per_sec': done / elapsed if elapsed > 0 else 0.0,
+        'parse_seconds': parse_seconds,
+        'jobs': jobs,
+        'variants': results,
+    }
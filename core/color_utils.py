@@ -1,5 +1,10 @@
 import colorsys
+from functools import lru_cache
 
+# 色阶量化精度：得票率按 1/RAMP_STEPS 分桶查表
+RAMP_STEPS = 1000
+
+@lru_cache(maxsize=256)
 def boost_saturation(hex_color):
     """将任意颜色转换为高饱和度、高亮度的版本"""
     hex_color = hex_color.lstrip('#')
@@ -36,4 +41,45 @@ def get_color_intensity(hex_color, ratio):
     final_g = int(base_g * strength + 255 * (1 - strength))
     final_b = int(base_b * strength + 255 * (1 - strength))
     
-    return f"#{final_r:02x}{final_g:02x}{final_b:02x}"
\ No newline at end of file
+    return f"#{final_r:02x}{final_g:02x}{final_b:02x}"
+
+
+@lru_cache(maxsize=256)
+def get_color_ramp(hex_color):
+    """
+    [色阶表] 某个政党颜色在各得票率分桶下的最终颜色 (长度 RAMP_STEPS + 1)
+    以颜色字符串为键缓存：parties.csv 里改了颜色，自然会生成新的色阶表
+    """
+    return tuple(get_color_intensity(hex_color, k / RAMP_STEPS) for k in range(RAMP_STEPS + 1))
+
+
+def rate_bucket(ratio):
+    """得票率 -> 色阶表下标"""
+    k = int(ratio * RAMP_STEPS + 0.5)
+    return 0 if k < 0 else (RAMP_STEPS if k > RAMP_STEPS else k)
+
+
+def ramp_colors(hex_colors, rates):
+    """
+    [整图上色] 一次性把 (政党颜色, 得票率) 两列映射成最终颜色列
+    每个政党只算一次色阶表，之后都是查表
+    """
+    ramps = {c: get_color_ramp(c) for c in set(hex_colors)}
+    return [ramps[c][rate_bucket(r)] for c, r in zip(hex_colors, rates)]
+
+
+def clear_color_cache():
+    """清空所有颜色缓存"""
+    boost_saturation.cache_clear()
+    get_color_ramp.cache_clear()
+
+
+# 席位热力图 (与前端 getSeatHeatmapColor 一致，金色系)
+SEAT_HEATMAP = ['#eeeeee', '#FFECB3', '#FFC107', '#FF8F00', '#D84315']
+
+
+def seat_heatmap_color(seats):
+    """席位数 -> 热力图颜色：0 席灰色，1/2/3 席由浅到深，4 席及以上深橙红"""
+    if seats <= 0:
+        return SEAT_HEATMAP[0]
+    return SEAT_HEATMAP[min(seats, 4)]
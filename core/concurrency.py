@@ -0,0 +1,126 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def unique_tmp(path):
+    """同目录下的临时文件名，带进程号和线程号，并发写同一目标时互不覆盖"""
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def fsync_file(path):
+    """把文件内容刷到磁盘 (写入方已关闭文件时，重新打开再 fsync)"""
+    fd = os.open(path, os.O_RDWR)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(path):
+    """把目录项 (rename / 新建) 刷到磁盘；Windows 不能打开目录，跳过"""
+    if os.name == 'nt':
+        return
+    fd = os.open(path or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def durable_replace(tmp_path, path):
+    """
+    断电安全的 rename：先 fsync 临时文件再替换，最后 fsync 所在目录
+    否则断电后可能 rename 已落盘而文件内容没有，留下空文件或半个文件
+    """
+    fsync_file(tmp_path)
+    os.replace(tmp_path, path)
+    fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+def atomic_write(path, writer, durable=True):
+    """
+    先写临时文件再 rename：读者要么看到旧文件，要么看到完整的新文件
+    writer(tmp_path) 负责写入内容
+    durable: 替换前后 fsync (见 durable_replace)，返回时新内容已落盘；
+             渲染结果、缓存这类随时能重新生成的文件可以传 False 省掉刷盘
+    """
+    tmp_path = unique_tmp(path)
+    try:
+        writer(tmp_path)
+        if durable:
+            durable_replace(tmp_path, path)
+        else:
+            os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class FileLock:
+    """
+    [跨进程读写锁] 基于锁文件的 flock (gunicorn 多 worker 时保护同一个工作区)
+    - shared():    读锁，多个进程可同时持有
+    - exclusive(): 写锁，与任何其他锁互斥
+    同一进程内的多个线程共用一个文件描述符，flock 无法区分它们，
+    所以调用方必须先持有进程内的锁；同一线程嵌套获取时只计数，不重复加锁
+    Windows 没有共享锁，shared() 退化为互斥锁
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+
+    def _acquire(self, exclusive):
+        if self._depth == 0:
+            if self._fd is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                while True:
+                    try:
+                        msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue  # LK_LOCK 重试 10 秒后仍拿不到会抛错，继续等
+        self._depth += 1
+
+    def _release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    @contextmanager
+    def shared(self):
+        self._acquire(False)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextmanager
+    def exclusive(self):
+        self._acquire(True)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def close(self):
+        if self._fd is not None and self._depth == 0:
+            os.close(self._fd)
+            self._fd = None
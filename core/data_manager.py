@@ -2,16 +2,374 @@ import csv
 import os
 import shutil
 import json # 如果以后要存配置可以用json，暂时用csv
+import atexit
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from .concurrency import FileLock, atomic_write, durable_replace, unique_tmp
+from .vote_store import VoteStore
+from .sqlite_store import SqliteStore
+from .snapshot import load_snapshot, write_snapshot
+from .swing_engine import apply_swing
+from .edit_journal import EditJournal
+from .seat_allocation import allocate, method_for
+from .aggregates import Aggregates
+from .simulation import run_simulation, snapshot_from_store
+from .tipping_index import TippingIndex
+
+# 日志压实：空闲 COMPACT_DELAY 秒后，或日志累积到 COMPACT_EVERY 条时，在后台写回 CSV
+COMPACT_DELAY = 5.0
+COMPACT_EVERY = 1000
+
+# 旧版大表流式导入：每批写入的行数，以及保留的错误明细条数
+IMPORT_CHUNK = 10000
+IMPORT_MAX_ERRORS = 100
+
+
+def _counting_lines(raw, counter):
+    """逐行解码二进制文件交给 csv.reader，同时把已读字节数记在 counter[0] (用于进度)"""
+    for k, line in enumerate(raw):
+        counter[0] += len(line)
+        yield line.decode('utf-8-sig' if k == 0 else 'utf-8')
+
+
+def _parse_count(cell):
+    """票数单元格 -> 非负整数；空格视为 0，允许千分位逗号和 "12.0"，其他情况返回 None"""
+    cell = cell.strip().replace(',', '')
+    if not cell:
+        return 0
+    try:
+        value = int(cell)
+    except ValueError:
+        try:
+            value = float(cell)
+        except ValueError:
+            return None
+        if not value.is_integer():
+            return None
+        value = int(value)
+    return value if value >= 0 else None
 
 class DataManager:
-    def __init__(self, workspace_path):
+    def __init__(self, workspace_path, backend='csv'):
+        """
+        :param backend: 'csv' (默认) 三张 CSV + 编辑日志；
+                        'sqlite' 数据存在 workspace.sqlite，CSV 只作为与 Excel 交换的导入/导出格式
+        """
         self.workspace = workspace_path
         self.files = {
             'districts': os.path.join(workspace_path, 'districts.csv'),
             'parties': os.path.join(workspace_path, 'parties.csv'),
             'votes': os.path.join(workspace_path, 'votes.csv')
         }
-        
+        # CSV 后端的二进制快照 (见 snapshot)：与 CSV 时间戳一致时直接 mmap 载入，不用解析 CSV
+        self.snapshot_path = os.path.join(workspace_path, 'workspace.snap')
+
+        # 内存数据库：首次访问时从 CSV + 编辑日志 载入，之后所有读写都走内存
+        # 并发模型 (写时复制)：
+        #   - _store 是已发布的版本，发布后不再修改；读者直接拿来用，不加锁
+        #   - 写者持有进程内写锁 + 跨进程文件写锁，在副本上修改，写完日志后再发布
+        self._store = None
+        self._version = 0
+        self._mtimes = None
+        self._db = SqliteStore(os.path.join(workspace_path, 'workspace.sqlite')) if backend == 'sqlite' else None
+        self._db_version = None
+        self._journal = EditJournal(os.path.join(workspace_path, 'edits.journal'))
+        self._file_lock = FileLock(os.path.join(workspace_path, '.lock'))
+        self._compact_timer = None
+        self._digest = None      # (版本对象, 哈希)
+        self._tipping = None     # 临界点索引，首次查询时建立
+        self._tipping_lock = threading.Lock()
+        self._aggregates = None  # 分省 / 全国汇总，首次使用时建立，之后随编辑增量更新
+        self._aggregates_lock = threading.Lock()
+        self._lock = threading.RLock()
+        self.last_import = None  # 最近一次旧版导入的结果 (行数 / 坏行)
+        atexit.register(self.compact)
+
+    # === 内存数据库 & 编辑日志 ===
+    @property
+    def version(self):
+        """已发布的数据版本号，每次编辑或重新载入后加一"""
+        return self._version
+
+    def _csv_mtimes(self):
+        stamps = []
+        for p in (self.files['parties'], self.files['districts'], self.files['votes']):
+            try:
+                stat = os.stat(p)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append(None)
+        return tuple(stamps)
+
+    def _get_store(self):
+        """
+        [读] 返回当前版本的 VoteStore (只读快照，调用方不得修改)
+        只有磁盘被外部改过 (Excel 编辑 / 其他进程写入) 时才加读锁刷新；
+        本进程正有写者持锁时直接返回旧版本，读者永远不用等写者
+        """
+        store = self._store
+        if store is not None and not self._disk_changed():
+            return store
+        if not self._lock.acquire(blocking=store is None):
+            return store
+        try:
+            with self._file_lock.shared():
+                return self._refresh()
+        finally:
+            self._lock.release()
+
+    def _disk_changed(self):
+        """磁盘上的数据是否被别人 (外部编辑 / 其他进程) 改过"""
+        if self._db is not None:
+            return self._db.data_version() != self._db_version
+        return self._csv_mtimes() != self._mtimes or self._journal.size() != self._journal.offset
+
+    def _refresh(self, repair=False):
+        """
+        把磁盘上的变化并入内存并返回最新版本 (调用方持有 _lock 和文件锁)
+        - CSV 变了 (首次载入 / 外部编辑 / 其他进程压实)：重新载入 CSV 并重放日志
+        - 只是日志变长了 (其他进程的编辑)：只重放新增的记录
+        """
+        if self._db is not None:
+            return self._refresh_db()
+
+        mtimes = self._csv_mtimes()
+        records = None
+        if self._store is not None and mtimes == self._mtimes:
+            records = self._journal.tail(repair)
+
+        if records is None:
+            store = self._load_csv_store(mtimes)
+            for record in self._journal.replay():
+                self._apply_record(store, record)
+            self._mtimes = mtimes
+            self._publish(store, None)
+        elif records:
+            # 其他进程新建了选区时要连表结构一起复制
+            store = self._store.copy(any('create' in r for r in records))
+            for record in records:
+                self._apply_record(store, record)
+            rows = sorted({store.index[r['id']] for r in records if r.get('id') in store.index})
+            self._publish(store, rows)
+        return self._store
+
+    def _load_csv_store(self, mtimes):
+        """
+        载入三张 CSV 的内容 (不含编辑日志)
+        快照与 CSV 时间戳一致时直接载入快照；否则 (首次 / CSV 被 Excel 改过) 解析 CSV 并重写快照
+        """
+        store = load_snapshot(self.snapshot_path, mtimes)
+        if store is None:
+            store = VoteStore.from_csv(self.files)
+            # 解析期间 CSV 又被改了就不写快照，下次重新解析
+            if mtimes == self._csv_mtimes():
+                write_snapshot(self.snapshot_path, store, mtimes)
+        return store
+
+    def _refresh_db(self):
+        """SQLite 后端：其他连接提交过修改就整库重新读入；空库先从现有 CSV 导入"""
+        version = self._db.data_version()
+        if self._store is None or version != self._db_version:
+            if self._db.is_empty() and os.path.exists(self.files['votes']):
+                store = VoteStore.from_csv(self.files)
+                for record in self._journal.replay():
+                    self._apply_record(store, record)
+                self._db.save_all(store)
+                self._journal.reset()
+            self._db_version = version
+            self._publish(self._db.load(), None)
+        return self._store
+
+    def _publish(self, store, rows):
+        """
+        发布新版本 (一次引用赋值，读者要么拿到旧版本要么拿到新版本)
+        :param rows: 本次改动的行号，用来增量更新临界点索引；None 表示整体变化
+        """
+        with self._tipping_lock:
+            if self._tipping is not None:
+                # 少量选区增量更新索引；大批量改动时下次查询再整体重建更快
+                if rows is None or len(rows) * 8 > len(store) or self._tipping.store is not self._store:
+                    self._tipping = None
+                else:
+                    self._tipping.rebase(store, rows)
+        with self._aggregates_lock:
+            if self._aggregates is not None:
+                # 汇总的增量更新要减旧加新 (2 倍于改动行数)，超过全表一半时不如下次重建
+                if rows is None or len(rows) * 2 > len(store) or self._aggregates.store is not self._store:
+                    self._aggregates = None
+                else:
+                    self._aggregates.rebase(store, rows)
+        self._store = store
+        self._version += 1
+
+    @contextmanager
+    def _writing(self, structural=False):
+        """
+        [写] 进程内写锁 + 跨进程写锁下：先并入磁盘上的最新状态，再在副本上修改
+            with self._writing() as (store, edited):
+                ... 修改 store，把改动的行号加进 edited
+        正常退出时把 edited 写进日志并发布新版本；出异常则副本直接丢弃
+        """
+        with self._lock, self._file_lock.exclusive():
+            base = self._refresh(repair=True)
+            store = base.copy(structural)
+            edited = []
+            yield store, edited
+            if edited:
+                self._log_edits(store, edited, new_from=len(base))
+                self._publish(store, edited)
+
+    def data_digest(self):
+        """
+        当前数据内容的哈希 (用作渲染缓存键的一部分)
+        同一版本只计算一次，任何编辑都会产生新版本
+        """
+        store = self._get_store()
+        cached = self._digest
+        if cached is not None and cached[0] is store:
+            return cached[1]
+        h = hashlib.sha1()
+        h.update(json.dumps([store.parties, store.party_ids, store.types], ensure_ascii=False).encode('utf-8'))
+        h.update('\n'.join(store.district_ids).encode('utf-8'))
+        for chunk in store.seats.chunks + store.votes.chunks:
+            h.update(chunk)
+        h.update(store.has_meta)
+        h.update(store.has_votes)
+        digest = h.hexdigest()
+        self._digest = (store, digest)
+        return digest
+
+    def _apply_record(self, store, record):
+        """把一条日志记录 (选区编辑后的完整状态) 应用到内存"""
+        i = store.index.get(record.get('id'))
+        if i is None:
+            if 'create' not in record:
+                return
+            i = self._create_district(store, record['id'], record['create'])
+        if 'seats' in record and store.has_meta[i]:
+            store.seats[i] = int(record['seats'])
+        if 'votes' in record and store.has_votes[i]:
+            self._apply_votes(store, i, record['votes'])
+
+    def _create_district(self, store, district_id, info):
+        """在 store 中新建一个选区 (选区表和票数表都有这一行)，返回行号；调用方负责复制表结构"""
+        i = store.add_district(district_id, info.get('Province_ID') or '', info.get('Name') or district_id,
+                               info.get('Type') or 'FPTP')
+        store.has_meta[i] = 1
+        store.has_votes[i] = 1
+        return i
+
+    def _record_of(self, store, i, created=False):
+        """生成第 i 个选区当前状态的日志记录；新建的选区额外带上基础属性，重放时据此新建"""
+        record = {'id': store.district_ids[i]}
+        if created:
+            record['create'] = {'Province_ID': store.province_ids[i], 'Name': store.names[i], 'Type': store.types[i]}
+        if store.has_meta[i]:
+            record['seats'] = store.seats[i]
+        if store.has_votes[i]:
+            record['votes'] = dict(zip(store.party_ids, store.row(i).tolist()))
+        return record
+
+    def _log_edits(self, store, rows, new_from=None):
+        """把若干选区的新状态追加进日志 (一次 fsync)，并安排后台压实；SQLite 后端则一个事务写入"""
+        if self._db is not None:
+            self._db.save_rows(store, rows)
+            return
+        # 行号 >= new_from 的是本次新建的选区
+        self._journal.append([self._record_of(store, i, new_from is not None and i >= new_from) for i in rows])
+
+        if self._compact_timer is not None and self._journal.count < COMPACT_EVERY:
+            return
+        if self._compact_timer is not None:
+            self._compact_timer.cancel()
+        delay = 0 if self._journal.count >= COMPACT_EVERY else COMPACT_DELAY
+        self._compact_timer = threading.Timer(delay, self.compact)
+        self._compact_timer.daemon = True
+        self._compact_timer.start()
+
+    def compact(self):
+        """[压实] 把内存数据写回 CSV，然后清空编辑日志 (后台定时或手动调用)"""
+        with self._lock:
+            if self._compact_timer is not None:
+                self._compact_timer.cancel()
+                self._compact_timer = None
+            if self._db is not None or self._journal.size() == 0:
+                return
+            with self._file_lock.exclusive():
+                # 先并入其他进程的编辑，保证写回的是完整的最新状态
+                store = self._refresh(repair=True)
+                # 日志记录是幂等的：即使在两步之间崩溃，重放也只会得到同样的结果
+                # atomic_write 返回时 CSV 已落盘 (fsync 文件和目录)，之后才能清空日志，
+                # 否则断电后可能 CSV 是空的、能恢复它的日志也没了
+                atomic_write(self.files['districts'], store.write_districts)
+                atomic_write(self.files['votes'], store.write_votes)
+                self._journal.reset()
+                self._mtimes = self._csv_mtimes()
+                # CSV 刚由 store 写出，快照直接取自 store，重启后不必再解析 CSV
+                write_snapshot(self.snapshot_path, store, self._mtimes)
+
+    def export_csv(self):
+        """把当前数据写成 parties / districts / votes 三张 CSV (给 Excel 用)"""
+        with self._lock, self._file_lock.exclusive():
+            store = self._refresh(repair=True)
+            atomic_write(self.files['parties'], store.write_parties)
+            atomic_write(self.files['districts'], store.write_districts)
+            atomic_write(self.files['votes'], store.write_votes)
+            if self._db is None:
+                # CSV 后端：等同于一次压实
+                self._journal.reset()
+                self._mtimes = self._csv_mtimes()
+                write_snapshot(self.snapshot_path, store, self._mtimes)
+
+    def import_csv(self):
+        """
+        SQLite 后端：用工作区里 (可能被 Excel 改过的) 三张 CSV 覆盖数据库
+        CSV 后端不需要调用：CSV 本身就是数据，被外部修改后会自动重新载入
+        """
+        if self._db is None:
+            return
+        with self._lock, self._file_lock.exclusive():
+            self._db.save_all(VoteStore.from_csv(self.files))
+            self._invalidate()
+
+    def memory_size(self):
+        """已载入内存的数据大小 (字节)，未载入时为 0"""
+        store = self._store
+        return store.nbytes() if store is not None else 0
+
+    def close(self):
+        """压实并释放内存数据 (工作区被换出缓存时调用)"""
+        with self._lock:
+            self.compact()
+            self._store = None
+            self._mtimes = None
+            self._digest = None
+            with self._tipping_lock:
+                self._tipping = None
+            with self._aggregates_lock:
+                self._aggregates = None
+            self._file_lock.close()
+            if self._db is not None:
+                self._db.close()
+        atexit.unregister(self.compact)
+
+    def _invalidate(self):
+        """丢弃内存数据和未压实的日志 (文件被整体替换时调用，调用方持有写锁)"""
+        with self._lock:
+            if self._compact_timer is not None:
+                self._compact_timer.cancel()
+                self._compact_timer = None
+            self._journal.reset()
+            self._store = None
+            self._mtimes = None
+            self._digest = None
+            with self._tipping_lock:
+                self._tipping = None
+            with self._aggregates_lock:
+                self._aggregates = None
+
     def init_workspace(self):
         """初始化空的工作区文件"""
         if not os.path.exists(self.workspace):
@@ -26,257 +384,370 @@ class DataManager:
             with open(self.files['districts'], 'w', encoding='utf-8-sig', newline='') as f:
                 csv.writer(f).writerow(['District_ID', 'Province_ID', 'Name', 'Type', 'Seats'])
 
-    def import_from_legacy_v2(self, legacy_csv_path):
+    def import_from_legacy_v2(self, legacy_csv_path, progress_callback=None):
         """
-        [核心功能] 将 v2.5 的单一大表拆解为 v3.0 的三张表
+        [核心功能] 将 v2.5 的单一大表拆解为 v3.0 的三张表 (流式)
+        先解析 META 行得到政党表，之后每读 IMPORT_CHUNK 行就写一批选区/票数到临时文件，
+        内存占用与文件大小无关；全部写完后在写锁下一次性替换三张表
+        坏行 (列数不足 / 票数不是非负整数 / 选区ID重复) 跳过并记录，不中断导入，
+        结果见 self.last_import = {'rows': 导入行数, 'error_count': 坏行数, 'errors': 前 IMPORT_MAX_ERRORS 条}
+        :param progress_callback(已读字节, 总字节, 已导入行数, 坏行数): 每写完一批调用一次
         """
         self.init_workspace()
-        
-        parties = []
-        districts = []
-        votes_data = []
-        
-        with open(legacy_csv_path, 'r', encoding='utf-8-sig') as f:
-            reader = csv.reader(f)
-            rows = list(reader)
-            
-            # 1. 解析 META 行 -> 生成 Parties 表
-            meta_row = rows[0]
-            party_names_ordered = [] # 记录列顺序
-            
-            for item in meta_row[1:]:
-                if ':' in item:
-                    p_name, p_color = item.split(':')
-                    p_name = p_name.strip()
-                    # 自动生成一个简短ID (比如 P01, P02) 或者直接用名字
-                    p_id = f"P_{len(parties)+1:02d}" 
-                    parties.append([p_id, p_name, p_color.strip(), "Default"])
-                    party_names_ordered.append(p_id)
-
-            # 2. 解析数据行 -> 生成 Districts 和 Votes 表
-            header = rows[1]
-            # 假设 header 是 [Prov_ID, Dist_ID, PartyA, PartyB...]
-            
-            for row in rows[2:]:
-                if len(row) < 3: continue
-                prov_id = row[0]
-                dist_id = row[1]
-                
-                # 存入 Districts 表 (默认设为小选区 FPTP, 1席)
-                districts.append([dist_id, prov_id, dist_id, 'FPTP', 1])
-                
-                # 存入 Votes 表
-                # 我们这里把宽表转为长表存储吗？为了方便Excel编辑，
-                # 其实 v3.0 的 votes.csv 也可以保持宽表格式，只要表头动态匹配即可。
-                # 这里为了简单，我们先把原始投票数据存进去，表头用 Party_ID
-                vote_nums = row[2:]
-                votes_data.append([dist_id] + vote_nums)
-
-        # === 3. 写入硬盘 ===
-        
-        # 写 Parties
-        with open(self.files['parties'], 'w', encoding='utf-8-sig', newline='') as f:
-            w = csv.writer(f)
-            w.writerow(['Party_ID', 'Name_CN', 'Color', 'Alliance'])
-            w.writerows(parties)
-            
-        # 写 Districts
-        with open(self.files['districts'], 'w', encoding='utf-8-sig', newline='') as f:
-            w = csv.writer(f)
-            w.writerow(['District_ID', 'Province_ID', 'Name', 'Type', 'Seats'])
-            w.writerows(districts)
-            
-        # 写 Votes (保持宽表结构，方便Excel编辑)
-        with open(self.files['votes'], 'w', encoding='utf-8-sig', newline='') as f:
-            w = csv.writer(f)
-            # 表头：选区ID + 各个政党ID
-            w.writerow(['District_ID'] + party_names_ordered)
-            w.writerows(votes_data)
-            
-        return True, "成功将旧版数据升级为 v3.0 数据库格式"
+        total_bytes = os.path.getsize(legacy_csv_path)
+        report = {'rows': 0, 'error_count': 0, 'errors': []}
+        self.last_import = report
+
+        def row_error(line_no, dist_id, msg):
+            report['error_count'] += 1
+            if len(report['errors']) < IMPORT_MAX_ERRORS:
+                report['errors'].append({'line': line_no, 'district_id': dist_id, 'error': msg})
+
+        tmp_paths = {name: unique_tmp(path) for name, path in self.files.items()}
+        try:
+            with open(legacy_csv_path, 'rb') as raw:
+                counter = [0]
+                reader = csv.reader(_counting_lines(raw, counter))
+
+                # 1. 解析 META 行 -> 生成 Parties 表
+                meta_row = next(reader, None)
+                header = next(reader, None)
+                if not meta_row or header is None:
+                    return False, "文件为空或缺少 META 行/表头"
+
+                parties = []
+                party_names_ordered = [] # 记录列顺序
+                for item in meta_row[1:]:
+                    if ':' in item:
+                        p_name, p_color = item.split(':', 1)
+                        # 自动生成一个简短ID (比如 P01, P02) 或者直接用名字
+                        p_id = f"P_{len(parties)+1:02d}"
+                        parties.append([p_id, p_name.strip(), p_color.strip(), "Default"])
+                        party_names_ordered.append(p_id)
+                n_parties = len(party_names_ordered)
+
+                with open(tmp_paths['parties'], 'w', encoding='utf-8-sig', newline='') as f:
+                    w = csv.writer(f)
+                    w.writerow(['Party_ID', 'Name_CN', 'Color', 'Alliance'])
+                    w.writerows(parties)
+
+                # 2. 逐行解析数据 -> 分批写 Districts 和 Votes 表
+                # header 是 [Prov_ID, Dist_ID, PartyA, PartyB...]，票数列按 META 的政党顺序对应
+                with open(tmp_paths['districts'], 'w', encoding='utf-8-sig', newline='') as fd, \
+                        open(tmp_paths['votes'], 'w', encoding='utf-8-sig', newline='') as fv:
+                    district_writer = csv.writer(fd)
+                    votes_writer = csv.writer(fv)
+                    district_writer.writerow(['District_ID', 'Province_ID', 'Name', 'Type', 'Seats'])
+                    # 表头：选区ID + 各个政党ID (保持宽表结构，方便Excel编辑)
+                    votes_writer.writerow(['District_ID'] + party_names_ordered)
+
+                    seen = set()
+                    districts, votes_data = [], []
+
+                    def flush():
+                        district_writer.writerows(districts)
+                        votes_writer.writerows(votes_data)
+                        districts.clear()
+                        votes_data.clear()
+                        if progress_callback:
+                            progress_callback(counter[0], total_bytes, report['rows'], report['error_count'])
+
+                    for row in reader:
+                        line_no = reader.line_num
+                        if not any(cell.strip() for cell in row):
+                            continue
+                        if len(row) < 3:
+                            row_error(line_no, row[1] if len(row) > 1 else '', '列数不足')
+                            continue
+                        prov_id = row[0].strip()
+                        dist_id = row[1].strip()
+                        if not dist_id:
+                            row_error(line_no, '', '缺少选区ID')
+                            continue
+                        if dist_id in seen:
+                            row_error(line_no, dist_id, '选区ID重复')
+                            continue
+
+                        vote_nums = []
+                        bad = None
+                        for k, cell in enumerate(row[2:2 + n_parties]):
+                            count = _parse_count(cell)
+                            if count is None:
+                                bad = f'第 {k + 3} 列票数无效: {cell}'
+                                break
+                            vote_nums.append(count)
+                        if bad is not None:
+                            row_error(line_no, dist_id, bad)
+                            continue
+                        vote_nums.extend([0] * (n_parties - len(vote_nums)))
+
+                        seen.add(dist_id)
+                        # 存入 Districts 表 (默认设为小选区 FPTP, 1席)
+                        districts.append([dist_id, prov_id, dist_id, 'FPTP', 1])
+                        votes_data.append([dist_id] + vote_nums)
+                        report['rows'] += 1
+                        if len(districts) >= IMPORT_CHUNK:
+                            flush()
+                    flush()
+        except BaseException as e:
+            for tmp in tmp_paths.values():
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+            if isinstance(e, (UnicodeDecodeError, csv.Error)):
+                return False, f"文件格式错误: {e}"
+            raise
+
+        # === 3. 替换硬盘上的三张表 ===
+        with self._lock, self._file_lock.exclusive():
+            # 整库覆盖：未压实的旧修改直接丢弃
+            # 三张表都落盘之后才清空日志 (_invalidate)，中途断电时旧数据仍能靠日志恢复
+            for name in ('parties', 'districts', 'votes'):
+                durable_replace(tmp_paths[name], self.files[name])
+            self._invalidate()
+            if self._db is not None:
+                self._db.save_all(VoteStore.from_csv(self.files))
 
-    def get_joined_data(self):
+        msg = f"成功将旧版数据升级为 v3.0 数据库格式 ({report['rows']} 个选区"
+        if report['error_count']:
+            msg += f", 跳过 {report['error_count']} 行错误数据"
+        return True, msg + ")"
+
+
+    def get_joined_data(self, store=None):
         """
-        [给渲染器用] 读取三张表，拼合数据
+        [给渲染器用] 从内存数据库拼合数据
         逻辑更新：
         1. 席位统计基于 districts.csv 里的 Seats 值
         2. 如果 Seats == 0，则不计入席位，且地图上可能需要特殊处理
+        3. 席位按 Type 列选择分配方法 (FPTP 赢者通吃 / DHONDT / SAINTE_LAGUE / HARE / DROOP)，
+           见 seat_allocation；比例代表制选区额外带 'allocation': {党名: 席位}
+        4. 图例的各党席位直接取自全国汇总 (见 aggregates)，不再逐选区累加
+        :param store: 指定的数据版本 (如 swing_scenario 的情景副本)，默认为当前数据
         """
-        # 1. 读取政党信息
-        party_colors = {}
-        party_names = {}
-        with open(self.files['parties'], 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                pid = row['Party_ID']
-                party_colors[row['Name_CN']] = row['Color']
-                party_names[pid] = row['Name_CN']
-
-        # 2. 读取选区基础信息 (获取席位设定)
-        district_meta = {} # { 'XJ-1': 1, 'XJ-2': 0 }
-        with open(self.files['districts'], 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # 容错处理：确保Seats是数字
-                try:
-                    seats = int(row['Seats'])
-                except:
-                    seats = 1
-                district_meta[row['District_ID']] = seats
+        from .color_utils import ramp_colors
 
-        # 3. 读取选情数据
-        district_data = {}
+        if store is None:
+            store = self._get_store()
+
+        # 1. 政党信息
+        party_colors = {p['Name_CN']: p['Color'] for p in store.parties}
+        party_names = store.party_names()
         party_seats = {name: 0 for name in party_colors.keys()}
-        
-        from .color_utils import get_color_intensity
 
-        with open(self.files['votes'], 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            party_ids = [field for field in reader.fieldnames if field != 'District_ID']
-            
-            for row in reader:
-                d_id = row['District_ID']
-                
-                # 获取该区席位数，默认为1
-                seats_count = district_meta.get(d_id, 1)
+        # 2. 图例席位：全国汇总里已按各选区的分配方法算好
+        with self._aggregates_lock:
+            current = store is self._store
+            if current:
+                national_seats = list(self._aggregates_for(store).national.seats)
+        if not current:
+            # 情景副本 / 已过时的版本：临时汇总，不替换缓存
+            national_seats = Aggregates(store).national.seats
+        for pid, n in zip(store.party_ids, national_seats):
+            name = party_names.get(pid, pid)
+            if name in party_seats:
+                party_seats[name] += n
+        methods = {}
 
-                # 找出票数最高的
-                max_votes = -1
-                winner_pid = None
-                total_votes = 0
-                
-                for pid in party_ids:
-                    try:
-                        votes = int(row[pid])
-                        total_votes += votes
-                        if votes > max_votes:
-                            max_votes = votes
-                            winner_pid = pid
-                    except ValueError:
-                        continue 
-                
-                # 只有当总票数>0 且 席位数>0 时，才算有效选举
-                if total_votes > 0 and winner_pid and seats_count > 0:
-                    winner_name = party_names.get(winner_pid, winner_pid)
-                    base_color = party_colors.get(winner_name, "#aaaaaa")
-                    
-                    # === 关键修改：统计席位 ===
-                    # 简单模型：该区赢家拿走该区所有席位
-                    # (如果是比例代表制，这里需要更复杂的 D'Hondt 算法，目前暂按赢者通吃或单席位处理)
-                    if winner_name in party_seats:
-                        party_seats[winner_name] += seats_count
-                    
-                    win_rate = max_votes / total_votes
-                    final_color = get_color_intensity(base_color, win_rate)
-                    
-                    district_data[d_id] = {
-                        'color': final_color,
-                        'rate': win_rate,
-                        'winner_name': winner_name,
-                        'seats': seats_count 
-                    }
-                else:
-                    # 0席位(无改选) 或 无数据
-                    district_data[d_id] = {
-                        'color': '#eeeeee', # 灰色
-                        'rate': 0, 
-                        'winner_name': '无改选' if seats_count == 0 else 'No Data',
-                        'seats': seats_count
-                    }
+        # 3. 逐行求 argmax / sum (max + index 在 C 层完成，不再逐党比较)
+        district_data = {}
+        colored = []     # 有效选区: 等整图算完后统一查色阶表
+        base_colors = []
+        rates = []
+        for i, (d_id, seats_count, row) in enumerate(zip(store.district_ids, store.seats, store.rows())):
+            if not store.has_votes[i]:
+                continue
+            total_votes = sum(row)
+
+            # 只有当总票数>0 且 席位数>0 时，才算有效选举
+            if total_votes > 0 and seats_count > 0:
+                max_votes = max(row)
+                winner_pid = store.party_ids[row.index(max_votes)]
+                winner_name = party_names.get(winner_pid, winner_pid)
+                base_color = party_colors.get(winner_name, "#aaaaaa")
+
+                win_rate = max_votes / total_votes
+                colored.append(d_id)
+                base_colors.append(base_color)
+                rates.append(win_rate)
+                district_data[d_id] = {
+                    'color': None,
+                    'rate': win_rate,
+                    'winner_name': winner_name,
+                    'seats': seats_count
+                }
+
+                # 比例代表制选区：地图颜色仍按得票最高者，另附席位分配结果
+                d_type = store.types[i]
+                method = methods.get(d_type)
+                if method is None:
+                    method = methods[d_type] = method_for(d_type)
+                if method != 'fptp':
+                    allocation = {}
+                    for pid, n in zip(store.party_ids, allocate(row, seats_count, method)):
+                        if n:
+                            name = party_names.get(pid, pid)
+                            allocation[name] = allocation.get(name, 0) + n
+                    district_data[d_id]['allocation'] = allocation
+            else:
+                # 0席位(无改选) 或 无数据
+                district_data[d_id] = {
+                    'color': '#eeeeee', # 灰色
+                    'rate': 0,
+                    'winner_name': '无改选' if seats_count == 0 else 'No Data',
+                    'seats': seats_count
+                }
+
+        # 4. 整图上色：得票率列 -> 色阶表下标 -> 颜色
+        for d_id, color in zip(colored, ramp_colors(base_colors, rates)):
+            district_data[d_id]['color'] = color
 
         return district_data, party_colors, party_seats
 
     def update_district_data(self, district_id, new_seats, new_votes_dict):
         """
-        [写 - 升级版] 同时更新席位(districts.csv)和票数(votes.csv)
-        """
-        # --- 1. 更新 Districts 表 (席位) ---
-        dist_rows = []
-        dist_fieldnames = []
-        with open(self.files['districts'], 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            dist_fieldnames = reader.fieldnames
-            dist_rows = list(reader)
-        
-        # 查找并修改
-        found_dist = False
-        for row in dist_rows:
-            if row['District_ID'] == district_id:
-                row['Seats'] = str(new_seats)
-                # 既然删除了Type下拉框，这里我们可以默认保持原样，或者统一设为Custom
-                found_dist = True
-                break
-        
-        # 如果没找到(新选区)，需要追加逻辑(暂略，假设ID都存在)
-        
-        with open(self.files['districts'], 'w', encoding='utf-8-sig', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=dist_fieldnames)
-            writer.writeheader()
-            writer.writerows(dist_rows)
-
-        # --- 2. 更新 Votes 表 (票数) ---
-        vote_rows = []
-        vote_fieldnames = []
-        with open(self.files['votes'], 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            vote_fieldnames = reader.fieldnames
-            vote_rows = list(reader)
-            
-        for row in vote_rows:
-            if row['District_ID'] == district_id:
-                for party_id, count in new_votes_dict.items():
-                    if party_id in vote_fieldnames:
-                        row[party_id] = count
-                break
-        
-        with open(self.files['votes'], 'w', encoding='utf-8-sig', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=vote_fieldnames)
-            writer.writeheader()
-            writer.writerows(vote_rows)
-            
+        [写 - 升级版] 同时更新席位和票数 (先改内存，再追加一条编辑日志)
+        """
+        with self._writing() as (store, edited):
+            i = store.index.get(district_id)
+            # 如果没找到(新选区)，需要追加逻辑(暂略，假设ID都存在)
+            if i is None:
+                return True
+
+            # --- 1. 更新 Districts 表 (席位) ---
+            if store.has_meta[i]:
+                store.seats[i] = int(new_seats)
+
+            # --- 2. 更新 Votes 表 (票数) ---
+            if store.has_votes[i]:
+                self._apply_votes(store, i, new_votes_dict)
+
+            edited.append(i)
+
         return True
+
+    def _validate_bulk(self, store, records):
+        """
+        逐条检查批量修正的记录，返回错误列表 (每条 {'index': 第几条, 'district_id': ..., 'error': 说明})
+        """
+        errors = []
+        seen = set()
+        for k, record in enumerate(records):
+            def fail(msg):
+                errors.append({'index': k, 'district_id': d_id, 'error': msg})
+
+            d_id = record.get('district_id') if isinstance(record, dict) else None
+            if not isinstance(d_id, str) or not d_id.strip():
+                fail('缺少选区ID')
+                continue
+            if d_id in seen:
+                fail('选区ID重复')
+                continue
+            seen.add(d_id)
+
+            if 'seats' in record:
+                try:
+                    if int(record['seats']) < 0:
+                        fail('席位不能为负数')
+                except (TypeError, ValueError):
+                    fail(f'席位不是整数: {record["seats"]}')
+
+            votes = record.get('votes', {})
+            if not isinstance(votes, dict):
+                fail('votes 必须是 {政党ID: 票数}')
+                continue
+            for party_id, count in votes.items():
+                if party_id not in store.party_col:
+                    fail(f'未知政党: {party_id}')
+                    continue
+                try:
+                    if int(count) < 0:
+                        fail(f'{party_id} 票数不能为负数')
+                except (TypeError, ValueError):
+                    fail(f'{party_id} 票数不是整数: {count}')
+        return errors
+
+    def bulk_update_districts(self, records, create_missing=True):
+        """
+        [写 - 批量] 一次修正多个选区：先整体校验，全部通过才写入 (一个事务 / 一次日志追加)
+        :param records: [{'district_id': 'XJ-1', 'seats': 2, 'votes': {'P_01': 3000},
+                          'province_id': ..., 'name': ..., 'type': ...}, ...]
+                        seats / votes 可省略；后三项只在新建选区时使用
+        :param create_missing: 选区不存在时是否新建，否则记为错误
+        :return: {'updated': 修改的选区数, 'created': [新建的选区ID], 'errors': [...]}
+                 errors 非空时没有任何修改
+        """
+        store = self._get_store()
+        errors = self._validate_bulk(store, records)
+        missing = [r['district_id'] for r in records if r['district_id'] not in store.index] if not errors else []
+        if missing and not create_missing:
+            errors = [{'index': k, 'district_id': r['district_id'], 'error': '选区不存在'}
+                      for k, r in enumerate(records) if r['district_id'] not in store.index]
+        if errors:
+            return {'updated': 0, 'created': [], 'errors': errors}
+
+        created = []
+        # 新建选区要改表结构，副本需要连索引一起复制
+        with self._writing(structural=bool(missing)) as (store, edited):
+            for record in records:
+                d_id = record['district_id']
+                i = store.index.get(d_id)
+                if i is None:
+                    if not missing:
+                        continue  # 校验之后被整体导入删掉了，副本没有复制表结构，不能新建
+                    i = self._create_district(store, d_id, {
+                        'Province_ID': record.get('province_id'),
+                        'Name': record.get('name'),
+                        'Type': record.get('type'),
+                    })
+                    created.append(d_id)
+                if 'seats' in record and store.has_meta[i]:
+                    store.seats[i] = int(record['seats'])
+                if record.get('votes') and store.has_votes[i]:
+                    self._apply_votes(store, i, record['votes'])
+                edited.append(i)
+
+        return {'updated': len(edited), 'created': created, 'errors': []}
+
+    def _apply_votes(self, store, i, new_votes_dict):
+        """把 {'P_01': 3000, ...} 写进第 i 行，未知政党列忽略"""
+        row = store.row(i)
+        for party_id, count in new_votes_dict.items():
+            j = store.party_col.get(party_id)
+            if j is not None:
+                row[j] = int(count)
+        store.set_row(i, row)
+
     def get_district_detail(self, district_id):
         """
         [读] 获取指定选区的所有详情：基础属性 + 当前各党得票 (带政党名字)
         """
-        # 0. 先把所有政党名字查出来做成字典: {'P_01': '自由党', ...}
-        party_map = {}
-        if os.path.exists(self.files['parties']):
-            with open(self.files['parties'], 'r', encoding='utf-8-sig') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    party_map[row['Party_ID']] = row['Name_CN']
-
-        # 1. 找基础属性 (Districts表)
-        district_info = {}
-        with open(self.files['districts'], 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row['District_ID'] == district_id:
-                    district_info = row
-                    break
-        
-        if not district_info:
-            return None 
-
-        # 2. 找得票数据 (Votes表)
+        store = self._get_store()
+        i = store.index.get(district_id)
+
+        # 1. 基础属性 (Districts表)
+        if i is None or not store.has_meta[i]:
+            return None
+
+        district_info = {
+            'District_ID': district_id,
+            'Province_ID': store.province_ids[i],
+            'Name': store.names[i],
+            'Type': store.types[i],
+            'Seats': str(store.seats[i])
+        }
+
+        # 2. 得票数据 (Votes表)
         vote_data = [] # 改成列表，方便前端排序和显示
-        
-        with open(self.files['votes'], 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if row['District_ID'] == district_id:
-                    # 遍历所有列
-                    for k, v in row.items():
-                        if k != 'District_ID' and v.strip().isdigit():
-                            # 构造前端友好的数据结构
-                            vote_data.append({
-                                'id': k,                        # P_01 (用于保存)
-                                'name': party_map.get(k, k),    # 自由党 (用于显示)
-                                'count': int(v)                 # 票数
-                            })
-                    break
-        
+        if store.has_votes[i]:
+            party_map = store.party_names()
+            for pid, count in zip(store.party_ids, store.row(i)):
+                # 构造前端友好的数据结构
+                vote_data.append({
+                    'id': pid,                          # P_01 (用于保存)
+                    'name': party_map.get(pid, pid),    # 自由党 (用于显示)
+                    'count': count                      # 票数
+                })
+
         # 可选：按票数倒序排列，让赢家在最上面
         vote_data.sort(key=lambda x: x['count'], reverse=True)
 
@@ -290,135 +761,118 @@ class DataManager:
         [写] 更新指定选区的票数
         new_votes_dict: {'LDP': 3000, 'CDP': 2000...}
         """
-        # 我们需要读取整个文件，修改那一行，再写回去 (CSV的局限性，但这对于几千行来说很快)
-        rows = []
-        fieldnames = []
-        
-        # 1. 读取
-        with open(self.files['votes'], 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            fieldnames = reader.fieldnames
-            rows = list(reader)
-            
-        # 2. 修改
-        updated = False
-        for row in rows:
-            if row['District_ID'] == district_id:
-                # 更新票数
-                for party_id, count in new_votes_dict.items():
-                    if party_id in fieldnames:
-                        row[party_id] = count
-                updated = True
-                break
-        
-        # 如果没找到（可能是新选区），以后再处理追加逻辑，先假设一定能找到
-        
-        # 3. 写入
-        with open(self.files['votes'], 'w', encoding='utf-8-sig', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-            
+        with self._writing() as (store, edited):
+            i = store.index.get(district_id)
+            # 如果没找到（可能是新选区），以后再处理追加逻辑，先假设一定能找到
+            if i is not None and store.has_votes[i]:
+                self._apply_votes(store, i, new_votes_dict)
+                edited.append(i)
+
         return True
+
     def batch_swing_update(self, district_ids, target_party_id, swing_percent, lock_total=True):
         """
-        批量摇摆更新 (完整版)
+        批量摇摆更新 (整批计算，见 swing_engine)
         :param district_ids: 选区ID列表
         :param target_party_id: 目标政党ID
         :param swing_percent: 摇摆比例 (0.05 = 5%)
         :param lock_total: 是否锁定总票数
+        :return: 摘要 {'changed': 变化选区数, 'flipped': [...], 'seat_changes': {党名: 席位增减}}
         """
-        # 读取现有票数
-        all_rows = []
-        fieldnames = []
-        
-        if not os.path.exists(self.files['votes']):
-            return False
-
-        with open(self.files['votes'], 'r', encoding='utf-8-sig') as f:
-            reader = csv.DictReader(f)
-            fieldnames = reader.fieldnames
-            all_rows = list(reader)
-
-        changed_count = 0
-        
-        for row in all_rows:
-            # 只修改选中的选区
-            if row['District_ID'] in district_ids:
-                # 1. 计算该区总票数 & 读取当前各党票数
-                current_votes = {} 
-                total_votes = 0
-                
-                for k, v in row.items():
-                    if k != 'District_ID' and k in fieldnames and v and v.strip().isdigit():
-                        val = int(v)
-                        current_votes[k] = val
-                        total_votes += val
-                
-                if total_votes == 0: continue
+        with self._writing() as (store, edited):
+            t = store.party_col.get(target_party_id)
+            if t is None:
+                return {'changed': 0, 'flipped': [], 'seat_changes': {}}
 
-                # 2. 计算变动量 (Delta)
-                delta_votes = int(total_votes * swing_percent)
-                
-                # 获取目标政党当前票数
-                target_current = current_votes.get(target_party_id, 0)
-                
-                # 3. 边界检查：防止减成负数
-                # 预测一下修改后的票数
-                final_target_votes = target_current + delta_votes
-                
-                if final_target_votes < 0:
-                    # 如果不够扣，就扣光为止
-                    delta_votes = -target_current
-                
-                # 如果算出来没变化（比如票数太少，乘百分比后不到1票），跳过
-                if delta_votes == 0: continue
+            # 按行号直接定位，重复的ID只处理一次
+            index = store.index
+            rows = sorted({index[d] for d in district_ids if d in index})
 
-                # === 执行修改 ===
-                
-                # A. 更新目标政党 (无论是锁还是不锁，目标党都要变)
-                row[target_party_id] = str(target_current + delta_votes)
-                
-                # B. 零和博弈逻辑 (如果锁定了总票数)
-                if lock_total:
-                    # 目标党增加了 delta，其他人就要分担 -delta
-                    remaining_delta = -delta_votes
-                    
-                    # 找出"其他政党" (排除自己)
-                    other_parties = [p for p in current_votes if p != target_party_id]
-                    other_total = sum(current_votes[p] for p in other_parties)
-                    
-                    if other_total > 0:
-                        # 按比例分摊
-                        distributed_sum = 0
-                        for i, p in enumerate(other_parties):
-                            p_current = current_votes[p]
-                            
-                            # 最后一个党负责兜底(处理除不尽的余数)，保证总数严丝合缝
-                            if i == len(other_parties) - 1:
-                                share = remaining_delta - distributed_sum
-                            else:
-                                ratio = p_current / other_total
-                                share = int(remaining_delta * ratio)
-                                distributed_sum += share
-                            
-                            # 防止其他党被扣成负数 (理论上应该很少发生，但要防御)
-                            new_val = p_current + share
-                            if new_val < 0: new_val = 0
-                            
-                            row[p] = str(new_val)
-                    else:
-                        # 如果没有其他党可扣，那就没法锁定总票数了，只能看着它变
-                        pass
-
-                changed_count += 1
-
-        # 写回文件
-        if changed_count > 0:
-            with open(self.files['votes'], 'w', encoding='utf-8-sig', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(all_rows)
-            return True
-        
-        return False
\ No newline at end of file
+            changed_rows, summary = apply_swing(store, rows, t, swing_percent, lock_total)
+            edited.extend(changed_rows)
+
+        return summary
+
+    def swing_scenario(self, target_party_id, swing_percent, district_ids=None, province_ids=None, lock_total=True):
+        """
+        [情景] 与 batch_swing_update 相同的摇摆，但作用在当前数据的副本上，不修改工作区
+        :param district_ids / province_ids: 只摇摆这些选区 / 省份，都为 None 时全国摇摆
+        :return: (摇摆后的 VoteStore 副本, 摘要)；可交给 get_joined_data(store) 出图；政党不存在时返回 None
+        """
+        store = self._get_store().copy()
+        t = store.party_col.get(target_party_id)
+        if t is None:
+            return None
+        if district_ids is None and province_ids is None:
+            rows = range(len(store))
+        else:
+            rows = set()
+            if district_ids is not None:
+                rows.update(store.index[d] for d in district_ids if d in store.index)
+            if province_ids is not None:
+                wanted = set(province_ids)
+                rows.update(i for i, prov in enumerate(store.province_ids) if prov in wanted)
+            rows = sorted(rows)
+        _, summary = apply_swing(store, rows, t, swing_percent, lock_total)
+        return store, summary
+
+    def simulate(self, target_party_id, swing_percent, noise_sd=0.0, iterations=1000, seed=None,
+                 province_swing=None, lock_total=True):
+        """
+        [蒙特卡洛模拟] 与 batch_swing_update 相同的摇摆规则，但只在数据快照上计算，不修改工作区
+        :param swing_percent: 整体摇摆比例 (0.05 = 5%)
+        :param noise_sd: 每个选区随机摇摆的标准差 (比例)
+        :param province_swing: {Province_ID: 摇摆比例}，分省摇摆
+        :return: 模拟结果 (见 simulation.run_simulation)；政党不存在时返回 None
+        """
+        store = self._get_store()
+        t = store.party_col.get(target_party_id)
+        if t is None:
+            return None
+        snap = snapshot_from_store(store)
+
+        # 快照拷贝完即与工作区脱钩，模拟期间不阻塞编辑
+        return run_simulation(snap, t, swing_percent, noise_sd, iterations, seed, province_swing, lock_total)
+
+    def _aggregates_for(self, store):
+        """store 对应的分省 / 全国汇总，不是同一版本时整体重建 (调用方持有 _aggregates_lock)"""
+        if self._aggregates is None or self._aggregates.store is not store:
+            self._aggregates = Aggregates(store)
+        return self._aggregates
+
+    def get_summary(self, province_id=None):
+        """
+        [汇总] 全国 + 分省的各党总票数、得票率、席位、赢下的选区数、平均领先幅度
+        由增量维护的汇总直接给出，编辑后不需要重新扫描全表
+        :param province_id: 只看某省 (None 为全部省份)
+        :return: {'national': {...}, 'provinces': {Province_ID: {...}}}
+        """
+        store = self._get_store()
+        with self._aggregates_lock:
+            return self._aggregates_for(store).summary(province_id)
+
+    def tipping_point(self, target_party_id, swing_percent=0.0, count=10):
+        """
+        [临界点查询] 全国统一摇摆 swing_percent 时目标政党的预计席位，以及离翻转最近的选区
+        阈值按锁定总票数的摇摆规则计算 (见 tipping_index.flip_threshold)
+        :return: {'seats', 'districts_won', 'closest': [{'District_ID', 'Name', 'swing', 'gain'}]}；
+                 政党不存在时返回 None
+        """
+        store = self._get_store()
+        t = store.party_col.get(target_party_id)
+        if t is None:
+            return None
+        with self._tipping_lock:
+            if self._tipping is None or self._tipping.store is not store:
+                self._tipping = TippingIndex(store)
+            seats, won = self._tipping.seats_at_swing(t, swing_percent)
+            nearest = self._tipping.closest(t, swing_percent, count)
+        closest = [{
+            'District_ID': store.district_ids[i],
+            'Name': store.names[i],
+            'swing': thr,
+            # True: 摇摆越过阈值后该党赢下此区；False: 该党会失去此区
+            'gain': thr > swing_percent,
+        } for i, thr in nearest]
+
+        return {'seats': seats, 'districts_won': won, 'closest': closest}
@@ -0,0 +1,94 @@
+import json
+import os
+
+
+class EditJournal:
+    """
+    [追加日志] 每次编辑只在 edits.journal 末尾追加几行 JSON，而不是重写整张 CSV
+    每条记录是某个选区编辑后的完整状态 (重放多次结果相同)：
+        {"id": "XJ-1", "seats": 2, "votes": {"P_01": 3000, "P_02": 1200}}
+    崩溃时最多只会留下半行，重放时丢弃即可
+    多进程共享同一日志时，offset 记录本进程已读到的位置，tail() 只读新追加的部分
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0   # 自上次压实以来的记录数
+        self.offset = 0  # 已读入内存的字节数
+
+    def append(self, records):
+        """追加一批记录并 fsync，一次编辑 = 一次写入"""
+        if not records:
+            return
+        data = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            # 调用方持有写锁且已读到末尾，所以写完的位置就是新的 offset
+            self.offset = f.tell()
+        self.count += len(records)
+
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def _read_lines(self, f):
+        """从当前位置读出完整的记录行，返回 (记录列表, 读过的字节数)"""
+        records = []
+        good_size = 0
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # 写到一半就崩溃的尾行
+            try:
+                records.append(json.loads(line.decode('utf-8')))
+            except ValueError:
+                break
+            good_size += len(line)
+        return records, good_size
+
+    def tail(self, repair=False):
+        """
+        读出 offset 之后新追加的记录 (其他进程写入的编辑)
+        :param repair: 持有写锁时为 True，顺带截掉崩溃留下的半行
+        :return: 记录列表；日志被压实清空过 (比 offset 短) 时返回 None，需要整体重新载入
+        """
+        size = self.size()
+        if size < self.offset:
+            return None
+        if size == self.offset:
+            return []
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            records, good_size = self._read_lines(f)
+        self.offset += good_size
+        self.count += len(records)
+        if repair and self.offset != size:
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.offset)
+        return records
+
+    def replay(self):
+        """按顺序读出所有完整记录；损坏的尾行会被截掉，避免后续追加接在半行后面"""
+        if not os.path.exists(self.path):
+            self.count = 0
+            self.offset = 0
+            return []
+
+        with open(self.path, 'rb') as f:
+            records, good_size = self._read_lines(f)
+
+        if good_size != os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(good_size)
+
+        self.count = len(records)
+        self.offset = good_size
+        return records
+
+    def reset(self):
+        """压实完成后清空日志"""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.flush()
+            os.fsync(f.fileno())
+        self.count = 0
+        self.offset = 0
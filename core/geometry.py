@@ -0,0 +1,291 @@
+import math
+import re
+
+# 路径数据的分隔符、数字和圆弧标志位 (标志位只有一个字符，可以与后面的数字连写: a5 5 0 0110 10)
+_SEP_RE = re.compile(r'[\s,]*')
+_NUM_RE = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+_FLAG_RE = re.compile(r'[01]')
+_PARAM_COUNT = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7, 'Z': 0}
+
+IDENTITY = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+def path_commands(d):
+    """
+    把 path 的 d 属性解析成绝对坐标命令序列 [(命令大写字母, [参数...]), ...]
+    M 之后的坐标对按 L 处理；H/V/A 只换算其中的坐标参数
+    :raises ValueError: 遇到无法解析的内容 (已解析出的命令照常产出，调用方决定截断还是放弃)
+    """
+    d = d or ''
+    n = len(d)
+    pos = _SEP_RE.match(d).end()
+    x = y = start_x = start_y = 0.0
+    cmd = None
+    while pos < n:
+        ch = d[pos]
+        if ch.upper() in _PARAM_COUNT:
+            cmd = ch
+            pos = _SEP_RE.match(d, pos + 1).end()
+            if cmd in 'Zz':
+                x, y = start_x, start_y
+                cmd = None
+                yield 'Z', []
+            continue
+        if cmd is None:
+            raise ValueError(f'路径数据无效 (第 {pos} 个字符): {d[pos:pos + 16]!r}')
+
+        upper = cmd.upper()
+        args = []
+        for j in range(_PARAM_COUNT[upper]):
+            m = (_FLAG_RE if upper == 'A' and j in (3, 4) else _NUM_RE).match(d, pos)
+            if m is None:
+                raise ValueError(f'路径数据无效 (第 {pos} 个字符): {d[pos:pos + 16]!r}')
+            args.append(float(m.group()))
+            pos = _SEP_RE.match(d, m.end()).end()
+        rel = cmd.islower()
+
+        if upper == 'H':
+            x = x + args[0] if rel else args[0]
+            yield 'H', [x]
+        elif upper == 'V':
+            y = y + args[0] if rel else args[0]
+            yield 'V', [y]
+        elif upper == 'A':
+            x = x + args[5] if rel else args[5]
+            y = y + args[6] if rel else args[6]
+            yield 'A', args[:5] + [x, y]
+        else:
+            if rel:
+                args = [v + (x if j % 2 == 0 else y) for j, v in enumerate(args)]
+            x, y = args[-2], args[-1]
+            yield upper, args
+            if upper == 'M':
+                start_x, start_y = x, y
+                # M 之后的坐标对按 L 处理
+                cmd = 'l' if rel else 'L'
+
+
+def path_points(d):
+    """
+    把 path 展开成绝对坐标点 (含贝塞尔控制点，圆弧只取终点)
+    控制点的包围盒一定包住曲线本身，用来算 bbox 足够
+    """
+    x = y = 0.0
+    commands = path_commands(d)
+    while True:
+        # 与浏览器一致：出错之前的部分照常绘制，所以 bbox 也只算到出错处
+        try:
+            cmd, args = next(commands)
+        except (StopIteration, ValueError):
+            return
+        if cmd == 'Z':
+            continue
+        if cmd == 'H':
+            x = args[0]
+            yield x, y
+        elif cmd == 'V':
+            y = args[0]
+            yield x, y
+        elif cmd == 'A':
+            x, y = args[5], args[6]
+            yield x, y
+        else:
+            for j in range(0, len(args), 2):
+                yield args[j], args[j + 1]
+            x, y = args[-2], args[-1]
+
+
+def points_bbox(points):
+    """[min_x, min_y, max_x, max_y]，没有点时返回 None"""
+    xs = []
+    ys = []
+    for px, py in points:
+        xs.append(px)
+        ys.append(py)
+    if not xs:
+        return None
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def path_bbox(d):
+    return points_bbox(path_points(d))
+
+
+def parse_transform(text):
+    """解析 transform 属性，返回仿射矩阵 (a, b, c, d, e, f)"""
+    m = IDENTITY
+    if not text:
+        return m
+    for name, args in re.findall(r'(\w+)\s*\(([^)]*)\)', text):
+        v = [float(t) for t in _NUM_RE.findall(args)]
+        if name == 'matrix' and len(v) == 6:
+            t = tuple(v)
+        elif name == 'translate' and v:
+            t = (1, 0, 0, 1, v[0], v[1] if len(v) > 1 else 0)
+        elif name == 'scale' and v:
+            t = (v[0], 0, 0, v[1] if len(v) > 1 else v[0], 0, 0)
+        elif name == 'rotate' and v:
+            a = math.radians(v[0])
+            cos, sin = math.cos(a), math.sin(a)
+            t = (cos, sin, -sin, cos, 0, 0)
+            if len(v) == 3:
+                cx, cy = v[1], v[2]
+                t = multiply(multiply((1, 0, 0, 1, cx, cy), t), (1, 0, 0, 1, -cx, -cy))
+        elif name == 'skewX' and v:
+            t = (1, 0, math.tan(math.radians(v[0])), 1, 0, 0)
+        elif name == 'skewY' and v:
+            t = (1, math.tan(math.radians(v[0])), 0, 1, 0, 0)
+        else:
+            continue
+        m = multiply(m, t)
+    return m
+
+
+def multiply(m1, m2):
+    """矩阵乘法 m1 × m2 (先应用 m2 再应用 m1)"""
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1 * a2 + c1 * b2, b1 * a2 + d1 * b2,
+            a1 * c2 + c1 * d2, b1 * c2 + d1 * d2,
+            a1 * e2 + c1 * f2 + e1, b1 * e2 + d1 * f2 + f1)
+
+
+def transform_bbox(m, bbox):
+    """把局部坐标的 bbox 经过矩阵变换后，重新取轴对齐包围盒"""
+    if bbox is None or m == IDENTITY:
+        return bbox
+    a, b, c, d, e, f = m
+    x0, y0, x1, y1 = bbox
+    corners = [(x0, y0), (x1, y0), (x0, y1), (x1, y1)]
+    return points_bbox((a * px + c * py + e, b * px + d * py + f) for px, py in corners)
+
+
+# === 路径压缩 ===
+# 坐标精度 (小数位数) 的允许范围；负数会让量化网格大于 1，路径被改坏
+MAX_PRECISION = 6
+
+
+def check_precision(precision):
+    """:raises ValueError: precision 不是 0..MAX_PRECISION 的整数"""
+    if isinstance(precision, bool) or not isinstance(precision, int) or not 0 <= precision <= MAX_PRECISION:
+        raise ValueError(f'坐标精度必须是 0-{MAX_PRECISION} 的整数: {precision!r}')
+
+
+def _fmt(n, precision):
+    """把量化后的整数按精度输出为最短的数字写法 (0.50 -> .5, -0.5 -> -.5)"""
+    sign = '-' if n < 0 else ''
+    ip, fp = divmod(abs(n), 10 ** precision)
+    frac = str(fp).rjust(precision, '0').rstrip('0') if precision > 0 else ''
+    text = (str(ip) if ip or not frac else '') + ('.' + frac if frac else '')
+    return sign + text
+
+
+def _join(tokens):
+    """拼接命令和数字，只在必须时加空格"""
+    out = []
+    prev = ''
+    for t in tokens:
+        if out and not t.isalpha() and not prev.isalpha():
+            if not (t[0] == '-' or (t[0] == '.' and '.' in prev)):
+                out.append(' ')
+        out.append(t)
+        prev = t
+    return ''.join(out)
+
+
+def minify_path(d, precision=2):
+    """
+    [路径压缩] 坐标量化到 precision 位小数，改写成相对命令，
+    去掉量化后重合的点和直线中间的共线点，并去掉多余空白
+    量化在绝对坐标上进行，相对坐标由量化后的整数相减得到，不会累积误差
+    路径数据有无法解析的内容时原样返回 d，不做截断
+    :raises ValueError: precision 超出范围 (见 check_precision)
+    """
+    check_precision(precision)
+    scale = 10 ** precision
+    try:
+        commands = list(path_commands(d))
+    except ValueError:
+        return d
+
+    def q(v):
+        return int(math.floor(v * scale + 0.5))
+
+    # 1. 绝对坐标量化 (整数网格)，H/V 统一成 L 便于去点
+    cmds = []
+    x = y = start_x = start_y = 0
+    for cmd, args in commands:
+        if cmd == 'Z':
+            cmds.append(('Z', []))
+            x, y = start_x, start_y
+            continue
+        if cmd == 'A':
+            qa = [abs(q(args[0])), abs(q(args[1])), q(args[2]), int(args[3]), int(args[4]), q(args[5]), q(args[6])]
+        elif cmd == 'H':
+            cmd, qa = 'L', [q(args[0]), y]
+        elif cmd == 'V':
+            cmd, qa = 'L', [x, q(args[0])]
+        else:
+            qa = [q(v) for v in args]
+        cmds.append((cmd, qa))
+        x, y = qa[-2], qa[-1]
+        if cmd == 'M':
+            start_x, start_y = x, y
+
+    # 2. 去掉零长度线段和共线的中间点
+    kept = []
+    x = y = start_x = start_y = 0
+    for k, (cmd, qa) in enumerate(cmds):
+        if cmd == 'L':
+            nxt = cmds[k + 1] if k + 1 < len(cmds) else None
+            # S/T 依赖前一条命令的控制点，它们前面的点不能删
+            if nxt is not None and nxt[0] in 'ST':
+                pass
+            elif (qa[0], qa[1]) == (x, y):
+                continue
+            elif kept and kept[-1][0] in 'ML' and nxt is not None and nxt[0] == 'L':
+                x2, y2 = nxt[1]
+                v1 = (qa[0] - x, qa[1] - y)
+                v2 = (x2 - qa[0], y2 - qa[1])
+                if v1[0] * v2[1] - v1[1] * v2[0] == 0 and v1[0] * v2[0] + v1[1] * v2[1] > 0:
+                    continue
+        kept.append((cmd, qa))
+        if cmd == 'Z':
+            x, y = start_x, start_y
+        else:
+            x, y = qa[-2], qa[-1]
+            if cmd == 'M':
+                start_x, start_y = x, y
+
+    # 3. 输出相对命令
+    tokens = []
+    x = y = start_x = start_y = 0
+    prev = None
+    for cmd, qa in kept:
+        if cmd == 'Z':
+            letter, nums = 'z', []
+            x, y = start_x, start_y
+        elif cmd == 'L' and qa[1] == y:
+            letter, nums = 'h', [_fmt(qa[0] - x, precision)]
+        elif cmd == 'L' and qa[0] == x:
+            letter, nums = 'v', [_fmt(qa[1] - y, precision)]
+        elif cmd == 'A':
+            letter = 'a'
+            nums = [_fmt(qa[0], precision), _fmt(qa[1], precision), _fmt(qa[2], precision),
+                    str(qa[3]), str(qa[4]), _fmt(qa[5] - x, precision), _fmt(qa[6] - y, precision)]
+        else:
+            letter = cmd.lower()
+            nums = [_fmt(v - (x if j % 2 == 0 else y), precision) for j, v in enumerate(qa)]
+
+        if cmd != 'Z':
+            x, y = qa[-2], qa[-1]
+            if cmd == 'M':
+                start_x, start_y = x, y
+
+        # 与上一条命令相同 (或 m 之后的 l) 时可省略命令字母
+        if not (letter == prev and letter not in 'mz') and not (prev == 'm' and letter == 'l'):
+            tokens.append(letter)
+        tokens.extend(nums)
+        prev = letter
+
+    return _join(tokens)
@@ -0,0 +1,171 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# 已结束的任务最多保留多少个 (供前端查询结果)，更早的丢弃
+KEEP_FINISHED = 100
+
+
+class JobCancelled(Exception):
+    """任务被取消：由 Job.check() / Job.update() 在任务线程里抛出"""
+
+
+class Job:
+    """
+    一个后台任务的状态
+    status: queued -> running -> done / failed / cancelled
+    任务函数通过 update(...) 汇报进度；取消只是设置标志，任务在下一次汇报进度时停下
+    """
+
+    def __init__(self, job_id, kind, key):
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.status = 'queued'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        """已被取消则抛出 JobCancelled"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def update(self, **progress):
+        """汇报进度 (顺带检查取消)"""
+        self.progress.update(progress)
+        self.check()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'result': self.result,
+            'error': self.error,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+
+class JobQueue:
+    """
+    [后台任务队列] 线程池执行上传/导入/渲染这类耗时操作，请求立即返回任务ID
+    - 相同 key 的任务还在排队或执行时，再次提交直接返回那个任务 (去重)
+    - cancel(): 排队中的任务直接取消；执行中的任务在下一次汇报进度时停下
+    任务主要耗时在文件读写和 expat 解析上，用线程即可，不需要把工作区数据跨进程传递
+    """
+
+    def __init__(self, max_workers=2, keep=KEEP_FINISHED):
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = OrderedDict()   # 任务ID -> Job (按提交顺序)
+        self._active = {}            # key -> 排队中/执行中的 Job
+        self._lock = threading.Lock()
+
+    def submit(self, kind, key, fn, cleanup=None):
+        """
+        提交任务
+        :param key: 去重键 (None 表示不去重)
+        :param fn: fn(job) 在线程池中执行，返回值 (可 JSON 序列化) 作为任务结果
+        :param cleanup: 任务结束后 (无论成功、失败还是取消) 调用，用来删除临时文件；
+                        被去重合并时立即调用
+        :return: (job, 是否新建)
+        """
+        with self._lock:
+            existing = self._active.get(key) if key is not None else None
+            if existing is not None:
+                if cleanup:
+                    cleanup()
+                return existing, False
+            job = Job(uuid.uuid4().hex[:16], kind, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active[key] = job
+        self._executor.submit(self._run, job, fn, cleanup)
+        return job, True
+
+    def _run(self, job, fn, cleanup):
+        try:
+            with self._lock:
+                if job.cancelled:
+                    return
+                job.status = 'running'
+                job.started = time.time()
+            try:
+                job.result = fn(job)
+                job.status = 'done'
+            except JobCancelled:
+                job.status = 'cancelled'
+            except Exception as e:
+                traceback.print_exc()
+                job.error = str(e)
+                job.status = 'cancelled' if job.cancelled else 'failed'
+        finally:
+            if cleanup:
+                cleanup()
+            self._finish(job)
+
+    def _finish(self, job):
+        if job.finished is None:
+            job.finished = time.time()
+        with self._lock:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            self._prune()
+
+    def _prune(self):
+        """丢弃最早结束的任务，只保留 keep 个 (调用方持有锁)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished is not None]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        取消任务；已结束的任务不受影响
+        :return: Job，任务不存在时返回 None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished is not None:
+                return job
+            job._cancel.set()
+            if job.status == 'queued':
+                # 还没开始：立即标记为取消，线程池轮到它时直接跳过
+                job.status = 'cancelled'
+                job.finished = time.time()
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+        return job
+
+    def result_keys(self):
+        """仍保留的任务结果里引用的渲染缓存键 (清理渲染缓存时跳过)"""
+        with self._lock:
+            return {job.result['key'] for job in self._jobs.values()
+                    if isinstance(job.result, dict) and 'key' in job.result}
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self):
+        for job in self.list():
+            job._cancel.set()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import deque
+
+# 每个 (接口, 阶段) 只保留最近 WINDOW 次耗时，用来算滚动分位数
+WINDOW = 1024
+
+
+class Metrics:
+    """
+    [性能指标] 按接口 + 阶段累积耗时，并统计选区数、输出字节数等计数器
+    记录一次只是往 deque 里追加一个浮点数，生产环境常开也几乎没有开销；
+    分位数只在 /api/metrics 被访问时才排序计算
+    """
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}     # (接口, 阶段) -> deque[毫秒]
+        self._counters = {}    # 接口 -> {计数器名: 值}
+
+    def timer(self, endpoint):
+        return RequestTimer(self, endpoint)
+
+    def record(self, endpoint, durations, counters=None):
+        """durations: [(阶段名, 毫秒), ...]；counters: {名称: 增量}"""
+        with self._lock:
+            for stage, ms in durations:
+                samples = self._samples.get((endpoint, stage))
+                if samples is None:
+                    samples = self._samples[(endpoint, stage)] = deque(maxlen=self.window)
+                samples.append(ms)
+            totals = self._counters.setdefault(endpoint, {'requests': 0})
+            totals['requests'] += 1
+            for name, value in (counters or {}).items():
+                totals[name] = totals.get(name, 0) + value
+
+    def snapshot(self):
+        """{接口: {'stages': {阶段: {count, mean, p50, p95, p99, max}}, 'counters': {...}}}，单位毫秒"""
+        with self._lock:
+            samples = {k: list(v) for k, v in self._samples.items()}
+            counters = {k: dict(v) for k, v in self._counters.items()}
+
+        result = {}
+        for (endpoint, stage), values in samples.items():
+            values.sort()
+            n = len(values)
+            result.setdefault(endpoint, {'stages': {}, 'counters': {}})['stages'][stage] = {
+                'count': n,
+                'mean': round(sum(values) / n, 3),
+                'p50': round(values[min(n - 1, int(n * 0.50))], 3),
+                'p95': round(values[min(n - 1, int(n * 0.95))], 3),
+                'p99': round(values[min(n - 1, int(n * 0.99))], 3),
+                'max': round(values[-1], 3),
+            }
+        for endpoint, values in counters.items():
+            result.setdefault(endpoint, {'stages': {}, 'counters': {}})['counters'] = values
+        return result
+
+
+class RequestTimer:
+    """
+    一次请求内的分阶段计时
+        timer = metrics.timer('process')
+        with timer('clean'):
+            ...
+        return timer.finish(resp)   # 写 Server-Timing 响应头并计入 Metrics
+    """
+
+    def __init__(self, metrics, endpoint):
+        self.metrics = metrics
+        self.endpoint = endpoint
+        self.start = time.perf_counter()
+        self.durations = []
+        self.counters = {}
+        self.recorded = False
+
+    def __call__(self, stage):
+        return _Stage(self, stage)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def header(self):
+        parts = [f'{stage};dur={ms:.2f}' for stage, ms in self.durations]
+        parts.append(f'total;dur={(time.perf_counter() - self.start) * 1000:.2f}')
+        return ', '.join(parts)
+
+    def finish(self, resp):
+        """给 Flask 响应加上 Server-Timing 头，并把本次请求计入统计"""
+        resp.headers['Server-Timing'] = self.header()
+        self.count('bytes_out', resp.content_length or 0)
+        self.record()
+        return resp
+
+    def record(self):
+        """把本次计时计入统计 (后台任务没有响应对象，直接调用这个)；重复调用只计一次"""
+        if self.recorded:
+            return
+        self.recorded = True
+        total = (time.perf_counter() - self.start) * 1000
+        self.metrics.record(self.endpoint, self.durations + [('total', total)], self.counters)
+
+
+class _Stage:
+    __slots__ = ('timer', 'name', 'start')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.durations.append((self.name, (time.perf_counter() - self.start) * 1000))
+        return False
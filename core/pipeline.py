@@ -0,0 +1,120 @@
+import json
+import os
+import time
+
+from . import renderer, svg_processor
+from .concurrency import atomic_write
+from .render_cache import RenderCache
+from .workspace import Workspace
+
+# 工作区目录下记录各阶段输入的文件，用来判断哪些阶段可以跳过
+STATE_FILE = 'pipeline.json'
+
+
+class Pipeline:
+    """
+    [无界面流水线] 清洗 -> 导入 -> 拼合 -> 渲染，直接调用核心模块，不经过 Flask
+    工作区目录布局与服务器的工作区相同 (<目录>/svg + <目录>/data)，
+    所以既可以单独使用，也可以直接处理 static/workspaces/<ID>
+    各阶段的输入 (文件内容哈希 / 渲染参数) 记录在 pipeline.json，输入没变时跳过该阶段：
+      - 清洗: 原始 SVG 的哈希 + 坐标精度
+      - 导入: 旧版 CSV 的哈希
+      - 渲染: 与 RenderCache 相同的键 (几何哈希, 数据哈希, 标题, 描边)，且输出文件还在
+    """
+
+    def __init__(self, workspace_dir, backend='csv'):
+        self.dir = workspace_dir
+        ws_id = os.path.basename(os.path.normpath(workspace_dir)) or 'cli'
+        self.ws = Workspace(ws_id, os.path.join(workspace_dir, 'svg'), os.path.join(workspace_dir, 'data'), backend)
+        self.state_path = os.path.join(workspace_dir, STATE_FILE)
+        self.state = self._load_state()
+        self.timings = []   # [(阶段, 秒, 是否跳过)]
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self):
+        def writer(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=1)
+        atomic_write(self.state_path, writer)
+
+    def _timed(self, stage, fn):
+        start = time.perf_counter()
+        result = fn()
+        self.timings.append((stage, time.perf_counter() - start, False))
+        return result
+
+    def _skipped(self, stage):
+        self.timings.append((stage, 0.0, True))
+
+    def clean(self, svg_path, precision=None, force=False, progress_callback=None):
+        """
+        清洗原始 SVG 到工作区的 cleaned.svg
+        :return: 是否实际执行了清洗
+        :raises RuntimeError: 清洗失败
+        """
+        stamp = {'digest': svg_processor.file_digest(svg_path), 'precision': precision}
+        if not force and self.state.get('clean') == stamp and os.path.exists(self.ws.cleaned_svg):
+            self._skipped('clean')
+            return False
+        ok, _ = self._timed('clean', lambda: svg_processor.clean_and_extract_ids(
+            svg_path, self.ws.cleaned_svg, progress_callback, precision))
+        if not ok:
+            raise RuntimeError(f'SVG清洗失败: {svg_path}')
+        self.state['clean'] = stamp
+        self._save_state()
+        return True
+
+    def import_csv(self, csv_path, force=False, progress_callback=None):
+        """
+        导入旧版 CSV (覆盖工作区数据)
+        :return: 导入结果 (DataManager.last_import)；输入没变而跳过时返回 None
+        :raises RuntimeError: 导入失败
+        """
+        digest = svg_processor.file_digest(csv_path)
+        if not force and self.state.get('import') == digest:
+            self._skipped('import')
+            return None
+        ok, msg = self._timed('import', lambda: self.ws.data.import_from_legacy_v2(csv_path, progress_callback))
+        if not ok:
+            raise RuntimeError(f'数据导入失败: {msg}')
+        self.state['import'] = digest
+        self._save_state()
+        return self.ws.data.last_import
+
+    def render_key(self, map_title, stroke_width):
+        """当前几何 + 数据 + 参数对应的渲染键 (与服务器的渲染缓存键相同)"""
+        return RenderCache.key_for(svg_processor.file_digest(self.ws.cleaned_svg), self.ws.data.data_digest(),
+                                   map_title, stroke_width)
+
+    def render(self, output_path, map_title, stroke_width='1.0', force=False):
+        """
+        拼合数据并渲染到 output_path (原子写入)
+        :return: 是否实际执行了渲染
+        :raises RuntimeError: 还没有清洗过的 SVG / 渲染失败
+        """
+        if not os.path.exists(self.ws.cleaned_svg):
+            raise RuntimeError('工作区还没有清洗过的 SVG，请先指定 --svg')
+        key = self.render_key(map_title, stroke_width)
+        renders = self.state.setdefault('renders', {})
+        out_key = os.path.abspath(output_path)
+        if not force and renders.get(out_key) == key and os.path.exists(output_path):
+            self._skipped('render')
+            return False
+
+        district_data, party_colors, party_seats = self._timed('join', self.ws.data.get_joined_data)
+        ok, msg = self._timed('render', lambda: renderer.render_map_from_data(
+            self.ws.cleaned_svg, output_path, district_data, party_colors, party_seats, map_title, stroke_width))
+        if not ok:
+            raise RuntimeError(f'渲染失败: {msg}')
+        renders[out_key] = key
+        self._save_state()
+        return True
+
+    def close(self):
+        self.ws.close()
@@ -0,0 +1,105 @@
+import gzip
+import hashlib
+import json
+import os
+
+from .concurrency import atomic_write
+
+
+class RenderCache:
+    """
+    [渲染缓存] 以 (几何哈希, 数据哈希, 标题, 描边) 的内容哈希为键保存渲染结果
+    每个键对应三个文件：
+      <key>.svg       渲染出的 SVG
+      <key>.svg.gz    预压缩的 SVG (下载用)
+      <key>.json.gz   预压缩的 /api/process 响应体
+    同样的输入再渲染一次时直接复用，不再重新画图
+    清理旧缓存时跳过刚写入的键和 pinned() 返回的键 (例如后台任务结果里的 result_url)；
+    其他进程仍可能在读取期间删掉文件，所以 read() 的调用方要处理 FileNotFoundError
+    """
+
+    def __init__(self, folder, max_entries=50, pinned=None):
+        self.folder = folder
+        self.max_entries = max_entries
+        self.pinned = pinned
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def key_for(geometry_digest, data_digest, title, stroke_width):
+        h = hashlib.sha1()
+        for part in (geometry_digest, data_digest, title, stroke_width):
+            h.update(str(part).encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()[:20]
+
+    def svg_path(self, key):
+        return os.path.join(self.folder, f'{key}.svg')
+
+    def _gz_path(self, key, kind):
+        return os.path.join(self.folder, f'{key}.{kind}.gz')
+
+    def has(self, key):
+        # json.gz 最后写入，它存在就说明整组文件都已就绪
+        return os.path.exists(self._gz_path(key, 'json'))
+
+    def touch(self, key):
+        """缓存命中时刷新修改时间，清理按最近使用的顺序保留"""
+        try:
+            os.utime(self._gz_path(key, 'json'))
+        except FileNotFoundError:
+            pass
+
+    def put(self, key, payload):
+        """
+        renderer 已把 SVG 写到 svg_path(key) 之后调用：生成压缩版本并清理旧缓存
+        payload: 响应 JSON 里除 svg_content 以外的字段
+        """
+        with open(self.svg_path(key), 'rb') as f:
+            svg_bytes = f.read()
+        body = dict(payload, svg_content=svg_bytes.decode('utf-8'))
+        json_bytes = json.dumps(body, ensure_ascii=False).encode('utf-8')
+
+        for kind, data in (('svg', svg_bytes), ('json', json_bytes)):
+            compressed = gzip.compress(data, compresslevel=6)
+
+            def write(tmp_path):
+                with open(tmp_path, 'wb') as f:
+                    f.write(compressed)
+            atomic_write(self._gz_path(key, kind), write)
+
+        self._prune(keep={key})
+
+    def read(self, key, kind, compressed):
+        """读取缓存内容；compressed=False 时返回解压后的原文"""
+        if kind == 'svg' and not compressed:
+            with open(self.svg_path(key), 'rb') as f:
+                return f.read()
+        with open(self._gz_path(key, kind), 'rb') as f:
+            data = f.read()
+        return data if compressed else gzip.decompress(data)
+
+    def _prune(self, keep=()):
+        """只保留最近的 max_entries 组结果 (含 keep)；keep 和 pinned() 里的键不删除"""
+        limit = max(0, self.max_entries - len(keep))
+        keep = set(keep)
+        if self.pinned is not None:
+            keep.update(self.pinned())
+        entries = []
+        for name in os.listdir(self.folder):
+            if name.endswith('.json.gz'):
+                path = os.path.join(self.folder, name)
+                key = name[:-len('.json.gz')]
+                if key in keep:
+                    continue
+                try:
+                    entries.append((os.path.getmtime(path), key))
+                except FileNotFoundError:
+                    continue    # 另一个请求刚清理掉
+        entries.sort(reverse=True)
+        for _, key in entries[limit:]:
+            # 先删 json.gz：has() 随即返回 False，不会再有新请求引用这个键
+            for path in (self._gz_path(key, 'json'), self._gz_path(key, 'svg'), self.svg_path(key)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
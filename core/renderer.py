@@ -1,12 +1,17 @@
 import xml.etree.ElementTree as ET
 import csv
+import io
 import os
+import re
+import threading
 # 从同级目录的 color_utils.py 导入颜色算法函数
-from .color_utils import get_color_intensity, boost_saturation
+from .color_utils import ramp_colors, boost_saturation
+from .svg_processor import load_index, _escape_attr
+from .concurrency import atomic_write
 
 def add_top_legend(root, party_colors, party_seats, custom_title, stroke_width=1.0):
     """
-    [纯函数] 在地图顶部绘制图例
+    [纯函数] 在地图顶部绘制图例，返回图例组节点
     参数:
       root: SVG的根节点对象
       party_colors: 政党颜色字典
@@ -51,7 +56,7 @@ def add_top_legend(root, party_colors, party_seats, custom_title, stroke_width=1
     title_node.set('y', str(title_y))
     title_node.set('style', "font-size:128px; font-family:sans-serif; font-weight:bold; text-anchor:middle; fill:#000000;")
 
-    if not party_colors: return
+    if not party_colors: return legend_group
 
     # C. 绘制垂直色阶柱状图
     num_parties = len(party_colors)
@@ -83,10 +88,9 @@ def add_top_legend(root, party_colors, party_seats, custom_title, stroke_width=1
         current_x = start_x + i * (col_width + gap_width)
         text_center_x = current_x + col_width/2
         
-        # 2.1 色阶块
-        for j, ratio in enumerate(ratios):
-            # 注意：这里直接调用导入的函数，不需要 self.
-            fill_color = get_color_intensity(p_color, ratio)
+        # 2.1 色阶块 (与地图上色同一张色阶表，图例颜色和选区颜色逐一对应)
+        fills = ramp_colors([p_color] * len(ratios), ratios)
+        for j, fill_color in enumerate(fills):
             rect_y = bar_bottom_y - (j + 1) * step_height
             
             block = ET.SubElement(legend_group, 'rect')
@@ -139,11 +143,233 @@ def add_top_legend(root, party_colors, party_seats, custom_title, stroke_width=1
         seat_text.set('y', str(text_y + last_line_y_offset + 35)) 
         seat_text.set('style', f"font-size:32px; font-family:sans-serif; font-weight:bold; text-anchor:middle; fill:{pure_hex};")
 
+    return legend_group
+
+
+# === 模板缓存 ===
+# cleaned.svg 解析一次后常驻内存，之后每次渲染只改动数据有变化的选区
+_template_cache = {}
+_cache_lock = threading.Lock()
+
+# _style_district 会改写的属性；其余属性在模板里固定不变
+_DATA_ATTRS = ('data-rate', 'data-party', 'data-seats', 'data-org-color', 'data-alloc', 'style')
+
+
+class MapTemplate:
+    """
+    已解析的 SVG 模板 + 选区索引
+    - districts: 选区ID -> [path 节点]
+    - applied:   选区ID -> 上次渲染时使用的数据 (用于增量比对)
+    """
+
+    def __init__(self, svg_path):
+        stat = os.stat(svg_path)
+        self.stamp = (stat.st_mtime, stat.st_size)
+        self.lock = threading.Lock()
+
+        ET.register_namespace("", "http://www.w3.org/2000/svg")
+        self.tree = ET.parse(svg_path)
+        self.root = self.tree.getroot()
+        self.view_box = self.root.get('viewBox')
+
+        self.blanks = []      # 空白省份
+        self.borders = []     # 省界
+        self.districts = {}   # 选区
+
+        # 优先使用清洗时保存的索引：按文档顺序把 path 与索引条目一一对应
+        index = load_index(svg_path)
+        paths = [e for e in self.root.iter() if e.tag.split('}')[-1] == 'path']
+        if index is not None and len(index['ids']) == len(paths):
+            for element, d_id, kind in zip(paths, index['ids'], index['kinds']):
+                if kind == 'blank':
+                    self.blanks.append(element)
+                elif kind == 'district':
+                    self.districts.setdefault(d_id, []).append(element)
+                elif kind == 'border':
+                    self.borders.append(element)
+        else:
+            # 旧工作区没有索引：退回到按父节点判断
+            parent_map = {c: p for p in self.tree.iter() for c in p}
+            for element in paths:
+                d_id = element.get('id', '')
+                parent = parent_map.get(element)
+                p_id = parent.get('id', '') if parent is not None else ''
+                p_name = parent.get('data-name', '') if parent is not None else ''
+
+                if "空白" in p_id or "空白" in p_name:
+                    self.blanks.append(element)
+                elif '-' in d_id:
+                    self.districts.setdefault(d_id, []).append(element)
+                elif d_id:
+                    self.borders.append(element)
+
+        self.applied = {}
+        self.matches = 0
+        self.stroke = None
+        self.legend = None
+
+        # 序列化缓存：整份文档切成字节片段，选区 path 和图例各占一个槽位
+        # parts 为 None 表示需要重新切分；splittable 为 False 时退回整树序列化
+        self.parts = None
+        self.slots = {}         # path 节点 -> (parts 下标, 不含可变属性的开始标签前缀)
+        self.legend_slot = None
+        self.splittable = True
+
+
+def get_template(svg_path):
+    """取缓存的模板；文件被重新上传 (mtime/大小变化) 时重新解析"""
+    stat = os.stat(svg_path)
+    key = os.path.abspath(svg_path)
+    with _cache_lock:
+        template = _template_cache.get(key)
+        if template is None or template.stamp != (stat.st_mtime, stat.st_size):
+            template = MapTemplate(svg_path)
+            _template_cache[key] = template
+        return template
+
+
+def release_template(svg_path):
+    """把模板移出缓存 (所属工作区被换出时调用)"""
+    with _cache_lock:
+        _template_cache.pop(os.path.abspath(svg_path), None)
+
+
+def _style_district(element, data, district_stroke):
+    """给单个选区节点上色并埋入数据，返回是否匹配到数据"""
+    if data:
+        seats = data.get('seats', 1)
+
+        if seats == 0:
+            # 0席位 (无改选)
+            fill_color = "#eeeeee"
+            rate_str = "非改选"
+            winner_str = "无"
+        else:
+            fill_color = data['color']
+            rate_str = f"{int(data['rate'] * 100)}%"
+            winner_str = data.get('winner_name', '')
+
+        # === 埋入更多数据供 JS 切换视图使用 ===
+        element.set('data-rate', rate_str)
+        element.set('data-party', winner_str)
+        element.set('data-seats', str(seats))           # 埋入席位
+        element.set('data-org-color', fill_color)       # 埋入原始选情色
+        allocation = data.get('allocation')
+        if allocation:
+            # 比例代表制选区：埋入各党席位分配
+            element.set('data-alloc', '、'.join(f"{name}{n}" for name, n in allocation.items()))
+        else:
+            element.attrib.pop('data-alloc', None)
+        matched = True
+    else:
+        # 无数据
+        # 也要埋个默认值，防止 JS 报错
+        element.attrib.pop('data-rate', None)
+        element.attrib.pop('data-party', None)
+        element.attrib.pop('data-alloc', None)
+        element.set('data-seats', "0")
+        fill_color = "#f0f0f0"
+        element.set('data-org-color', fill_color)
+        matched = False
+
+    style = f"fill:{fill_color}; stroke:#FFFFFF; stroke-width:{district_stroke}; stroke-linejoin:round;"
+    element.set('style', style)
+    return matched
+
+
+def _fragment(prefix, element):
+    """选区 path 的序列化字节：固定前缀 + 可变属性 (与 ElementTree 的转义 / 编码一致)"""
+    attrs = []
+    for name in _DATA_ATTRS:
+        value = element.get(name)
+        if value is not None:
+            attrs.append(f' {name}="{_escape_attr(value)}"')
+    return prefix + ''.join(attrs).encode('ascii', 'xmlcharrefreplace') + b' />'
+
+
+def _split_template(template):
+    """
+    [序列化缓存] 整树序列化一次，按选区 path 和图例切成字节片段
+    每个选区 path 前插一个注释标记，序列化后按标记切开；path 本身先摘掉可变属性，
+    这样切出来的开始标签前缀之后可以直接拼接，只需重新生成可变属性
+    选区 path 有子节点或文本时无法这样拼接，返回 False
+    """
+    root = template.root
+    elements = [e for group in template.districts.values() for e in group]
+    if any(len(e) or e.text for e in elements):
+        return False
+
+    token = f'mapstudio-{os.urandom(6).hex()}'
+    order = {e: k for k, e in enumerate(elements)}
+    parents = {p for p in root.iter() for c in p if c in order}
+    legend_marker = ET.Comment(f'{token}:legend')
+    saved = []
+    try:
+        for e in elements:
+            saved.append([(name, e.attrib.pop(name)) for name in _DATA_ATTRS if name in e.attrib])
+        for parent in parents:
+            children = []
+            for child in parent:
+                if child in order:
+                    children.append(ET.Comment(f'{token}:{order[child]}'))
+                children.append(child)
+            parent[:] = children
+        if template.legend is not None:
+            root[list(root).index(template.legend)] = legend_marker
+
+        buf = io.BytesIO()
+        template.tree.write(buf)
+        data = buf.getvalue()
+    finally:
+        # 还原节点树：去掉标记，放回图例和可变属性
+        for parent in parents:
+            parent[:] = [c for c in parent if c.tag is not ET.Comment or not (c.text or '').startswith(token)]
+        if template.legend is not None and legend_marker in list(root):
+            root[list(root).index(legend_marker)] = template.legend
+        for e, attrs in zip(elements, saved):
+            for name, value in attrs:
+                e.set(name, value)
+
+    pieces = re.split(rb'<!--' + token.encode() + rb':(\d+)-->', data)
+    parts = [pieces[0]]
+    slots = {}
+    for k in range(1, len(pieces), 2):
+        element = elements[int(pieces[k])]
+        piece = pieces[k + 1]
+        # 属性值里的 > 都已转义，第一个 > 就是 path 开始标签的结尾
+        end = piece.index(b'>') + 1
+        if piece[end - 3:end] != b' />':
+            return False
+        slots[element] = (len(parts), piece[:end - 3])
+        parts.append(_fragment(piece[:end - 3], element))
+        parts.append(piece[end:])
+
+    legend_slot = None
+    if template.legend is not None:
+        marker = f'<!--{token}:legend-->'.encode()
+        # 偶数下标是固定片段；图例是根节点最后一个子节点，从后往前找
+        for k in range(len(parts) - 1, -1, -2):
+            part = parts[k]
+            if marker in part:
+                before, after = part.split(marker)
+                parts[k:k + 1] = [before, ET.tostring(template.legend), after]
+                legend_slot = k + 1
+                # 图例之后的槽位整体后移两位
+                slots = {e: (idx + 2 if idx > k else idx, prefix) for e, (idx, prefix) in slots.items()}
+                break
+
+    template.parts = parts
+    template.slots = slots
+    template.legend_slot = legend_slot
+    return True
+
 
 def render_map_from_data(svg_path, output_path, district_data, party_colors, party_seats, map_title, stroke_width_str="1.0"):
     """
     [纯函数] 接收处理好的数据字典，渲染SVG并保存
     不再负责读取CSV文件，只负责画图
+    模板常驻内存：描边不变时只重绘数据有变化的选区和图例，
+    输出时也只重新序列化这些节点，其余部分直接拼接缓存的字节
     """
     if not os.path.exists(svg_path):
         return False, "SVG 模板文件不存在"
@@ -159,75 +385,82 @@ def render_map_from_data(svg_path, output_path, district_data, party_colors, par
         province_stroke = base_stroke_width + 1.5 
         if province_stroke < 1.0: province_stroke = 1.5 
 
-        # === SVG 渲染 ===
-        ET.register_namespace("", "http://www.w3.org/2000/svg")
-        tree = ET.parse(svg_path)
-        root = tree.getroot()
-        parent_map = {c: p for p in tree.iter() for c in p}
-        
-        matches = 0
-        
-        for element in root.iter():
-            tag = element.tag.split('}')[-1]
-            if tag == 'path':
-                d_id = element.get('id', '')
-                parent = parent_map.get(element)
-                p_id = parent.get('id', '') if parent is not None else ''
-                p_name = parent.get('data-name', '') if parent is not None else ''
-                
+        template = get_template(svg_path)
+        with template.lock:
+            # === SVG 渲染 ===
+            if template.stroke != base_stroke_width:
+                # 描边变化 (或首次渲染)：全部重绘
                 # A. 空白省份 (白底黑边)
-                if "空白" in p_id or "空白" in p_name:
-                    style = f"fill:#FFFFFF; stroke:#000000; stroke-width:{province_stroke}; stroke-linejoin:round;"
+                style = f"fill:#FFFFFF; stroke:#000000; stroke-width:{province_stroke}; stroke-linejoin:round;"
+                for element in template.blanks:
                     element.set('style', style)
-                    
-                # B. 选区 (填色)
-                elif '-' in d_id:
-                    data = district_data.get(d_id)
-                    if data:
-                        seats = data.get('seats', 1)
-                        
-                        if seats == 0:
-                            # 0席位 (无改选)
-                            fill_color = "#eeeeee"
-                            rate_str = "非改选"
-                            winner_str = "无"
-                        else:
-                            fill_color = data['color']
-                            rate_str = f"{int(data['rate'] * 100)}%"
-                            winner_str = data.get('winner_name', '')
-
-                        # === 关键修改：埋入更多数据供 JS 切换视图使用 ===
-                        element.set('data-rate', rate_str)
-                        element.set('data-party', winner_str)
-                        element.set('data-seats', str(seats))           # 埋入席位
-                        element.set('data-org-color', fill_color)       # 埋入原始选情色
-                        
-                        style = f"fill:{fill_color}; stroke:#FFFFFF; stroke-width:{district_stroke}; stroke-linejoin:round;"
-                        element.set('style', style)
-                        matches += 1
-                    else:
-                        # 无数据
-                        # 也要埋个默认值，防止 JS 报错
-                        element.set('data-seats', "0")
-                        element.set('data-org-color', "#f0f0f0")
-                        
-                        style = f"fill:#f0f0f0; stroke:#FFFFFF; stroke-width:{district_stroke}; stroke-linejoin:round;"
-                        element.set('style', style)
-                    
+
                 # C. 省界 (透底黑边)
-                elif d_id:
-                    style = f"fill:none; stroke:#000000; stroke-width:{province_stroke}; stroke-linejoin:round; stroke-linecap:round;"
+                style = f"fill:none; stroke:#000000; stroke-width:{province_stroke}; stroke-linejoin:round; stroke-linecap:round;"
+                for element in template.borders:
                     element.set('style', style)
 
-        # === 添加图例 ===
-        add_top_legend(root, party_colors, party_seats, map_title, district_stroke)
-        
-        # === 保存 ===
-        tree.write(output_path)
-        
-        return True, f"成功渲染 {matches} 个选区"
+                changed = list(template.districts)
+                template.applied = {}
+                template.matches = 0
+                template.stroke = base_stroke_width
+                # 空白省份 / 省界的样式在固定片段里，需要重新切分
+                template.parts = None
+            else:
+                # 只挑出数据变化的选区
+                applied = template.applied
+                changed = [d_id for d_id in template.districts
+                           if district_data.get(d_id) != applied.get(d_id)]
+
+            # B. 选区 (填色)
+            for d_id in changed:
+                elements = template.districts[d_id]
+                data = district_data.get(d_id)
+                if template.applied.get(d_id):
+                    template.matches -= len(elements)
+                for element in elements:
+                    if _style_district(element, data, district_stroke):
+                        template.matches += 1
+                template.applied[d_id] = dict(data) if data else None
+
+            # === 重建图例 ===
+            root = template.root
+            if template.legend is not None:
+                root.remove(template.legend)
+                if template.view_box is None:
+                    root.attrib.pop('viewBox', None)
+                else:
+                    root.set('viewBox', template.view_box)
+            template.legend = add_top_legend(root, party_colors, party_seats, map_title, district_stroke)
+
+            # === 序列化 ===
+            if template.splittable and template.parts is None:
+                # 首次渲染 / 描边变化：整树序列化一次并切分
+                template.splittable = _split_template(template)
+            elif template.splittable:
+                # 只重新生成变化选区的 path 和图例，其余片段原样复用
+                for d_id in changed:
+                    for element in template.districts[d_id]:
+                        idx, prefix = template.slots[element]
+                        template.parts[idx] = _fragment(prefix, element)
+                if template.legend_slot is not None:
+                    template.parts[template.legend_slot] = ET.tostring(template.legend)
+            if template.splittable:
+                parts = template.parts
+
+                def writer(path):
+                    with open(path, 'wb') as f:
+                        f.writelines(parts)
+            else:
+                writer = template.tree.write
+
+            # === 保存 (临时文件 + rename，下载方不会读到写了一半的文件) ===
+            # 渲染结果随时能重新生成，不必等刷盘
+            atomic_write(output_path, writer, durable=False)
+
+        return True, f"成功渲染 {template.matches} 个选区"
 
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return False, str(e)
\ No newline at end of file
+        return False, str(e)
@@ -0,0 +1,104 @@
+import heapq
+
+# districts.csv 的 Type 列 -> 分配方法 (不区分大小写；未知类型按赢者通吃处理)
+_METHOD_ALIASES = {
+    'FPTP': 'fptp', 'SMD': 'fptp', 'WTA': 'fptp',
+    'DHONDT': 'dhondt', "D'HONDT": 'dhondt', 'DH': 'dhondt', 'PR': 'dhondt',
+    'SAINTE-LAGUE': 'sainte_lague', 'SAINTE_LAGUE': 'sainte_lague', 'SL': 'sainte_lague', 'WEBSTER': 'sainte_lague',
+    'LR': 'hare', 'HARE': 'hare', 'LARGEST_REMAINDER': 'hare',
+    'DROOP': 'droop',
+}
+
+# 除数法的第 k 个除数 (k 从 0 开始)
+_DIVISORS = {
+    'dhondt': lambda k: k + 1,
+    'sainte_lague': lambda k: 2 * k + 1,
+}
+
+
+def method_for(district_type):
+    """选区类型 -> 分配方法名"""
+    return _METHOD_ALIASES.get((district_type or '').strip().upper(), 'fptp')
+
+
+def _divisor_allocation(row, seats, divisor):
+    """
+    [除数法] 用最大堆每次取当前商最大的政党，取完把它的下一个商放回堆
+    并列时票数多者优先，再并列按列顺序
+    """
+    result = [0] * len(row)
+    heap = [(-v / divisor(0), -v, j) for j, v in enumerate(row) if v > 0]
+    heapq.heapify(heap)
+    for _ in range(seats):
+        if not heap:
+            break
+        _, neg_v, j = heapq.heappop(heap)
+        result[j] += 1
+        heapq.heappush(heap, (neg_v / divisor(result[j]), neg_v, j))
+    return result
+
+
+def _remainder_allocation(row, seats, quota):
+    """[最大余额法] 先按商的整数部分分配，剩余席位给余数最大的政党"""
+    result = [int(v // quota) for v in row]
+    left = seats - sum(result)
+    if left < 0:
+        # Droop 等小额度在极端情况下可能超配，退回按整数部分从小到大削减
+        for j in sorted(range(len(row)), key=lambda j: (row[j] % quota, row[j])):
+            if left == 0:
+                break
+            if result[j] > 0:
+                result[j] -= 1
+                left += 1
+    elif left > 0:
+        order = heapq.nlargest(left, range(len(row)), key=lambda j: (row[j] % quota, row[j], -j))
+        for j in order:
+            result[j] += 1
+    return result
+
+
+def allocate(row, seats, method):
+    """
+    把一个选区的 seats 个席位按 method 分给各政党
+    :param row: 各政党票数 (按列顺序)
+    :return: 各政党席位数列表；无票或无席位时全为 0
+    """
+    total = sum(row)
+    if seats <= 0 or total <= 0:
+        return [0] * len(row)
+
+    if method in _DIVISORS:
+        return _divisor_allocation(row, seats, _DIVISORS[method])
+    if method == 'hare':
+        return _remainder_allocation(row, seats, total / seats)
+    if method == 'droop':
+        return _remainder_allocation(row, seats, total // (seats + 1) + 1)
+
+    # 赢者通吃：得票最高者拿走全部席位
+    result = [0] * len(row)
+    result[row.index(max(row))] = seats
+    return result
+
+
+def allocate_store(store, rows=None):
+    """
+    [批量分配] 一次遍历为所有 (或指定的) 选区分配席位
+    :return: {行号: 各政党席位数列表}，只包含有效选区
+    """
+    methods = {}
+    result = {}
+    if rows is None:
+        # 整表：顺序扫描 (见 VoteStore.rows)
+        items = enumerate(zip(store.seats, store.rows()))
+    else:
+        items = ((i, (store.seats[i], store.row(i))) for i in rows)
+    for i, (seats, row) in items:
+        if not store.has_votes[i] or seats <= 0:
+            continue
+        d_type = store.types[i]
+        method = methods.get(d_type)
+        if method is None:
+            method = methods[d_type] = method_for(d_type)
+        if sum(row) > 0:
+            result[i] = allocate(row, seats, method)
+    return result
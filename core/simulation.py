@@ -0,0 +1,324 @@
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress, repeat, starmap
+from operator import lt
+
+from .seat_allocation import allocate, method_for
+from .swing_engine import shift_row, swing_row, winner_col
+from .tipping_index import NEG_INF
+
+# 每个任务块的模拟次数 (块的随机种子只由 总种子 + 块序号 决定，结果与进程数无关)
+CHUNK_ITERATIONS = 64
+# 总运算量 (需要抽样的选区数 × 次数，比例代表制选区按 PR_WORK 个计) 低于该值时
+# 直接在当前进程算，省掉进程启动和传数据的开销
+INLINE_WORK = 4000000
+PR_WORK = 20
+# 单次模拟次数上限；超出时 run_simulation 抛 ValueError (接口返回 400)，不会悄悄减少次数
+MAX_ITERATIONS = 20000
+# 获胜概率离 0 / 1 小于该值的选区视为结果确定，不再抽样
+SAFE_PROBABILITY = 1e-6
+# 比例代表制选区的摇摆取整到 max(PR_SWING_STEP, 噪声标准差 × PR_STEP_OF_NOISE) 后缓存分配结果
+PR_SWING_STEP = 1e-4
+PR_STEP_OF_NOISE = 0.2
+
+WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+_pool = None
+
+
+def _get_pool():
+    """进程池常驻复用，滑条连续拖动时不用反复启动进程"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=WORKERS)
+    return _pool
+
+
+def snapshot_from_store(store):
+    """
+    从 VoteStore 拷出模拟需要的数据 (可 pickle，之后与原数据完全脱钩)
+    只保留有票、有席位的选区
+    """
+    party_names = store.party_names()
+    snap = {
+        'parties': [party_names.get(pid, pid) for pid in store.party_ids],
+        'ids': [], 'provinces': [], 'seats': [], 'methods': [], 'votes': [],
+    }
+    for i, (d_id, seats, row) in enumerate(zip(store.district_ids, store.seats, store.rows())):
+        if not store.has_votes[i] or seats <= 0:
+            continue
+        row = row.tolist()
+        if sum(row) <= 0:
+            continue
+        snap['ids'].append(d_id)
+        snap['provinces'].append(store.province_ids[i])
+        snap['seats'].append(seats)
+        snap['methods'].append(method_for(store.types[i]))
+        snap['votes'].append(row)
+    return snap
+
+
+def _win_probability(threshold, base, noise_sd):
+    """选区摇摆 ~ N(base, noise_sd) 时超过阈值 (目标党胜出) 的概率"""
+    if threshold == NEG_INF:
+        return 1.0
+    if not noise_sd:
+        return 1.0 if base > threshold else 0.0
+    return 0.5 * math.erfc((threshold - base) / (noise_sd * math.sqrt(2.0)))
+
+
+def _flip_delta(row, t, lock_total, guess):
+    """
+    目标党在 shift_row 规则下胜出所需的最小整数变动量 (票数)
+    从连续近似的临界值 guess 出发向两侧倍增查找，再二分；取整只差几票，通常试一两次即可
+    分摊取整可能让临界点附近个别票数上的胜负来回跳，这时返回其中一个翻转点
+    (有噪声时个别票数的概率可以忽略；没有噪声时 build_model 直接逐选区摇摆，不用这个临界值)
+    :return: 最小变动量；目标党扣光票数仍胜出时返回 None
+    """
+    low = -row[t]
+
+    def wins(delta):
+        return winner_col(shift_row(row, t, delta, lock_total)) == t
+
+    d = max(low, math.floor(guess))
+    step = 1
+    if wins(d):
+        hi = d
+        while True:
+            lo = max(low, hi - step)
+            if lo == hi:
+                return None
+            if not wins(lo):
+                break
+            hi = lo
+            step *= 2
+    else:
+        lo = d
+        while True:
+            hi = lo + step
+            if wins(hi):
+                break
+            lo = hi
+            step *= 2
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if wins(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def build_model(snap, t, base_swings, noise_sd, lock_total):
+    """
+    [预处理] 在模拟循环之外，一次算好每个选区的总票数、得票率和临界摇摆：
+      - 赢者通吃 (FPTP) 选区的胜者只可能是目标党或其他党中票数最高者 (其他党按比例分摊，
+        相对大小不变)。目标党胜出 <=> 摇摆超过临界值，所以获胜概率有闭式解 (正态分布尾概率)，
+        翻转概率不需要抽样；概率接近 0 / 1 的选区直接计入常数项，只有势均力敌的选区每次模拟抽一次随机数
+        势均力敌的选区按 "输掉时的胜者" 分组，每组一次 C 层面的批量抽样
+      - 势均力敌的选区的临界值按 batch_swing_update 的整数规则 (delta = int(总票数 × 摇摆)、
+        分摊取整、并列取靠前者) 求出 (见 _flip_delta)，不用连续近似
+      - 没有噪声时每个 FPTP 选区直接按 swing_row 摇摆，结果与 batch_swing_update 逐票一致
+      - 比例代表制选区的分配结果不是单一阈值，仍按原摇摆规则 (swing_row) 计算，
+        但摇摆取整后缓存分配结果，同一取值只算一次
+    """
+    n_parties = len(snap['parties'])
+    fixed = [0] * n_parties
+    close = {}        # 输掉时的胜者 -> ([目标党获胜概率], [席位])
+    pr = []           # [(选区下标, 票数, 席位, 方法, 基础摇摆, 当前胜者)]
+    flip_prob = [0.0] * len(snap['ids'])
+
+    for k, row in enumerate(snap['votes']):
+        seats = snap['seats'][k]
+        base = base_swings[k]
+        baseline = winner_col(row)
+        if snap['methods'][k] != 'fptp':
+            pr.append((k, row, seats, snap['methods'][k], base, baseline))
+            continue
+
+        if not noise_sd:
+            # 结果确定：与 batch_swing_update 完全相同的摇摆和分配
+            swung = swing_row(row, t, base, lock_total)
+            for j, n in enumerate(allocate(swung, seats, 'fptp')):
+                fixed[j] += n
+            flip_prob[k] = 1.0 if winner_col(swung) != baseline else 0.0
+            continue
+
+        # 其他党中票数最高者 (并列取靠前者，与 winner_col 一致)
+        if n_parties > 1:
+            rest = list(row)
+            rest[t] = -1
+            other = rest.index(max(rest))
+            total = sum(row)
+            a = row[t] / total
+            b = row[other] / total
+            if lock_total:
+                # 同 tipping_index.flip_threshold
+                o = 1.0 - a
+                threshold = (b - a) * o / (o + b) if o > 0 and b > 0 else NEG_INF
+            else:
+                threshold = b - a
+        else:
+            other = None
+            threshold = NEG_INF
+        p = _win_probability(threshold, base, noise_sd)
+        if other is not None and SAFE_PROBABILITY < p < 1.0 - SAFE_PROBABILITY:
+            # 势均力敌：换成整数规则下的临界值
+            # 目标党胜出 <=> int(total × 摇摆) >= d，即 摇摆 >= d / total (d > 0) 或 > (d - 1) / total (d <= 0)
+            d = _flip_delta(row, t, lock_total, (a - 1.0 if threshold == NEG_INF else threshold) * total)
+            if d is None:
+                p = 1.0
+            else:
+                p = _win_probability(d / total if d > 0 else (d - 1) / total, base, noise_sd)
+        flip_prob[k] = 1.0 - p if baseline == t else p
+
+        if p >= 1.0 - SAFE_PROBABILITY or other is None:
+            fixed[t] += seats
+        elif p <= SAFE_PROBABILITY:
+            fixed[other] += seats
+        else:
+            probs, seat_list = close.setdefault(other, ([], []))
+            probs.append(p)
+            seat_list.append(seats)
+
+    return {
+        'parties': n_parties,
+        't': t,
+        'noise_sd': noise_sd,
+        'lock_total': lock_total,
+        'fixed': fixed,
+        'close': [(j, probs, seat_list, sum(seat_list)) for j, (probs, seat_list) in sorted(close.items())],
+        'pr_step': max(PR_SWING_STEP, noise_sd * PR_STEP_OF_NOISE),
+        'pr': pr,
+        'flip_prob': flip_prob,
+    }
+
+
+def sampled_work(model):
+    """每次模拟的运算量 (见 INLINE_WORK)"""
+    return sum(len(probs) for _, probs, _, _ in model['close']) + PR_WORK * len(model['pr'])
+
+
+def _run_chunk(model, seed, iterations):
+    """
+    [工作进程] 跑一块模拟：势均力敌的 FPTP 选区各抽一次均匀随机数，比例代表制选区抽一次正态摇摆
+    :return: (每次模拟的各党席位列表, {比例代表制选区下标: 翻转次数})
+    """
+    rng = random.Random(seed)
+    rand = rng.random
+    gauss = rng.gauss
+    t = model['t']
+    noise_sd = model['noise_sd']
+    lock_total = model['lock_total']
+    fixed = model['fixed']
+    close = model['close']
+    pr = model['pr']
+    step = model['pr_step']
+    pr_cache = [{} for _ in pr]
+    pr_flips = {}
+    seat_totals = []
+
+    for _ in range(iterations):
+        totals = list(fixed)
+        for other, probs, seats, group_seats in close:
+            # 逐个选区 "随机数 < 获胜概率" 即目标党胜出，整组在 C 层面完成
+            won = sum(compress(seats, map(lt, starmap(rand, repeat((), len(probs))), probs)))
+            totals[t] += won
+            totals[other] += group_seats - won
+        for (k, row, seats, method, base, baseline), cache in zip(pr, pr_cache):
+            key = round((base + gauss(0.0, noise_sd) if noise_sd else base) / step)
+            outcome = cache.get(key)
+            if outcome is None:
+                swung = swing_row(row, t, key * step, lock_total)
+                outcome = cache[key] = (allocate(swung, seats, method), winner_col(swung) != baseline)
+            alloc, flipped = outcome
+            for j, n in enumerate(alloc):
+                totals[j] += n
+            if flipped:
+                pr_flips[k] = pr_flips.get(k, 0) + 1
+        seat_totals.append(totals)
+
+    return seat_totals, pr_flips
+
+
+def _run_group(model, chunks):
+    """[工作进程] 依次跑分到本进程的若干块，模型每个进程只传一次"""
+    return [_run_chunk(model, seed, n) for seed, n in chunks]
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run_simulation(snap, t, swing, noise_sd=0.0, iterations=1000, seed=None,
+                   province_swing=None, lock_total=True):
+    """
+    [蒙特卡洛模拟] 在快照上重复施加 "整体/分省摇摆 + 选区随机噪声"，不改动任何数据
+    :param t: 受益政党列号
+    :param swing: 整体摇摆比例 (0.05 = 5%)
+    :param noise_sd: 每个选区额外摇摆的标准差 (比例)
+    :param province_swing: {省份ID: 摇摆比例}，覆盖这些省份的整体摇摆
+    :param iterations: 模拟次数 (1..MAX_ITERATIONS)；没有噪声时结果确定，只算一次
+    :return: {'parties': {党名: 席位分布统计}, 'flip_probability': {选区ID: 翻转概率},
+              'iterations': 模拟次数, ...}
+    :raises ValueError: iterations 超出范围
+    """
+    if not 1 <= iterations <= MAX_ITERATIONS:
+        raise ValueError(f'模拟次数必须在 1-{MAX_ITERATIONS} 之间')
+    if seed is None:
+        seed = random.randrange(1 << 30)
+    province_swing = province_swing or {}
+    base_swings = [province_swing.get(pr, swing) for pr in snap['provinces']]
+
+    model = build_model(snap, t, base_swings, noise_sd, lock_total)
+    work = sampled_work(model)
+    # 没有噪声时每次结果都一样，算一次即可，直方图按 iterations 次计
+    runs = iterations if noise_sd else 1
+
+    chunks = []
+    left = runs
+    while left > 0:
+        n = min(CHUNK_ITERATIONS, left)
+        chunks.append((seed * 1000003 + len(chunks), n))
+        left -= n
+
+    if work * runs <= INLINE_WORK or len(chunks) == 1:
+        results = _run_group(model, chunks)
+    else:
+        # 按进程数把块合并成几个大任务
+        groups = [chunks[w::WORKERS] for w in range(WORKERS) if chunks[w::WORKERS]]
+        futures = [_get_pool().submit(_run_group, model, group) for group in groups]
+        results = [r for f in futures for r in f.result()]
+
+    seat_totals = [totals for chunk_totals, _ in results for totals in chunk_totals]
+    flip_prob = model['flip_prob']
+    for _, pr_flips in results:
+        for k, n in pr_flips.items():
+            flip_prob[k] += n / runs
+
+    parties = {}
+    for j, name in enumerate(snap['parties']):
+        values = sorted(totals[j] for totals in seat_totals)
+        histogram = {}
+        for v in values:
+            histogram[v] = histogram.get(v, 0) + iterations // runs
+        parties[name] = {
+            'mean': sum(values) / len(values) if values else 0,
+            'min': values[0] if values else 0,
+            'p5': _percentile(values, 0.05),
+            'p50': _percentile(values, 0.5),
+            'p95': _percentile(values, 0.95),
+            'max': values[-1] if values else 0,
+            'histogram': histogram,
+        }
+
+    return {
+        'iterations': iterations,
+        'seed': seed,
+        'parties': parties,
+        'flip_probability': {d_id: p for d_id, p in zip(snap['ids'], flip_prob) if p > 0},
+    }
@@ -0,0 +1,139 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from .concurrency import atomic_write
+from .vote_store import ChunkedArray, VoteStore
+
+# [二进制快照] workspace.snap：VoteStore 的定长二进制镜像，启动时 mmap 载入，免去解析 CSV
+# 布局 (小端)：
+#   MAGIC
+#   头部: 三张 CSV 的 (mtime_ns, size) × 3，选区数 n，政党数 p
+#   之后是若干段，每段前面 8 字节长度：
+#     政党表 JSON | 选区ID | 省份ID | 名称 | 类型 (字符串列以 \0 连接的 UTF-8)
+#     seats (n × int64) | votes (n × p × int64) | has_meta (n 字节) | has_votes (n 字节)
+MAGIC = b'MSSNAP\x01\n'
+_HEADER = struct.Struct('<6q2q')
+_LEN = struct.Struct('<Q')
+_MISSING = (-1, -1)
+_SWAP = sys.byteorder != 'little'
+
+
+def _stamp_values(stamps):
+    values = []
+    for stamp in stamps:
+        values.extend(stamp if stamp is not None else _MISSING)
+    return values
+
+
+def write_snapshot(path, store, stamps):
+    """
+    把 store 写成快照 (先写临时文件再替换)
+    :param stamps: 与 store 内容对应的 CSV 时间戳 (DataManager._csv_mtimes()，顺序 parties/districts/votes)
+    """
+    seats = array('q', store.seats.to_array())
+    votes = store.votes.to_array()
+    if _SWAP:
+        seats.byteswap()
+        votes.byteswap()
+    meta = json.dumps({'parties': store.parties, 'party_ids': store.party_ids},
+                      ensure_ascii=False).encode('utf-8')
+    sections = [meta] + ['\0'.join(column).encode('utf-8') for column in
+                         (store.district_ids, store.province_ids, store.names, store.types)]
+    sections += [seats, votes, store.has_meta, store.has_votes]
+
+    def writer(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_HEADER.pack(*_stamp_values(stamps), len(store), store.num_parties))
+            for section in sections:
+                data = memoryview(section).cast('B')
+                f.write(_LEN.pack(len(data)))
+                f.write(data)
+    atomic_write(path, writer)
+
+
+def load_snapshot(path, stamps):
+    """
+    mmap 读入快照
+    :return: VoteStore；快照不存在、格式不对或与 stamps 不符 (CSV 被外部修改过) 时返回 None
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    with f:
+        if os.fstat(f.fileno()).st_size < len(MAGIC) + _HEADER.size:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                return _parse(view, stamps)
+            except (ValueError, struct.error, UnicodeDecodeError):
+                return None
+            finally:
+                view.release()
+
+
+def _parse(view, stamps):
+    if bytes(view[:len(MAGIC)]) != MAGIC:
+        return None
+    header = _HEADER.unpack_from(view, len(MAGIC))
+    if list(header[:6]) != _stamp_values(stamps):
+        return None
+    n, p = header[6:]
+
+    pos = len(MAGIC) + _HEADER.size
+    sections = []
+    try:
+        for _ in range(9):
+            (size,) = _LEN.unpack_from(view, pos)
+            pos += _LEN.size
+            if pos + size > len(view):
+                raise ValueError('快照被截断')
+            sections.append(view[pos:pos + size])
+            pos += size
+        store = _build(sections, n, p)
+    finally:
+        # mmap 关闭前必须释放所有切片
+        for section in sections:
+            section.release()
+
+    if (len(store) != n or len(store.province_ids) != n or len(store.names) != n or len(store.types) != n
+            or len(store.seats) != n or len(store.votes) != n * p
+            or len(store.has_meta) != n or len(store.has_votes) != n):
+        raise ValueError('快照长度不一致')
+    return store
+
+
+def _build(sections, n, p):
+    store = VoteStore()
+    meta = json.loads(bytes(sections[0]).decode('utf-8'))
+    store.parties = meta['parties']
+    store.party_ids = meta['party_ids']
+    store.party_col = {pid: j for j, pid in enumerate(store.party_ids)}
+
+    columns = [bytes(s).decode('utf-8').split('\0') if n else [] for s in sections[1:5]]
+    store.district_ids, store.province_ids, store.names, store.types = columns
+    store.index = {d_id: i for i, d_id in enumerate(store.district_ids)}
+
+    # 数值列：按块整段复制 (seats 按 int64 存储，平台的 'l' 不是 8 字节时再转换)
+    if store.seats.itemsize == 8:
+        store.seats.frombytes(sections[5])
+    else:
+        seats = array('q')
+        seats.frombytes(sections[5])
+        if _SWAP:
+            seats.byteswap()
+        store.seats = ChunkedArray('l', seats)
+    store.votes.frombytes(sections[6])
+    if _SWAP:
+        store.votes.byteswap()
+        if store.seats.itemsize == 8:
+            store.seats.byteswap()
+    store.has_meta = bytearray(sections[7])
+    store.has_votes = bytearray(sections[8])
+    return store
@@ -0,0 +1,208 @@
+import math
+import os
+import threading
+
+from .svg_processor import load_index
+
+# R 树每个节点的子节点数
+NODE_CAPACITY = 16
+
+MODES = ('center', 'within', 'intersects')
+
+
+def _union(boxes):
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+
+def _overlaps(a, b):
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def _contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and inner[2] <= outer[2] and inner[3] <= outer[3]
+
+
+def point_in_polygon(x, y, polygon):
+    """射线法：点是否在多边形内 (polygon 为 [(x, y), ...]，首尾不必重复)"""
+    inside = False
+    px, py = polygon[-1]
+    for qx, qy in polygon:
+        if (qy > y) != (py > y) and x < (px - qx) * (y - qy) / (py - qy) + qx:
+            inside = not inside
+        px, py = qx, qy
+    return inside
+
+
+def _segment_hits_box(x0, y0, x1, y1, box):
+    """线段与轴对齐矩形是否相交 (Liang-Barsky 裁剪)"""
+    t0, t1 = 0.0, 1.0
+    dx, dy = x1 - x0, y1 - y0
+    for p, q in ((-dx, x0 - box[0]), (dx, box[2] - x0), (-dy, y0 - box[1]), (dy, box[3] - y0)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+            if t0 > t1:
+                return False
+    return True
+
+
+def _edges_hit_box(polygon, box):
+    px, py = polygon[-1]
+    for qx, qy in polygon:
+        if _segment_hits_box(px, py, qx, qy, box):
+            return True
+        px, py = qx, qy
+    return False
+
+
+class SpatialIndex:
+    """
+    [空间索引] 清洗时记录的每个选区 path 的包围盒，按 STR (Sort-Tile-Recursive) 打包成静态 R 树
+    框选 / 套索只访问与查询范围重叠的节点，选区数量很大时也只需 O(log n + 命中数)
+    判定方式 (mode，作用在 path 的包围盒上；一个选区有多个 path 时任一 path 命中即选中)：
+      center     包围盒中心在范围内 (默认，最接近手工点选的结果)
+      within     包围盒完全在范围内
+      intersects 包围盒与范围有重叠
+    """
+
+    def __init__(self, entries):
+        """entries: [(选区ID, (min_x, min_y, max_x, max_y)), ...]"""
+        self.size = len(entries)
+        # 叶子层: (包围盒, 选区ID)；上层: (包围盒, 子节点列表)
+        level = [(box, d_id) for d_id, box in entries]
+        leaf = True
+        self.root = None
+        while level:
+            nodes = self._pack(level, leaf)
+            leaf = False
+            if len(nodes) == 1:
+                self.root = nodes[0]
+                break
+            level = nodes
+
+    @classmethod
+    def from_index(cls, index):
+        """从 svg_processor.load_index 的结果建树，只收录 'district' 类型且有包围盒的 path"""
+        entries = [(d_id, tuple(box)) for d_id, kind, box in zip(index['ids'], index['kinds'], index['bboxes'])
+                   if kind == 'district' and box]
+        return cls(entries)
+
+    @staticmethod
+    def _pack(items, leaf):
+        """STR：先按中心 x 切成竖条，每条内按中心 y 排序，再每 NODE_CAPACITY 个打成一个节点"""
+        n = len(items)
+        pages = math.ceil(n / NODE_CAPACITY)
+        per_slice = math.ceil(math.sqrt(pages)) * NODE_CAPACITY
+        items = sorted(items, key=lambda it: it[0][0] + it[0][2])
+        nodes = []
+        for s in range(0, n, per_slice):
+            strip = sorted(items[s:s + per_slice], key=lambda it: it[0][1] + it[0][3])
+            for k in range(0, len(strip), NODE_CAPACITY):
+                children = strip[k:k + NODE_CAPACITY]
+                nodes.append((_union([c[0] for c in children]), leaf, children))
+        return nodes
+
+    def _search(self, box):
+        """与 box 重叠的所有 (包围盒, 选区ID)"""
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node_box, leaf, children = stack.pop()
+            if not _overlaps(node_box, box):
+                continue
+            if leaf:
+                for child_box, d_id in children:
+                    if _overlaps(child_box, box):
+                        yield child_box, d_id
+            else:
+                stack.extend(children)
+
+    def query_rect(self, rect, mode='center'):
+        """
+        框选：rect 为 (x0, y0, x1, y1)，两个角的顺序不限
+        :return: 命中的选区ID (排序后去重)
+        :raises ValueError: mode 不支持
+        """
+        if mode not in MODES:
+            raise ValueError(f'不支持的判定方式: {mode}')
+        box = (min(rect[0], rect[2]), min(rect[1], rect[3]), max(rect[0], rect[2]), max(rect[1], rect[3]))
+        hits = set()
+        for b, d_id in self._search(box):
+            if mode == 'intersects':
+                hits.add(d_id)
+            elif mode == 'within':
+                if _contains(box, b):
+                    hits.add(d_id)
+            elif box[0] <= (b[0] + b[2]) / 2 <= box[2] and box[1] <= (b[1] + b[3]) / 2 <= box[3]:
+                hits.add(d_id)
+        return sorted(hits)
+
+    def query_polygon(self, polygon, mode='center'):
+        """
+        套索：polygon 为 [(x, y), ...] (至少 3 个点，可以是凹多边形)
+        先用多边形的包围盒在树上筛出候选，再逐个做精确判定
+        :raises ValueError: 点数不足 / mode 不支持
+        """
+        if mode not in MODES:
+            raise ValueError(f'不支持的判定方式: {mode}')
+        polygon = [(float(x), float(y)) for x, y in polygon]
+        if len(polygon) < 3:
+            raise ValueError('多边形至少需要 3 个点')
+        bounds = _union([(x, y, x, y) for x, y in polygon])
+        hits = set()
+        for b, d_id in self._search(bounds):
+            if d_id in hits:
+                continue
+            if mode == 'center':
+                if point_in_polygon((b[0] + b[2]) / 2, (b[1] + b[3]) / 2, polygon):
+                    hits.add(d_id)
+                continue
+            corners_in = [point_in_polygon(x, y, polygon) for x, y in ((b[0], b[1]), (b[2], b[1]),
+                                                                        (b[2], b[3]), (b[0], b[3]))]
+            if mode == 'within':
+                # 四角都在内且没有多边形的边穿过包围盒
+                if all(corners_in) and not _edges_hit_box(polygon, b):
+                    hits.add(d_id)
+            elif any(corners_in) or _edges_hit_box(polygon, b):
+                hits.add(d_id)
+        return sorted(hits)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_spatial_index(svg_path):
+    """
+    取 cleaned.svg 对应的空间索引 (按 mtime/大小缓存，重新清洗后自动重建)
+    :return: SpatialIndex；还没有清洗过或索引缺失时返回 None
+    """
+    if not os.path.exists(svg_path):
+        return None
+    stat = os.stat(svg_path)
+    stamp = (stat.st_mtime, stat.st_size)
+    key = os.path.abspath(svg_path)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        index = load_index(svg_path)
+        if index is None:
+            return None
+        tree = SpatialIndex.from_index(index)
+        _cache[key] = (stamp, tree)
+        return tree
+
+
+def release_spatial_index(svg_path):
+    """把空间索引移出缓存 (所属工作区被换出时调用)"""
+    with _cache_lock:
+        _cache.pop(os.path.abspath(svg_path), None)
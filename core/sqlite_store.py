@@ -0,0 +1,154 @@
+import sqlite3
+import threading
+
+from .vote_store import VoteStore
+
+# 表结构：与三张 CSV 一一对应，选区表以 District_ID 为主键 (B 树索引)
+# ord 记录行顺序，导出 CSV 时保持原来的排列
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parties (
+    ord       INTEGER PRIMARY KEY,
+    party_id  TEXT NOT NULL,
+    name_cn   TEXT,
+    color     TEXT,
+    alliance  TEXT
+);
+CREATE TABLE IF NOT EXISTS vote_columns (
+    col       INTEGER PRIMARY KEY,
+    party_id  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS districts (
+    district_id  TEXT PRIMARY KEY,
+    ord          INTEGER NOT NULL,
+    province_id  TEXT,
+    name         TEXT,
+    type         TEXT,
+    seats        INTEGER,
+    has_meta     INTEGER NOT NULL,
+    has_votes    INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS votes (
+    district_id  TEXT NOT NULL,
+    col          INTEGER NOT NULL,
+    count        INTEGER NOT NULL,
+    PRIMARY KEY (district_id, col)
+) WITHOUT ROWID;
+"""
+
+
+class SqliteStore:
+    """
+    [SQLite 存储] DataManager 的可选后端，替代 "CSV + 编辑日志"
+    - 单选区编辑 = 一个事务里按主键 UPDATE 几行，O(log n)
+    - WAL + synchronous=FULL：提交即落盘，崩溃后数据库保持最后一次提交的状态
+    - PRAGMA data_version 可以发现其他进程提交的修改，用来判断内存数据是否过期
+    内存里仍然是 VoteStore，读操作不走 SQL
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def data_version(self):
+        """其他连接每提交一次这个值就会变化 (本连接自己的提交不会改变它)"""
+        with self._lock:
+            return self._connection().execute('PRAGMA data_version').fetchone()[0]
+
+    def is_empty(self):
+        with self._lock:
+            conn = self._connection()
+            return (conn.execute('SELECT COUNT(*) FROM districts').fetchone()[0] == 0
+                    and conn.execute('SELECT COUNT(*) FROM parties').fetchone()[0] == 0)
+
+    def load(self):
+        """整库读入一个新的 VoteStore"""
+        store = VoteStore()
+        store.flatten_columns()
+        with self._lock:
+            conn = self._connection()
+            for party_id, name_cn, color, alliance in conn.execute(
+                    'SELECT party_id, name_cn, color, alliance FROM parties ORDER BY ord'):
+                store.parties.append({'Party_ID': party_id, 'Name_CN': name_cn or '',
+                                      'Color': color or '', 'Alliance': alliance or ''})
+            store.party_ids = [pid for (pid,) in conn.execute('SELECT party_id FROM vote_columns ORDER BY col')]
+            store.party_col = {pid: j for j, pid in enumerate(store.party_ids)}
+
+            for d_id, province_id, name, d_type, seats, has_meta, has_votes in conn.execute(
+                    'SELECT district_id, province_id, name, type, seats, has_meta, has_votes '
+                    'FROM districts ORDER BY ord'):
+                i = store.add_district(d_id, province_id or '', name or d_id, d_type or '',
+                                       seats if seats is not None else 1)
+                store.has_meta[i] = has_meta
+                store.has_votes[i] = has_votes
+
+            p = store.num_parties
+            index = store.index
+            votes = store.votes
+            for d_id, col, count in conn.execute('SELECT district_id, col, count FROM votes'):
+                i = index.get(d_id)
+                if i is not None and col < p:
+                    votes[i * p + col] = count
+        store.chunk_columns()
+        return store
+
+    def _district_params(self, store, i):
+        return (store.district_ids[i], i, store.province_ids[i], store.names[i], store.types[i],
+                store.seats[i], store.has_meta[i], store.has_votes[i])
+
+    def save_rows(self, store, rows):
+        """一个事务写入若干选区的最新状态 (含新增的选区)"""
+        if not rows:
+            return
+        district_params = [self._district_params(store, i) for i in rows]
+        vote_params = [(store.district_ids[i], j, v)
+                       for i in rows if store.has_votes[i]
+                       for j, v in enumerate(store.row(i))]
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany('INSERT OR REPLACE INTO districts VALUES (?, ?, ?, ?, ?, ?, ?, ?)', district_params)
+                conn.executemany('INSERT OR REPLACE INTO votes VALUES (?, ?, ?)', vote_params)
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def save_all(self, store):
+        """整库替换 (导入时使用)，同样只有一个事务"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for table in ('parties', 'vote_columns', 'districts', 'votes'):
+                    conn.execute(f'DELETE FROM {table}')
+                conn.executemany('INSERT INTO parties VALUES (?, ?, ?, ?, ?)', [
+                    (k, party['Party_ID'], party['Name_CN'], party['Color'], party['Alliance'])
+                    for k, party in enumerate(store.parties)])
+                conn.executemany('INSERT INTO vote_columns VALUES (?, ?)', list(enumerate(store.party_ids)))
+                conn.executemany('INSERT INTO districts VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                 (self._district_params(store, i) for i in range(len(store))))
+                conn.executemany('INSERT INTO votes VALUES (?, ?, ?)', (
+                    (d_id, j, v)
+                    for d_id, has_votes, row in zip(store.district_ids, store.has_votes, store.rows()) if has_votes
+                    for j, v in enumerate(row)))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,60 +1,213 @@
-import xml.etree.ElementTree as ET
+from xml.parsers import expat
+import hashlib
+import json
 import os
 
-def clean_and_extract_ids(input_svg_path, output_svg_path):
+from .concurrency import atomic_write, durable_replace, unique_tmp
+from .geometry import IDENTITY, check_precision, minify_path, multiply, parse_transform, path_bbox, transform_bbox
+
+# 流式清洗时每次读入的字节数
+CHUNK_SIZE = 1 << 20
+
+# 压缩模式下仍需保留空白文本的标签
+_TEXT_TAGS = {'text', 'tspan', 'textPath', 'style', 'title', 'desc'}
+
+
+def _escape_text(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _escape_attr(value):
+    return (value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+                 .replace('"', '&quot;').replace('\r', '&#13;')
+                 .replace('\n', '&#10;').replace('\t', '&#09;'))
+
+
+_digest_cache = {}
+
+
+def file_digest(path):
+    """文件内容的 sha1；按 (路径, mtime, 大小) 缓存，文件不变时不再重复读取"""
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    stamp = (stat.st_mtime, stat.st_size)
+    cached = _digest_cache.get(key)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    _digest_cache[key] = (stamp, h.hexdigest())
+    return _digest_cache[key][1]
+
+
+def index_path(svg_path):
+    """cleaned.svg 对应的索引文件: cleaned.index.json"""
+    return os.path.splitext(svg_path)[0] + '.index.json'
+
+
+def load_index(svg_path):
+    """
+    读取清洗时保存的选区索引；索引缺失或与 SVG 不匹配 (文件大小变了) 时返回 None
+    索引按 path 元素的文档顺序存储各列：
+      ids / kinds ('district' 选区, 'blank' 空白省份, 'border' 省界, '' 其他) / parents / bboxes
     """
-    清洗SVG，修复Polygon，提取选区ID
+    path = index_path(svg_path)
+    if not os.path.exists(path) or not os.path.exists(svg_path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except ValueError:
+        return None
+    if index.get('svg_size') != os.path.getsize(svg_path):
+        return None
+    return index
+
+
+def clean_and_extract_ids(input_svg_path, output_svg_path, progress_callback=None, precision=None):
+    """
+    清洗SVG，修复Polygon，提取选区ID，并在输出旁边保存选区索引 (见 load_index)
+    流式处理：边读边写，内存只与嵌套深度有关，不会因为地图巨大而爆内存/爆递归
+    progress_callback(已读字节, 总字节, 已找到选区数): 每读完一块调用一次
+    precision: 不为 None 时开启压缩，坐标量化到该位数小数并改写为相对命令 (见 geometry.minify_path)，
+               同时去掉标签之间的空白；压缩前后的字节数记录在索引的 bytes_in / bytes_out 中
     返回: (成功与否, 提取到的选区列表)
+    :raises ValueError: precision 超出范围 (见 geometry.check_precision)
     """
+    if precision is not None:
+        check_precision(precision)
     if not os.path.exists(input_svg_path):
         return False, []
-        
+
+    # 先写临时文件，全部成功后再替换，并发上传或清洗失败都不会留下半个 cleaned.svg
+    tmp_svg_path = unique_tmp(output_svg_path)
     try:
-        ET.register_namespace("", "http://www.w3.org/2000/svg")
-        tree = ET.parse(input_svg_path)
-        root = tree.getroot()
-        
         extracted_ids = []
-        
-        # 内部递归函数
-        def process_element(element, parent_id="Root"):
-            current_id = element.get('id', '')
-            is_district = '-' in current_id
-            tag_name = element.tag.split('}')[-1].lower()
-            
-            if tag_name in ['polygon', 'polyline']:
-                points = element.get('points')
-                if points:
-                    new_elem = ET.Element(element.tag.replace(tag_name, 'path'))
-                    if is_district or tag_name == 'polygon':
-                        path_data = f"M {points} Z"
+        total_bytes = os.path.getsize(input_svg_path)
+
+        # 栈：每层记录 (标签名, 子元素应继承的 parent_id, 自身id, 自身data-name, 累积变换矩阵)
+        stack = [(None, "Root", '', '', IDENTITY)]
+        index = {'ids': [], 'kinds': [], 'parents': [], 'bboxes': []}
+        # 上一个开始标签是否还没闭合 ">" (用于输出 <path ... /> 自闭合)
+        state = {'open': False}
+
+        with open(tmp_svg_path, 'w', encoding='utf-8') as out:
+            write = out.write
+
+            def close_pending():
+                if state['open']:
+                    write('>')
+                    state['open'] = False
+
+            def start_element(name, attrs):
+                close_pending()
+                parent_id = stack[-1][1]
+                current_id = attrs.get('id', '')
+                is_district = '-' in current_id
+                tag_name = name.split(':')[-1].lower()
+
+                if tag_name in ['polygon', 'polyline']:
+                    points = attrs.get('points')
+                    if points:
+                        if is_district or tag_name == 'polygon':
+                            path_data = f"M {points} Z"
+                        else:
+                            path_data = f"M {points}"
+                        new_attrs = {'d': path_data}
+                        for k, v in attrs.items():
+                            if k not in ['points', 'd']:
+                                new_attrs[k] = v
+                        name = name.replace(name.split(':')[-1], 'path')
+                        attrs = new_attrs
+                        tag_name = 'path' # 更新标签名
+
+                if precision is not None and attrs.get('d') and name.split(':')[-1] == 'path':
+                    attrs['d'] = minify_path(attrs['d'], precision)
+
+                if tag_name == 'path' and is_district:
+                    extracted_ids.append({'parent': parent_id, 'id': current_id})
+
+                matrix = stack[-1][4]
+                if attrs.get('transform'):
+                    matrix = multiply(matrix, parse_transform(attrs['transform']))
+
+                # 索引：与渲染器的分类规则一致 (看直接父节点的 id / data-name)
+                if name.split(':')[-1] == 'path':
+                    _, _, p_id, p_name, _ = stack[-1]
+                    if "空白" in p_id or "空白" in p_name:
+                        kind = 'blank'
+                    elif is_district:
+                        kind = 'district'
+                    elif current_id:
+                        kind = 'border'
                     else:
-                        path_data = f"M {points}"
-                    
-                    new_elem.set('d', path_data)
-                    for k, v in element.attrib.items():
-                        if k not in ['points', 'd']:
-                            new_elem.set(k, v)
-                    
-                    element.tag = new_elem.tag
-                    element.attrib = new_elem.attrib
-                    tag_name = 'path' # 更新标签名
-
-            if tag_name == 'path' and is_district:
-                extracted_ids.append({'parent': parent_id, 'id': current_id})
-            
-            next_parent = current_id if element.tag.endswith('g') and current_id else parent_id
-            if element.get('data-name'):
-                next_parent = element.get('data-name')
-
-            for child in element:
-                process_element(child, next_parent)
-
-        process_element(root)
-        tree.write(output_svg_path)
-        
+                        kind = ''
+                    bbox = transform_bbox(matrix, path_bbox(attrs.get('d')))
+                    index['ids'].append(current_id)
+                    index['kinds'].append(kind)
+                    index['parents'].append(parent_id)
+                    index['bboxes'].append([round(v, 3) for v in bbox] if bbox else None)
+
+                next_parent = current_id if name.endswith('g') and current_id else parent_id
+                if attrs.get('data-name'):
+                    next_parent = attrs.get('data-name')
+                stack.append((name, next_parent, current_id, attrs.get('data-name', ''), matrix))
+
+                write('<' + name)
+                for k, v in attrs.items():
+                    write(f' {k}="{_escape_attr(v)}"')
+                state['open'] = True
+
+            def end_element(_name):
+                name = stack.pop()[0]
+                if state['open']:
+                    write(' />')
+                    state['open'] = False
+                else:
+                    write(f'</{name}>')
+
+            def char_data(data):
+                if precision is not None and not data.strip() and stack[-1][0].split(':')[-1] not in _TEXT_TAGS:
+                    return
+                close_pending()
+                write(_escape_text(data))
+
+            parser = expat.ParserCreate()
+            parser.buffer_text = True
+            parser.ordered_attributes = False
+            parser.StartElementHandler = start_element
+            parser.EndElementHandler = end_element
+            parser.CharacterDataHandler = char_data
+
+            done_bytes = 0
+            with open(input_svg_path, 'rb') as f:
+                while True:
+                    chunk = f.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    parser.Parse(chunk, False)
+                    done_bytes += len(chunk)
+                    if progress_callback:
+                        progress_callback(done_bytes, total_bytes, len(extracted_ids))
+            parser.Parse(b'', True)
+
+        index['svg_size'] = os.path.getsize(tmp_svg_path)
+        index['bytes_in'] = total_bytes
+        index['bytes_out'] = index['svg_size']
+        # 先换 SVG 再换索引：两步之间读到的索引大小对不上，会自动退回按父节点分类
+        durable_replace(tmp_svg_path, output_svg_path)
+
+        def write_index(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+        atomic_write(index_path(output_svg_path), write_index)
+
         return True, extracted_ids
 
     except Exception as e:
         print(f"Error processing SVG: {e}")
-        return False, []
\ No newline at end of file
+        if os.path.exists(tmp_svg_path):
+            os.remove(tmp_svg_path)
+        return False, []
@@ -0,0 +1,159 @@
+# [摇摆引擎] 对一批选区一次性施加摇摆
+# 规则与旧版逐行实现完全一致：
+# 1. delta = int(总票数 × 摇摆比例)，目标党不够扣时扣光为止
+# 2. 锁定总票数时，其他党按现有票数比例分摊 -delta，
+#    最后一个党兜底余数，任何党被扣到负数时截为 0
+# 所有步骤都按"列"整批计算，而不是逐个选区、逐个政党地解释执行
+
+from .seat_allocation import allocate_store
+
+
+def winner_col(row):
+    """返回得票最高政党的列号 (并列取靠前者)；无票返回 None"""
+    if not row:
+        return None
+    top = max(row)
+    return row.index(top) if top > 0 else None
+
+
+def swing_matrix(matrix, t, swing_percent, lock_total=True):
+    """
+    [纯函数] 原地修改 matrix (每行一个选区的票数列表)
+    :param t: 目标政党列号
+    :param swing_percent: 摇摆比例；也可以是与 matrix 等长的列表 (每个选区各自的摇摆)
+    :return: 实际发生变化的行下标列表
+    """
+    n_cols = len(matrix[0]) if matrix else 0
+
+    # 1. 各区总票数 & 目标党当前票数
+    totals = list(map(sum, matrix))
+    targets = [r[t] for r in matrix]
+
+    # 2. 变动量 (Delta)，并做防负数截断
+    if isinstance(swing_percent, (int, float)):
+        deltas = [int(tot * swing_percent) for tot in totals]
+    else:
+        deltas = [int(tot * rate) for tot, rate in zip(totals, swing_percent)]
+    deltas = [-cur if cur + d < 0 else d for cur, d in zip(targets, deltas)]
+
+    # 总票数为0 或 变化不足1票的选区直接跳过
+    active = [k for k, (tot, d) in enumerate(zip(totals, deltas)) if tot and d]
+    if not active:
+        return []
+
+    # 3. 更新目标政党
+    for k in active:
+        matrix[k][t] = targets[k] + deltas[k]
+
+    if not lock_total:
+        return active
+
+    # 4. 零和分摊：只处理"其他政党"还有票的选区
+    others = [j for j in range(n_cols) if j != t]
+    shared = [k for k in active if totals[k] - targets[k] > 0]
+    if not others or not shared:
+        return active
+
+    remaining = [-deltas[k] for k in shared]
+    other_totals = [totals[k] - targets[k] for k in shared]
+    distributed = [0] * len(shared)
+    rows = [matrix[k] for k in shared]
+
+    for j in others[:-1]:
+        column = [r[j] for r in rows]
+        shares = [int(rem * (cur / ot)) for rem, cur, ot in zip(remaining, column, other_totals)]
+        distributed = list(map(int.__add__, distributed, shares))
+        for r, cur, share in zip(rows, column, shares):
+            r[j] = max(cur + share, 0)
+
+    # 最后一个党负责兜底(处理除不尽的余数)，保证总数严丝合缝
+    last = others[-1]
+    for r, rem, dist in zip(rows, remaining, distributed):
+        r[last] = max(r[last] + rem - dist, 0)
+
+    return active
+
+
+def swing_row(row, t, swing_percent, lock_total=True):
+    """
+    [纯函数] 单个选区的摇摆，结果与 swing_matrix 对同一行的结果完全相同，
+    但省掉了整批计算的准备开销 (模拟时逐个选区调用)
+    :return: 摇摆后的新票数列表
+    """
+    return shift_row(row, t, int(sum(row) * swing_percent), lock_total)
+
+
+def shift_row(row, t, delta, lock_total=True):
+    """
+    [纯函数] 单个选区按整数票数变动量 delta 摇摆 (swing_row 的第 2 步起)
+    delta = int(总票数 × 摇摆比例)，目标党不够扣时扣光为止
+    :return: 摇摆后的新票数列表
+    """
+    new = list(row)
+    total = sum(row)
+    cur = row[t]
+    if cur + delta < 0:
+        delta = -cur
+    if not total or not delta:
+        return new
+    new[t] = cur + delta
+    others = [j for j in range(len(row)) if j != t]
+    other_total = total - cur
+    if not lock_total or not others or other_total <= 0:
+        return new
+
+    distributed = 0
+    for j in others[:-1]:
+        share = int(-delta * (row[j] / other_total))
+        distributed += share
+        new[j] = max(row[j] + share, 0)
+    last = others[-1]
+    new[last] = max(row[last] - delta - distributed, 0)
+    return new
+
+
+def apply_swing(store, row_ids, t, swing_percent, lock_total=True):
+    """
+    对 VoteStore 中的若干行施加摇摆，并汇总结果
+    :return: (变化的行号列表, 摘要字典)
+    """
+    row_ids = [i for i in row_ids if store.has_votes[i]]
+    matrix = [store.row(i).tolist() for i in row_ids]
+
+    before = [winner_col(r) for r in matrix]
+    changed = swing_matrix(matrix, t, swing_percent, lock_total)
+
+    party_names = store.party_names()
+
+    def name_of(col):
+        if col is None:
+            return None
+        pid = store.party_ids[col]
+        return party_names.get(pid, pid)
+
+    seat_changes = {}
+    flipped = []
+    changed_rows = [row_ids[k] for k in changed]
+    seats_before = allocate_store(store, changed_rows)
+    for k in changed:
+        store.set_row(row_ids[k], matrix[k])
+    seats_after = allocate_store(store, changed_rows)
+
+    for k in changed:
+        i = row_ids[k]
+        zero = [0] * store.num_parties
+        for col, (n0, n1) in enumerate(zip(seats_before.get(i, zero), seats_after.get(i, zero))):
+            if n0 != n1:
+                name = name_of(col)
+                seat_changes[name] = seat_changes.get(name, 0) + n1 - n0
+
+        after = winner_col(matrix[k])
+        if store.seats[i] > 0 and after != before[k]:
+            flipped.append({'District_ID': store.district_ids[i], 'from': name_of(before[k]), 'to': name_of(after)})
+
+    summary = {
+        'changed': len(changed_rows),
+        'flipped': flipped,
+        'seat_changes': {k: v for k, v in seat_changes.items() if v},
+    }
+    return changed_rows, summary
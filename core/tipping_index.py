@@ -0,0 +1,266 @@
+from bisect import bisect_left, insort
+from itertools import accumulate
+
+from .seat_allocation import allocate_store, method_for
+
+NEG_INF = float('-inf')
+
+
+def flip_threshold(row, j):
+    """
+    政党 j 在该选区的"临界摇摆"：全国统一摇摆 s > 阈值 时 j 得票第一，s < 阈值 时不是
+    按锁定总票数的摇摆规则 (其他党按比例分摊) 的连续近似：
+      a = j 的得票率, b = 其他党最高得票率, o = 1 - a
+      j 的得票 a + s 超过 b 的 b·(o - s)/o  <=>  s > (b - a)·o / (o + b)
+    j 独占全部选票时永远第一，返回 -inf
+    恰好 s == 阈值 时 j 与最强对手得票相同，谁算第一见 wins_tie
+    """
+    total = sum(row)
+    a = row[j] / total
+    others = [v for k, v in enumerate(row) if k != j]
+    b = max(others) / total if others else 0.0
+    o = 1.0 - a
+    if o <= 0 or b <= 0:
+        return NEG_INF
+    return (b - a) * o / (o + b)
+
+
+def wins_tie(row, j):
+    """
+    摇摆恰好等于阈值 (j 与最强对手并列) 时 j 是否算第一：与 winner_col 一致，并列取列号靠前者
+    其他党按比例缩放，最强对手始终是其他党中得票最高且列号最靠前的那个
+    """
+    best = None
+    for k, v in enumerate(row):
+        if k != j and (best is None or v > row[best]):
+            best = k
+    return best is None or j < best
+
+
+# 分桶有序表每桶的目标大小 (超过两倍时拆分)
+BUCKET_LOAD = 256
+
+
+class _RankedSeats:
+    """
+    [分桶有序表] 一个政党的 (阈值, 并列名次, 行号, 席位) 按阈值排序，分成若干桶：
+      - 每桶保存桶内的席位前缀和，桶之间用树状数组 (Fenwick) 累计席位数和选区数
+      - 插入 / 删除 O(BUCKET_LOAD + log 桶数)，"阈值 < x 的席位和" O(log n)
+    单个选区变化时只改动所在的桶，不必重建整条前缀和
+    """
+
+    def __init__(self, items):
+        """items: 已排序的 [(阈值, 并列名次, 行号, 席位), ...]"""
+        self._build([items[k:k + BUCKET_LOAD] for k in range(0, len(items), BUCKET_LOAD)])
+
+    def _build(self, buckets):
+        self.buckets = buckets
+        self.maxes = [b[-1] for b in buckets]
+        self.prefix = [self._bucket_prefix(b) for b in buckets]
+        n = len(buckets)
+        self.tree_seats = [0] * (n + 1)
+        self.tree_count = [0] * (n + 1)
+        for k, b in enumerate(buckets):
+            self._tree_add(k, self.prefix[k][-1], len(b))
+
+    @staticmethod
+    def _bucket_prefix(bucket):
+        return [0] + list(accumulate(item[-1] for item in bucket))
+
+    def _tree_add(self, k, seats, count):
+        k += 1
+        n = len(self.tree_seats)
+        while k < n:
+            self.tree_seats[k] += seats
+            self.tree_count[k] += count
+            k += k & -k
+
+    def _tree_sum(self, k):
+        """前 k 个桶的 (席位和, 选区数)"""
+        seats = count = 0
+        while k > 0:
+            seats += self.tree_seats[k]
+            count += self.tree_count[k]
+            k -= k & -k
+        return seats, count
+
+    def insert(self, item):
+        if not self.buckets:
+            self._build([[item]])
+            return
+        k = min(bisect_left(self.maxes, item), len(self.buckets) - 1)
+        bucket = self.buckets[k]
+        insort(bucket, item)
+        if len(bucket) > 2 * BUCKET_LOAD:
+            # 拆桶后桶的编号整体后移，树状数组重建 (O(桶数)，很少发生)
+            buckets = self.buckets[:k] + [bucket[:BUCKET_LOAD], bucket[BUCKET_LOAD:]] + self.buckets[k + 1:]
+            self._build(buckets)
+            return
+        self.maxes[k] = bucket[-1]
+        self.prefix[k] = self._bucket_prefix(bucket)
+        self._tree_add(k, item[-1], 1)
+
+    def remove(self, item):
+        k = bisect_left(self.maxes, item)
+        if k == len(self.buckets):
+            return
+        bucket = self.buckets[k]
+        pos = bisect_left(bucket, item)
+        if pos == len(bucket) or bucket[pos] != item:
+            return
+        del bucket[pos]
+        if not bucket:
+            self._build(self.buckets[:k] + self.buckets[k + 1:])
+            return
+        self.maxes[k] = bucket[-1]
+        self.prefix[k] = self._bucket_prefix(bucket)
+        self._tree_add(k, -item[-1], -1)
+
+    def _position(self, key):
+        """第一个 >= key 的元素位置 (桶号, 桶内下标)"""
+        k = bisect_left(self.maxes, key)
+        if k == len(self.buckets):
+            return k, 0
+        return k, bisect_left(self.buckets[k], key)
+
+    def seats_before(self, key):
+        """所有 < key 的元素的 (席位和, 个数)"""
+        k, pos = self._position(key)
+        seats, count = self._tree_sum(k)
+        if k < len(self.buckets):
+            seats += self.prefix[k][pos]
+            count += pos
+        return seats, count
+
+    def after(self, key):
+        """从第一个 >= key 的元素开始向后遍历"""
+        k, pos = self._position(key)
+        while k < len(self.buckets):
+            bucket = self.buckets[k]
+            while pos < len(bucket):
+                yield bucket[pos]
+                pos += 1
+            k, pos = k + 1, 0
+
+    def before(self, key):
+        """从最后一个 < key 的元素开始向前遍历"""
+        k, pos = self._position(key)
+        pos -= 1
+        while k >= 0:
+            if k < len(self.buckets):
+                bucket = self.buckets[k]
+                while pos >= 0:
+                    yield bucket[pos]
+                    pos -= 1
+            k -= 1
+            if k >= 0:
+                pos = len(self.buckets[k]) - 1
+
+
+class TippingIndex:
+    """
+    [临界点索引] 每个政党一条按临界摇摆排序的分桶有序表 [(阈值, 并列名次, 行号, 席位), ...]
+    - 统一摇摆 x 时该党赢下的选区 = 阈值 < x 的前缀，一次二分 + 树状数组求和即可；
+      阈值 == x (并列) 时并列名次为 0 的条目也算赢，与 winner_col 的"并列取靠前者"一致
+    - 离翻转最近的 N 个选区 = 从 x 的位置向两边扩展
+    只索引赢者通吃 (FPTP) 选区；比例代表制选区的席位按当前分配结果计入常数项
+    单个选区变化时只替换它在各党表中的条目、减旧加新它的比例代表制席位，
+    下一次查询不需要任何重建
+    """
+
+    def __init__(self, store):
+        self.store = store
+        p = len(store.party_ids)
+        self.current = {}        # 行号 -> [各党条目]，用于增量删除
+        keys = [[] for _ in range(p)]
+        for i, (seats, row) in enumerate(zip(store.seats, store.rows())):
+            entries = self._entries(i, seats, row)
+            if entries is not None:
+                self.current[i] = entries
+                for party_keys, entry in zip(keys, entries):
+                    party_keys.append(entry)
+        for party_keys in keys:
+            party_keys.sort()
+        self.keys = [_RankedSeats(party_keys) for party_keys in keys]
+
+        # 比例代表制选区：每行的当前分配和全国合计 (增量更新时减旧加新)
+        pr_rows = [i for i in range(len(store)) if method_for(store.types[i]) != 'fptp']
+        self.pr_alloc = allocate_store(store, pr_rows)
+        self.pr_seats = [sum(a[k] for a in self.pr_alloc.values()) for k in range(p)]
+
+    def _entries(self, i, seats=None, row=None):
+        """
+        该行在各党表中的条目；不参与索引 (非 FPTP / 无票 / 0 席) 时返回 None
+        整表建索引时由调用方顺序传入 seats / row
+        """
+        store = self.store
+        if seats is None:
+            seats = store.seats[i]
+        if not store.has_votes[i] or seats <= 0 or method_for(store.types[i]) != 'fptp':
+            return None
+        if row is None:
+            row = store.row(i)
+        if sum(row) <= 0:
+            return None
+        return [(flip_threshold(row, j), 0 if wins_tie(row, j) else 1, i, seats) for j in range(len(row))]
+
+    def rebase(self, store, rows):
+        """数据发布了新版本 (写时复制)：切换到新版本并增量更新改动的行"""
+        self.store = store
+        for i in rows:
+            self.update_row(i)
+
+    def update_row(self, i):
+        """某个选区的票数/席位/类型变化后调用：删掉旧条目插入新条目，比例代表制席位减旧加新"""
+        old = self.current.pop(i, None)
+        if old is not None:
+            for party_keys, entry in zip(self.keys, old):
+                party_keys.remove(entry)
+        entries = self._entries(i)
+        if entries is not None:
+            self.current[i] = entries
+            for party_keys, entry in zip(self.keys, entries):
+                party_keys.insert(entry)
+
+        old_alloc = self.pr_alloc.pop(i, None)
+        if old_alloc is not None:
+            for k, v in enumerate(old_alloc):
+                self.pr_seats[k] -= v
+        if method_for(self.store.types[i]) != 'fptp':
+            new_alloc = allocate_store(self.store, [i]).get(i)
+            if new_alloc is not None:
+                self.pr_alloc[i] = new_alloc
+                for k, v in enumerate(new_alloc):
+                    self.pr_seats[k] += v
+
+    def seats_at_swing(self, j, swing):
+        """
+        政党 j 在全国统一摇摆 swing 时的预计席位
+        :return: (席位数, 赢下的 FPTP 选区数)
+        """
+        seats, won = self.keys[j].seats_before((swing, 1, -1))
+        return seats + self.pr_seats[j], won
+
+    def closest(self, j, swing=0.0, count=10):
+        """
+        在摇摆 swing 附近离翻转最近的 count 个选区
+        :return: [(行号, 阈值), ...] 按 |阈值 - swing| 从小到大
+        """
+        key = (swing, 1, -1)
+        upper = self.keys[j].after(key)
+        lower = self.keys[j].before(key)
+        hi = next(upper, None)
+        lo = next(lower, None)
+        result = []
+        while len(result) < count and (lo is not None or hi is not None):
+            take_hi = lo is None or (hi is not None and hi[0] - swing <= swing - lo[0])
+            if take_hi:
+                thr, _, i, _ = hi
+                hi = next(upper, None)
+            else:
+                thr, _, i, _ = lo
+                lo = next(lower, None)
+            if thr == NEG_INF:
+                continue
+            result.append((i, thr))
+        return result
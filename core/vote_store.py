@@ -0,0 +1,338 @@
+import csv
+import os
+from array import array
+
+PARTY_FIELDS = ['Party_ID', 'Name_CN', 'Color', 'Alliance']
+DISTRICT_FIELDS = ['District_ID', 'Province_ID', 'Name', 'Type', 'Seats']
+
+
+# 写时复制列的分块大小 (元素个数，2 的幂)
+CHUNK_SHIFT = 12
+CHUNK_SIZE = 1 << CHUNK_SHIFT
+_CHUNK_MASK = CHUNK_SIZE - 1
+
+
+def _to_int(value, default=0):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return default
+
+
+class ChunkedArray:
+    """
+    [写时复制列] 按 CHUNK_SIZE 个元素分块存放的 array，用法同 array (下标、切片、len、迭代)
+    copy() 只复制块列表 (块与原列共享)，之后第一次写某一块时才复制那一块：
+    单个选区的编辑只复制一块，不随选区数增长
+    """
+    __slots__ = ('typecode', 'chunks', 'owned', 'length')
+
+    def __init__(self, typecode, initializer=()):
+        self.typecode = typecode
+        self.chunks = []
+        self.owned = set()     # 本列独占、可以原地修改的块
+        self.length = 0
+        self.extend(initializer)
+
+    @property
+    def itemsize(self):
+        return array(self.typecode).itemsize
+
+    def copy(self):
+        new = ChunkedArray.__new__(ChunkedArray)
+        new.typecode = self.typecode
+        new.chunks = list(self.chunks)
+        new.owned = set()
+        new.length = self.length
+        # 块从此两边共享，原列再写也要先复制
+        self.owned = set()
+        return new
+
+    def _writable(self, c):
+        if c not in self.owned:
+            self.chunks[c] = array(self.typecode, self.chunks[c])
+            self.owned.add(c)
+        return self.chunks[c]
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+
+    def _range(self, key):
+        start, stop, step = key.indices(self.length)
+        if step != 1:
+            raise ValueError('ChunkedArray 只支持步长为 1 的切片')
+        return start, max(start, stop)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop = self._range(key)
+            c = start >> CHUNK_SHIFT
+            offset = start & _CHUNK_MASK
+            if offset + stop - start <= CHUNK_SIZE:
+                # 绝大多数切片 (一行票数) 落在同一块内
+                return self.chunks[c][offset:offset + stop - start] if stop > start else array(self.typecode)
+            out = array(self.typecode)
+            while start < stop:
+                n = min(CHUNK_SIZE - offset, stop - start)
+                out.extend(self.chunks[c][offset:offset + n])
+                start += n
+                c += 1
+                offset = 0
+            return out
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError('ChunkedArray index out of range')
+        return self.chunks[key >> CHUNK_SHIFT][key & _CHUNK_MASK]
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, stop = self._range(key)
+            if len(value) != stop - start:
+                raise ValueError('ChunkedArray 的切片赋值不能改变长度')
+            pos = 0
+            while start < stop:
+                c = start >> CHUNK_SHIFT
+                offset = start & _CHUNK_MASK
+                n = min(CHUNK_SIZE - offset, stop - start)
+                self._writable(c)[offset:offset + n] = array(self.typecode, value[pos:pos + n])
+                start += n
+                pos += n
+            return
+        if key < 0:
+            key += self.length
+        if not 0 <= key < self.length:
+            raise IndexError('ChunkedArray assignment index out of range')
+        self._writable(key >> CHUNK_SHIFT)[key & _CHUNK_MASK] = value
+
+    def append(self, value):
+        self.extend((value,))
+
+    def extend(self, values):
+        values = values if isinstance(values, array) and values.typecode == self.typecode \
+            else array(self.typecode, values)
+        pos = 0
+        while pos < len(values):
+            offset = self.length & _CHUNK_MASK
+            if offset == 0:
+                self.chunks.append(array(self.typecode))
+                self.owned.add(len(self.chunks) - 1)
+            n = min(CHUNK_SIZE - offset, len(values) - pos)
+            self._writable(len(self.chunks) - 1).extend(values[pos:pos + n])
+            self.length += n
+            pos += n
+
+    def frombytes(self, data):
+        values = array(self.typecode)
+        values.frombytes(data)
+        self.extend(values)
+
+    def byteswap(self):
+        for c in range(len(self.chunks)):
+            self._writable(c).byteswap()
+
+    def to_array(self):
+        """拼成一个普通 array (副本)"""
+        out = array(self.typecode)
+        for chunk in self.chunks:
+            out.extend(chunk)
+        return out
+
+    def tolist(self):
+        return self.to_array().tolist()
+
+    def tobytes(self):
+        return b''.join(chunk.tobytes() for chunk in self.chunks)
+
+    def __bytes__(self):
+        return self.tobytes()
+
+
+class VoteStore:
+    """
+    [内存数据库] 工作区三张表的紧凑列式存储
+    - 政党表: parties (保持 parties.csv 的行顺序)
+    - 选区表: district_ids / province_ids / names / types / seats 各自一列
+    - 票数表: votes 为 选区数 × 政党数 的行主序整数矩阵
+    """
+
+    def __init__(self):
+        self.parties = []            # [{'Party_ID':..., 'Name_CN':..., 'Color':..., 'Alliance':...}]
+        self.party_ids = []          # votes.csv 的政党列顺序 (矩阵的列)
+        self.party_col = {}          # Party_ID -> 列号
+
+        self.district_ids = []
+        self.index = {}              # District_ID -> 行号
+        self.province_ids = []
+        self.names = []
+        self.types = []
+        self.seats = ChunkedArray('l')
+        self.votes = ChunkedArray('q')
+        self.has_meta = bytearray()  # 该行是否出现在 districts.csv
+        self.has_votes = bytearray() # 该行是否出现在 votes.csv
+
+    # === 基础访问 ===
+    @property
+    def num_parties(self):
+        return len(self.party_ids)
+
+    def __len__(self):
+        return len(self.district_ids)
+
+    def copy(self, structural=False):
+        """
+        [写时复制] 复制出一个可修改的新版本，旧版本继续供读者使用
+        默认只复制会被编辑的列 (票数、席位)，其他列与旧版本共享；
+        票数、席位是写时复制列 (ChunkedArray)，这里只复制块列表，真正被改到的块才复制
+        structural=True 时全部复制 (要新增选区等改变表结构的场合)
+        """
+        new = VoteStore.__new__(VoteStore)
+        new.__dict__.update(self.__dict__)
+        new.seats = self.seats.copy()
+        new.votes = self.votes.copy()
+        if structural:
+            new.parties = [dict(p) for p in self.parties]
+            new.party_ids = list(self.party_ids)
+            new.party_col = dict(self.party_col)
+            new.district_ids = list(self.district_ids)
+            new.index = dict(self.index)
+            new.province_ids = list(self.province_ids)
+            new.names = list(self.names)
+            new.types = list(self.types)
+            new.has_meta = bytearray(self.has_meta)
+            new.has_votes = bytearray(self.has_votes)
+        return new
+
+    def nbytes(self):
+        """粗略的内存占用 (字节)：数值列按实际大小 (与其他版本共享的块也算在内)，字符串列按每项 64 字节估算"""
+        numeric = (self.votes.itemsize * len(self.votes) + self.seats.itemsize * len(self.seats)
+                   + len(self.has_meta) + len(self.has_votes))
+        return numeric + 64 * 4 * len(self.district_ids)
+
+    def row(self, i):
+        """取第 i 个选区的票数行 (array，是副本)"""
+        p = self.num_parties
+        return self.votes[i * p:(i + 1) * p]
+
+    def rows(self):
+        """
+        按行号顺序逐行产出票数行 (array，是副本)；整表扫描用，
+        每块只做一次拼接，逐行切片都在 C 层完成，比逐个调用 row(i) 快
+        """
+        p = self.num_parties
+        if not p:
+            for _ in range(len(self)):
+                yield array('q')
+            return
+        tail = array('q')
+        for chunk in self.votes.chunks:
+            data = tail + chunk if tail else chunk
+            end = len(data) - len(data) % p
+            for start in range(0, end, p):
+                yield data[start:start + p]
+            tail = data[end:]
+
+    def set_row(self, i, values):
+        p = self.num_parties
+        self.votes[i * p:(i + 1) * p] = array('q', values)
+
+    def add_district(self, district_id, province_id='', name=None, d_type='FPTP', seats=1):
+        """追加一个空选区，返回行号 (已存在则直接返回原行号)"""
+        i = self.index.get(district_id)
+        if i is not None:
+            return i
+        i = len(self.district_ids)
+        self.index[district_id] = i
+        self.district_ids.append(district_id)
+        self.province_ids.append(province_id)
+        self.names.append(name if name is not None else district_id)
+        self.types.append(d_type)
+        self.seats.append(seats)
+        self.votes.extend(array('q', bytes(8 * self.num_parties)))
+        self.has_meta.append(0)
+        self.has_votes.append(0)
+        return i
+
+    def flatten_columns(self):
+        """批量载入前：票数、席位换成普通 array (逐行追加快得多)，载入完调用 chunk_columns"""
+        self.seats = self.seats.to_array() if isinstance(self.seats, ChunkedArray) else self.seats
+        self.votes = self.votes.to_array() if isinstance(self.votes, ChunkedArray) else self.votes
+
+    def chunk_columns(self):
+        """批量载入后：票数、席位换回写时复制列"""
+        self.seats = ChunkedArray('l', self.seats)
+        self.votes = ChunkedArray('q', self.votes)
+
+    def party_names(self):
+        """{'P_01': '自由党', ...}"""
+        return {p['Party_ID']: p['Name_CN'] for p in self.parties}
+
+    # === CSV 读写 ===
+    @classmethod
+    def from_csv(cls, files):
+        store = cls()
+        store.flatten_columns()
+
+        if os.path.exists(files['parties']):
+            with open(files['parties'], 'r', encoding='utf-8-sig') as f:
+                for row in csv.DictReader(f):
+                    store.parties.append({k: row.get(k) or '' for k in PARTY_FIELDS})
+
+        if os.path.exists(files['votes']):
+            with open(files['votes'], 'r', encoding='utf-8-sig') as f:
+                reader = csv.reader(f)
+                header = next(reader, None) or ['District_ID']
+                store.party_ids = header[1:]
+                store.party_col = {pid: j for j, pid in enumerate(store.party_ids)}
+                p = len(store.party_ids)
+                for row in reader:
+                    if not row:
+                        continue
+                    i = store.add_district(row[0])
+                    values = [_to_int(v) for v in row[1:p + 1]]
+                    values.extend([0] * (p - len(values)))
+                    store.set_row(i, values)
+                    store.has_votes[i] = 1
+
+        if os.path.exists(files['districts']):
+            with open(files['districts'], 'r', encoding='utf-8-sig') as f:
+                for row in csv.DictReader(f):
+                    d_id = row.get('District_ID')
+                    if d_id is None:
+                        continue
+                    i = store.add_district(d_id)
+                    store.province_ids[i] = row.get('Province_ID') or ''
+                    store.names[i] = row.get('Name') or d_id
+                    store.types[i] = row.get('Type') or ''
+                    # 容错处理：确保Seats是数字
+                    store.seats[i] = _to_int(row.get('Seats'), 1)
+                    store.has_meta[i] = 1
+
+        store.chunk_columns()
+        return store
+
+    def write_parties(self, path):
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(PARTY_FIELDS)
+            w.writerows([p[k] for k in PARTY_FIELDS] for p in self.parties)
+
+    def write_districts(self, path):
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(DISTRICT_FIELDS)
+            for i, seats in enumerate(self.seats):
+                if self.has_meta[i]:
+                    w.writerow([self.district_ids[i], self.province_ids[i], self.names[i], self.types[i], seats])
+
+    def write_votes(self, path):
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            w = csv.writer(f)
+            w.writerow(['District_ID'] + self.party_ids)
+            for d_id, has_votes, row in zip(self.district_ids, self.has_votes, self.rows()):
+                if has_votes:
+                    w.writerow([d_id] + row.tolist())
@@ -0,0 +1,127 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from .data_manager import DataManager
+from . import renderer
+from .spatial_index import release_spatial_index
+
+# 工作区ID只允许字母、数字、下划线和短横线 (直接用作目录名)
+_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+DEFAULT_ID = 'default'
+
+# 解析后的 SVG 模板 (ElementTree + 序列化片段缓存) 内存约为文件大小的这么多倍
+TEMPLATE_FACTOR = 7
+
+
+def valid_id(ws_id):
+    return bool(ws_id) and _ID_RE.match(ws_id) is not None
+
+
+class Workspace:
+    """
+    一张地图的全部文件：上传的原图、清洗后的 SVG、数据表 (DataManager)
+    以及该工作区的清洗进度
+    """
+
+    def __init__(self, ws_id, svg_folder, data_folder, backend='csv'):
+        self.id = ws_id
+        self.svg_folder = svg_folder
+        os.makedirs(svg_folder, exist_ok=True)
+        self.raw_svg = os.path.join(svg_folder, 'raw.svg')
+        self.cleaned_svg = os.path.join(svg_folder, 'cleaned.svg')
+        self.import_csv = os.path.join(svg_folder, 'import_temp.csv')
+        self.data = DataManager(data_folder, backend)
+        self.data.init_workspace()
+        self.progress = {'stage': 'idle', 'done': 0, 'total': 0, 'districts': 0}
+
+    def memory_size(self):
+        """估算的常驻内存 (字节)：数据表 + 已解析的模板"""
+        size = self.data.memory_size()
+        if os.path.exists(self.cleaned_svg):
+            size += os.path.getsize(self.cleaned_svg) * TEMPLATE_FACTOR
+        return size
+
+    def close(self):
+        """换出缓存：数据写回磁盘，释放内存中的数据和模板"""
+        self.data.close()
+        renderer.release_template(self.cleaned_svg)
+        release_spatial_index(self.cleaned_svg)
+
+
+class WorkspacePool:
+    """
+    [工作区缓存] 按ID取工作区，最近使用的常驻内存 (LRU)
+    - 数量超过 max_workspaces，或估算内存超过 max_bytes 时，换出最久未用的工作区
+    - 换出时先把未压实的编辑写回 CSV，下次访问再从磁盘载入
+    - 'default' 工作区沿用旧版的目录布局 (static/uploads + static/data_workspace)
+    - backend: 数据存储方式，'csv' 或 'sqlite' (见 DataManager)
+    """
+
+    def __init__(self, root, default_svg_folder, default_data_folder,
+                 max_workspaces=8, max_bytes=1 << 30, backend='csv'):
+        self.root = root
+        self.backend = backend
+        self.default_folders = (default_svg_folder, default_data_folder)
+        self.max_workspaces = max_workspaces
+        self.max_bytes = max_bytes
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def folders_for(self, ws_id):
+        if ws_id == DEFAULT_ID:
+            return self.default_folders
+        base = os.path.join(self.root, ws_id)
+        return os.path.join(base, 'svg'), os.path.join(base, 'data')
+
+    def get(self, ws_id=DEFAULT_ID):
+        """
+        取工作区 (不存在则新建)
+        :raises ValueError: ID 不合法
+        """
+        ws_id = ws_id or DEFAULT_ID
+        if not valid_id(ws_id):
+            raise ValueError(f'非法的工作区ID: {ws_id}')
+        with self._lock:
+            ws = self._loaded.get(ws_id)
+            if ws is None:
+                ws = self._loaded[ws_id] = Workspace(ws_id, *self.folders_for(ws_id), self.backend)
+            else:
+                self._loaded.move_to_end(ws_id)
+            # 数据是首次访问时才载入的，所以每次取用都重新检查内存上限
+            evicted = self._evict()
+        for old in evicted:
+            old.close()
+        return ws
+
+    def _evict(self):
+        """挑出需要换出的工作区 (调用方持有锁；至少保留最近使用的一个)"""
+        evicted = []
+        while len(self._loaded) > 1:
+            over_count = len(self._loaded) > self.max_workspaces
+            over_size = sum(ws.memory_size() for ws in self._loaded.values()) > self.max_bytes
+            if not (over_count or over_size):
+                break
+            _, ws = self._loaded.popitem(last=False)
+            evicted.append(ws)
+        return evicted
+
+    def list_ids(self):
+        """磁盘上所有工作区ID (含 default)，以及当前载入内存的ID"""
+        ids = {DEFAULT_ID}
+        for name in os.listdir(self.root):
+            if valid_id(name) and os.path.isdir(os.path.join(self.root, name)):
+                ids.add(name)
+        with self._lock:
+            loaded = list(self._loaded)
+        return sorted(ids), loaded
+
+    def close_all(self):
+        with self._lock:
+            loaded = list(self._loaded.values())
+            self._loaded.clear()
+        for ws in loaded:
+            ws.close()
@@ -10,6 +10,13 @@ let currentTranslateY = 0;
 let isDragging = false;
 let startDragX = 0;
 let startDragY = 0;
+// 套索框选 (Alt + 拖拽)：进行中时为 {points: [[x, y], ...], line: <polyline>}
+let lasso = null;
+// 上一次渲染结果的 ETag (内容哈希)，静默刷新 GET 结果时带上，未变化则服务器回 304
+let lastRenderEtag = null;
+// 当前工作区 (地址栏 ?ws=xxx)，每个请求都通过 X-Workspace 头带给后端
+const WORKSPACE_ID = new URLSearchParams(location.search).get('ws') || 'default';
+const WS_HEADERS = {'X-Workspace': WORKSPACE_ID};
 
 // === 1. 渲染地图主函数 ===
 async function renderMap(preserveZoom = false) {
@@ -36,6 +43,7 @@ async function renderMap(preserveZoom = false) {
     
     formData.append('map_title', mapTitle);
     formData.append('stroke_width', strokeWidth);
+    formData.append('precision', document.getElementById('svgPrecision').value);
 
     // 只有在非静默更新时才显示Loading，避免保存时闪烁
     if (!preserveZoom) {
@@ -47,45 +55,147 @@ async function renderMap(preserveZoom = false) {
     }
 
     try {
-        const response = await fetch('/api/process', {
-            method: 'POST',
-            body: formData
-        });
-
-        const result = await response.json();
+        let result, svgSize = null, importInfo = null;
+        if ((svgInput.files[0] || csvInput.files[0]) && !preserveZoom) {
+            // 上传了新文件：放进后台任务，轮询进度，完成后再取渲染结果
+            const job = await runProcessJob(formData, btn);
+            if (!job) return; // 已取消
+            const res = await fetch(job.result_url, {headers: WS_HEADERS});
+            result = await res.json();
+            if (!res.ok) throw new Error(result.error || "获取渲染结果失败");
+            svgSize = job.svg_size;
+            importInfo = job.import;
+        } else if (preserveZoom && lastRenderEtag && !svgInput.files[0] && !csvInput.files[0]) {
+            // 静默刷新：POST 只拿结果引用，再用条件 GET 取正文，地图没变化时服务器回 304
+            formData.append('reference', '1');
+            const ref = await fetch('/api/process', {method: 'POST', headers: WS_HEADERS, body: formData});
+            const info = await ref.json();
+            if (!ref.ok) throw new Error(info.error);
+            const res = await fetch(info.result_url, {
+                headers: {...WS_HEADERS, 'If-None-Match': `"${lastRenderEtag}"`}
+            });
+            // 地图内容没有变化
+            if (res.status === 304) return;
+            result = await res.json();
+            if (!res.ok) throw new Error(result.error || "获取渲染结果失败");
+        } else {
+            const response = await fetch('/api/process', {
+                method: 'POST',
+                headers: WS_HEADERS,
+                body: formData
+            });
 
-        if (response.ok) {
-            container.innerHTML = result.svg_content;
-            document.getElementById('downloadArea').style.display = 'block';
-            document.getElementById('downloadLink').href = result.download_url;
-            
-            // 绑定交互事件
-            attachInteractiveEvents();
-            
-            // 初始化缩放逻辑 (如果是保存更新，则不重置位置)
-            if (!preserveZoom) {
-                resetZoom(); // 新图，重置
-            } else {
-                applyTransform(); // 旧图更新，保持位置
+            result = await response.json();
+            if (!response.ok) throw new Error(result.error);
+            const svgBytes = response.headers.get('X-SVG-Bytes');
+            if (svgBytes) {
+                const [before, after] = svgBytes.split(',').map(Number);
+                svgSize = {before, after};
             }
-            if (currentViewMode === 'seats') {
-                switchView('seats'); 
+            const importRows = response.headers.get('X-Import-Rows');
+            if (importRows) {
+                const [rows, error_count] = importRows.split(',').map(Number);
+                importInfo = {rows, error_count};
             }
-            // 清空文件框
-            svgInput.value = ''; 
-            csvInput.value = ''; 
+        }
 
+        container.innerHTML = result.svg_content;
+        lastRenderEtag = result.etag;
+        if (svgSize) {
+            console.log(`[SVG] 清洗后 ${svgSize.before} -> ${svgSize.after} 字节`);
+        }
+        if (importInfo) {
+            console.log(`[导入] ${importInfo.rows} 个选区, ${importInfo.error_count} 行错误`);
+            if (importInfo.error_count > 0) showImportErrors(importInfo.error_count, importInfo.errors);
+        }
+        document.getElementById('downloadArea').style.display = 'block';
+        document.getElementById('downloadLink').href = result.download_url;
+        
+        // 绑定交互事件
+        attachInteractiveEvents();
+        
+        // 初始化缩放逻辑 (如果是保存更新，则不重置位置)
+        if (!preserveZoom) {
+            resetZoom(); // 新图，重置
         } else {
-            alert("错误: " + result.error);
+            applyTransform(); // 旧图更新，保持位置
         }
+        if (currentViewMode === 'seats') {
+            switchView('seats'); 
+        }
+        // 清空文件框
+        svgInput.value = ''; 
+        csvInput.value = ''; 
+
     } catch (error) {
         console.error(error);
-        alert("网络请求失败");
+        alert(error instanceof TypeError ? "网络请求失败" : "错误: " + error.message);
     } finally {
         btn.textContent = "🚀 生成/更新地图";
         btn.disabled = false;
     }
 }
+
+// === 后台任务：提交上传 + 渲染，轮询进度 ===
+let currentJobId = null;
+
+// 返回任务结果 (含 result_url)；任务被取消时返回 null，失败时抛出异常
+async function runProcessJob(formData, btn) {
+    formData.append('async', '1');
+    const submit = await fetch('/api/process', {method: 'POST', headers: WS_HEADERS, body: formData});
+    const info = await submit.json();
+    if (!submit.ok) throw new Error(info.error);
+
+    currentJobId = info.job_id;
+    const cancelBtn = document.getElementById('cancelJobBtn');
+    cancelBtn.style.display = 'block';
+    try {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 500));
+            const res = await fetch(`/api/jobs/${info.job_id}`, {headers: WS_HEADERS});
+            const job = await res.json();
+            if (!res.ok) throw new Error(job.error);
+
+            const p = job.progress;
+            if (job.status === 'queued') {
+                btn.textContent = "⏳ 排队中...";
+            } else if (p.stage === 'cleaning' && p.total > 0) {
+                btn.textContent = `⏳ 清洗中 ${Math.floor(p.done / p.total * 100)}% (${p.districts} 个选区)`;
+            } else if (p.stage === 'importing' && p.total > 0) {
+                btn.textContent = `⏳ 导入中 ${Math.floor(p.done / p.total * 100)}% (${p.districts} 个选区)`;
+            } else if (p.stage === 'rendering') {
+                btn.textContent = "⏳ 渲染中...";
+            }
+
+            if (job.status === 'done') return job.result;
+            if (job.status === 'cancelled') return null;
+            if (job.status === 'failed') throw new Error(job.error);
+        }
+    } finally {
+        currentJobId = null;
+        cancelBtn.style.display = 'none';
+    }
+}
+
+async function cancelCurrentJob() {
+    if (!currentJobId) return;
+    try {
+        await fetch(`/api/jobs/${currentJobId}/cancel`, {method: 'POST', headers: WS_HEADERS});
+    } catch (e) { console.error(e); }
+}
+
+// 导入时跳过的坏行 (最多显示前 10 条)；没有带明细时从进度接口获取
+async function showImportErrors(count, errors = null) {
+    try {
+        if (!errors) {
+            const res = await fetch('/api/process/progress', {headers: WS_HEADERS});
+            const p = await res.json();
+            errors = (p.import && p.import.errors) || [];
+        }
+        const lines = errors.slice(0, 10).map(e => `第 ${e.line} 行 ${e.district_id}: ${e.error}`);
+        alert(`导入时跳过了 ${count} 行错误数据:\n` + lines.join("\n"));
+    } catch (e) { console.error(e); }
+}
 // === 初始化高亮图层 ===
 // 这个函数需要在 renderMap 成功后调用一次
 function initHighlightLayer() {
@@ -128,6 +238,12 @@ function initZoomControls() {
 
     // 鼠标拖拽平移
     viewport.addEventListener('mousedown', (e) => {
+        // Alt + 拖拽 -> 套索框选，不平移
+        if (e.altKey) {
+            e.preventDefault();
+            startLasso(e);
+            return;
+        }
         isDragging = true;
         startDragX = e.clientX - currentTranslateX;
         startDragY = e.clientY - currentTranslateY;
@@ -138,6 +254,10 @@ function initZoomControls() {
     let isTicking = false; // 锁
 
     window.addEventListener('mousemove', (e) => {
+        if (lasso) {
+            extendLasso(e);
+            return;
+        }
         if (!isDragging) return;
         e.preventDefault();
 
@@ -157,6 +277,7 @@ function initZoomControls() {
     });
 
     window.addEventListener('mouseup', () => {
+        if (lasso) finishLasso();
         isDragging = false;
         if (viewport) viewport.style.cursor = 'grab';
     });
@@ -253,12 +374,14 @@ function attachInteractiveEvents() {
         path.addEventListener('mousemove', (e) => {
             const party = path.getAttribute('data-party');
             const rate = path.getAttribute('data-rate');
+            const alloc = path.getAttribute('data-alloc');
             const id = path.id;
 
             tooltip.innerHTML = `
                 <div style="font-weight:bold; margin-bottom:2px;">${id}</div>
                 <div>胜出: <span style="color:#ffcc00">${party}</span></div>
                 <div>得票: ${rate}</div>
+                ${alloc ? `<div>席位: ${alloc}</div>` : ''}
             `;
             tooltip.style.display = 'block';
             tooltip.style.left = (e.pageX + 15) + 'px';
@@ -289,8 +412,8 @@ function attachInteractiveEvents() {
     const container = document.getElementById('svgContainer');
     // 使用 onmouseup 避免多次绑定
     container.onmouseup = (e) => {
-        // 没按Shift才清空
-        if (!e.shiftKey) {
+        // 没按Shift才清空 (套索松开时不清空)
+        if (!e.shiftKey && !lasso) {
             clearSelection();
         }
     };
@@ -333,6 +456,82 @@ function toggleSelection(pathElement) {
     renderBatchPanel();
 }
 
+// 批量选中 (套索结果)：已选中的保持不变，最后统一刷新一次面板
+function selectDistrictIds(ids) {
+    const layer = document.getElementById('highlight-layer');
+    let added = 0;
+    ids.forEach(id => {
+        if (selectedDistricts.has(id)) return;
+        const pathElement = document.getElementById(id);
+        if (!pathElement) return;
+        selectedDistricts.add(id);
+        pathElement.classList.add('selected-source');
+
+        const use = document.createElementNS("http://www.w3.org/2000/svg", "use");
+        use.setAttributeNS("http://www.w3.org/1999/xlink", "xlink:href", `#${id}`);
+        use.id = `highlight-${id}`;
+        use.classList.add('highlight-clone');
+        layer.appendChild(use);
+        added++;
+    });
+    console.log(`套索新增 ${added} 个选区，当前选中了 ${selectedDistricts.size} 个选区`);
+    if (selectedDistricts.size) renderBatchPanel();
+}
+
+// === 套索框选 ===
+// 屏幕坐标 -> SVG 用户坐标 (与清洗时记录的包围盒同一坐标系，已包含缩放平移)
+function toSvgPoint(svg, e) {
+    const pt = svg.createSVGPoint();
+    pt.x = e.clientX;
+    pt.y = e.clientY;
+    const p = pt.matrixTransform(svg.getScreenCTM().inverse());
+    return [p.x, p.y];
+}
+
+function startLasso(e) {
+    const svg = document.querySelector('#svgContainer svg');
+    const layer = document.getElementById('highlight-layer');
+    if (!svg || !layer) return;
+    const line = document.createElementNS("http://www.w3.org/2000/svg", "polyline");
+    line.classList.add('lasso-line');
+    layer.appendChild(line);
+    lasso = {svg, line, points: [toSvgPoint(svg, e)]};
+}
+
+function extendLasso(e) {
+    const point = toSvgPoint(lasso.svg, e);
+    const last = lasso.points[lasso.points.length - 1];
+    // 只记录移动了一定距离的点，避免一次套索几千个点
+    const minStep = 2 / lasso.svg.getScreenCTM().a;
+    if (Math.abs(point[0] - last[0]) < minStep && Math.abs(point[1] - last[1]) < minStep) return;
+    lasso.points.push(point);
+    lasso.line.setAttribute('points', lasso.points.map(p => p.join(',')).join(' '));
+}
+
+async function finishLasso() {
+    const {line, points} = lasso;
+    lasso = null;
+    line.remove();
+    if (points.length < 3) return;
+
+    try {
+        const res = await fetch('/api/select', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json', ...WS_HEADERS},
+            body: JSON.stringify({polygon: points})
+        });
+        const result = await res.json();
+        if (!res.ok) {
+            alert("框选失败: " + result.error);
+            return;
+        }
+        selectDistrictIds(result.district_ids);
+    } catch (e) {
+        console.error(e);
+        alert("网络错误");
+    }
+}
+
 // === 清空选择 ===
 function clearSelection() {
     selectedDistricts.clear();
@@ -363,7 +562,7 @@ async function openEditor(id) {
     title.textContent = `加载中...`;
     
     try {
-        const res = await fetch(`/api/district/${id}`);
+        const res = await fetch(`/api/district/${id}`, {headers: WS_HEADERS});
         const json = await res.json();
         
         if (json.status === 'success') {
@@ -508,7 +707,7 @@ async function saveChanges() {
     try {
         const res = await fetch('/api/district/update', {
             method: 'POST',
-            headers: {'Content-Type': 'application/json'},
+            headers: {'Content-Type': 'application/json', ...WS_HEADERS},
             body: JSON.stringify({
                 district_id: currentEditingId,
                 seats: seatsVal, // 发送席位数据
@@ -600,11 +799,34 @@ function renderBatchPanel() {
         const display = document.getElementById('swingValueDisplay');
         display.textContent = (val > 0 ? '+' : '') + val + '%';
         display.style.color = val > 0 ? '#d32f2f' : (val < 0 ? '#388e3c' : '#333');
+        previewTipping();
     };
+    document.getElementById('batchPartySelect').onchange = previewTipping;
+    previewTipping();
     
     // 修改按钮文字
     document.getElementById('btnSaveCommon').textContent = "⚡ 应用批量摇摆";
 }
+// 全国统一摇摆预览：只查询临界点索引，不修改数据
+let tippingRequestId = 0;
+async function previewTipping() {
+    const partyId = document.getElementById('batchPartySelect').value;
+    const percent = document.getElementById('batchSwingSlider').value;
+    const preview = document.getElementById('tippingPreview');
+    if (!partyId) return;
+
+    const requestId = ++tippingRequestId;
+    try {
+        const res = await fetch(`/api/tipping/${encodeURIComponent(partyId)}?percent=${percent}&n=5`, {headers: WS_HEADERS});
+        if (!res.ok || requestId !== tippingRequestId) return; // 只显示最后一次拖动的结果
+        const json = await res.json();
+        const r = json.result;
+        const near = r.closest.map(d => `${d.Name || d.District_ID} (${d.swing > 0 ? '+' : ''}${d.swing}%)`).join('、');
+        preview.textContent = `全国统一摇摆时预计 ${r.seats} 席；最接近翻转：${near || '无'}`;
+    } catch (e) {
+        console.error(e);
+    }
+}
 async function applyBatchSwing() {
     const partyId = document.getElementById('batchPartySelect').value;
     const percent = document.getElementById('batchSwingSlider').value;
@@ -624,7 +846,7 @@ async function applyBatchSwing() {
     try {
         const res = await fetch('/api/batch/swing', {
             method: 'POST',
-            headers: {'Content-Type': 'application/json'},
+            headers: {'Content-Type': 'application/json', ...WS_HEADERS},
             body: JSON.stringify({
                 district_ids: districtIds,
                 party_id: partyId,
@@ -634,6 +856,10 @@ async function applyBatchSwing() {
         });
 
         if (res.ok) {
+            const json = await res.json();
+            if (json.summary) {
+                console.log(`[摇摆] 变化 ${json.summary.changed} 个选区, 翻转 ${json.summary.flipped.length} 个`, json.summary.seat_changes);
+            }
             await renderMap(true); 
         } else {
             alert("更新失败");
@@ -646,6 +872,71 @@ async function applyBatchSwing() {
         btn.disabled = false;
     }
 }
+// === 批量修正：粘贴 Excel 表格，一次请求写入，只重绘一次 ===
+const BULK_FIELDS = {'District_ID': 'district_id', 'Seats': 'seats', 'Province_ID': 'province_id', 'Name': 'name', 'Type': 'type'};
+
+function parseBulkTable(text) {
+    const lines = text.split(/\r?\n/).filter(line => line.trim() !== '');
+    if (lines.length < 2) return [];
+    const sep = lines[0].includes('\t') ? '\t' : ',';
+    const header = lines[0].split(sep).map(h => h.trim());
+    // 表头可以写政党名，按已知政党列表换成ID
+    const nameToId = {};
+    globalPartyList.forEach(p => { nameToId[p.name] = p.id; });
+
+    return lines.slice(1).map(line => {
+        const cells = line.split(sep).map(c => c.trim());
+        const record = {votes: {}};
+        header.forEach((h, k) => {
+            const value = cells[k];
+            if (value === undefined || value === '') return;
+            if (BULK_FIELDS[h]) {
+                record[BULK_FIELDS[h]] = value;
+            } else {
+                record.votes[nameToId[h] || h] = value.replace(/,/g, '');
+            }
+        });
+        return record;
+    });
+}
+
+async function bulkUpdateDistricts() {
+    const records = parseBulkTable(document.getElementById('bulkData').value);
+    if (records.length === 0) {
+        alert("请粘贴带表头的数据 (至少一行)");
+        return;
+    }
+
+    const btn = document.getElementById('bulkUpdateBtn');
+    const oldText = btn.textContent;
+    btn.textContent = "写入中...";
+    btn.disabled = true;
+
+    try {
+        const res = await fetch('/api/district/bulk_update', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json', ...WS_HEADERS},
+            body: JSON.stringify({records: records, create_missing: true})
+        });
+        const json = await res.json();
+
+        if (res.ok) {
+            console.log(`[批量修正] 修改 ${json.updated} 个选区, 新建 ${json.created.length} 个`);
+            await renderMap(true);
+        } else if (json.errors) {
+            const lines = json.errors.slice(0, 10).map(e => `第 ${e.index + 2} 行 ${e.district_id || ''}: ${e.error}`);
+            alert(json.error + "\n" + lines.join("\n"));
+        } else {
+            alert("写入失败: " + json.error);
+        }
+    } catch (e) {
+        console.error(e);
+        alert("网络错误");
+    } finally {
+        btn.textContent = oldText;
+        btn.disabled = false;
+    }
+}
 // 页面加载完成后初始化缩放控制器
 window.onload = function() {
     // 1. 初始化缩放控制器
@@ -0,0 +1,68 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import district_id, generate_legacy_csv
+from core.aggregates import Aggregates
+from core.data_manager import DataManager
+
+PARTIES = ['P_01', 'P_02', 'P_03', 'P_04']
+
+
+def _rounded(value):
+    """领先幅度之和是浮点数累加，增量减旧加新后只在末位有差别"""
+    if isinstance(value, float):
+        return round(value, 9)
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_rounded(v) for v in value]
+    return value
+
+
+def test_incremental_rebase_matches_rebuild(tmp_path):
+    legacy = str(tmp_path / 'legacy.csv')
+    generate_legacy_csv(legacy, 80, len(PARTIES), 5)
+    dm = DataManager(str(tmp_path / 'data'))
+    dm.import_from_legacy_v2(legacy)
+    dm.get_summary()
+    aggregates = dm._aggregates
+    rng = random.Random(1)
+
+    def check():
+        # 改动的行数都远小于全表一半，应当走增量更新而不是重建
+        assert dm._aggregates is aggregates
+        store = dm._get_store()
+        assert aggregates.store is store
+        assert _rounded(dm.get_summary()) == _rounded(Aggregates(store).summary())
+
+    for _ in range(20):
+        d_id = district_id(rng.randrange(80))
+        votes = {pid: rng.choice([0, rng.randint(0, 5000)]) for pid in PARTIES}
+        dm.update_district_data(d_id, rng.choice([0, 1, 1, 3]), votes)
+    check()
+
+    # 批量修正：改席位 / 票数，并新建选区 (含一个新省份)
+    dm.bulk_update_districts([
+        {'district_id': district_id(3), 'seats': 2, 'votes': {'P_02': 99999}},
+        {'district_id': district_id(4), 'votes': {pid: 0 for pid in PARTIES}},
+        {'district_id': 'NEW-1', 'province_id': 'PR99', 'type': 'DHONDT', 'seats': 4,
+         'votes': {'P_01': 500, 'P_03': 400, 'P_04': 100}},
+        {'district_id': 'NEW-2', 'province_id': 'PR99', 'votes': {'P_04': 10}},
+    ])
+    check()
+    assert 'PR99' in dm.get_summary()['provinces']
+
+    # 摇摆
+    for percent in (0.05, -0.08, 0.02):
+        ids = [district_id(k) for k in rng.sample(range(80), 15)] + ['NEW-1']
+        dm.batch_swing_update(ids, rng.choice(PARTIES), percent, lock_total=rng.random() < 0.5)
+        check()
+
+    # 省内最后的有效选区失效后，该省从汇总里消失
+    dm.bulk_update_districts([{'district_id': 'NEW-1', 'seats': 0}, {'district_id': 'NEW-2', 'seats': 0}])
+    check()
+    assert 'PR99' not in dm.get_summary()['provinces']
+    dm.close()
@@ -0,0 +1,48 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_legacy_csv, generate_svg
+from core import svg_processor
+from core.batch_export import export_variants, load_variants
+from core.data_manager import DataManager
+
+
+def _write(tmp_path, variants):
+    path = tmp_path / 'variants.json'
+    path.write_text(json.dumps(variants, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+def test_load_variants_rejects_bad_swing(tmp_path):
+    for swing, message in (({'percent': 3}, 'party'),
+                           ({'party': 'P_01', 'percent': 'abc'}, 'percent'),
+                           ({'party': 'P_01', 'percent': 3, 'provinces': 'X01'}, 'provinces')):
+        with pytest.raises(ValueError, match=message):
+            load_variants(_write(tmp_path, [{'name': 'a', 'swing': swing}]))
+    variants = [{'name': 'a', 'swing': {'party': 'P_01', 'percent': '2.5', 'districts': ['D-000001']}}]
+    assert load_variants(_write(tmp_path, variants)) == variants
+
+
+def test_sequential_export_reports_failed_variant(tmp_path):
+    raw, cleaned, legacy = (str(tmp_path / name) for name in ('raw.svg', 'cleaned.svg', 'legacy.csv'))
+    generate_svg(raw, 30, 3)
+    generate_legacy_csv(legacy, 30, 3, 3)
+    assert svg_processor.clean_and_extract_ids(raw, cleaned)[0]
+    workspace = str(tmp_path / 'ws')
+    dm = DataManager(workspace)
+    dm.import_from_legacy_v2(legacy)
+    dm.close()
+
+    # 不经过 load_variants 的情景：顺序路径也要把异常记为单个失败
+    variants = [{'name': 'bad', 'swing': {'party': 'P_01', 'percent': 'abc'}},
+                {'name': 'missing', 'swing': {'percent': 1}},
+                {'name': 'good', 'swing': {'party': 'P_01', 'percent': 2}}]
+    report = export_variants(cleaned, workspace, variants, str(tmp_path / 'out'), jobs=1)
+    assert [v['ok'] for v in report['variants']] == [False, False, True]
+    assert report['maps'] == 1 and report['failed'] == 2
+    assert os.path.exists(str(tmp_path / 'out' / 'good.svg'))
@@ -0,0 +1,84 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import concurrency
+from core.concurrency import atomic_write
+
+
+def _record_calls(monkeypatch):
+    """记录 fsync / replace 的调用顺序：('fsync', 文件或目录路径) / ('replace', 源, 目标)"""
+    calls = []
+    fd_paths = {}
+    real_open, real_fsync, real_replace = os.open, os.fsync, os.replace
+
+    def fake_open(path, flags, *args):
+        fd = real_open(path, flags, *args)
+        fd_paths[fd] = os.path.abspath(path)
+        return fd
+
+    def fake_fsync(fd):
+        calls.append(('fsync', fd_paths.get(fd)))
+        real_fsync(fd)
+
+    def fake_replace(src, dst):
+        # 被替换的一刻，临时文件里必须已经是 writer 写完的全部内容
+        with open(src, 'rb') as f:
+            calls.append(('replace', os.path.abspath(src), os.path.abspath(dst), f.read()))
+        real_replace(src, dst)
+
+    monkeypatch.setattr(concurrency.os, 'open', fake_open)
+    monkeypatch.setattr(concurrency.os, 'fsync', fake_fsync)
+    monkeypatch.setattr(concurrency.os, 'replace', fake_replace)
+    return calls
+
+
+def test_atomic_write_flushes_before_replace(tmp_path, monkeypatch):
+    target = tmp_path / 'votes.csv'
+    target.write_text('old\n')
+    calls = _record_calls(monkeypatch)
+
+    def writer(path):
+        with open(path, 'w') as f:
+            f.write('District_ID,P_01\nA-1,10\n')
+
+    atomic_write(str(target), writer)
+
+    assert target.read_text() == 'District_ID,P_01\nA-1,10\n'
+    kinds = [c[0] for c in calls]
+    assert kinds.count('replace') == 1
+    k = kinds.index('replace')
+    tmp = calls[k][1]
+    assert calls[k][2] == str(target) and calls[k][3] == b'District_ID,P_01\nA-1,10\n'
+    # 先 fsync 临时文件，再 replace，最后 fsync 目录
+    assert ('fsync', tmp) in calls[:k]
+    if os.name != 'nt':
+        assert ('fsync', str(tmp_path)) in calls[k + 1:]
+    assert not os.path.exists(tmp)
+
+
+def test_atomic_write_failure_keeps_old_file(tmp_path):
+    target = tmp_path / 'districts.csv'
+    target.write_text('old\n')
+
+    def writer(path):
+        with open(path, 'w') as f:
+            f.write('half')
+        raise RuntimeError('disk full')
+
+    try:
+        atomic_write(str(target), writer)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('writer 的异常应当抛出')
+    assert target.read_text() == 'old\n'
+    assert os.listdir(tmp_path) == ['districts.csv']
+
+
+def test_atomic_write_not_durable_skips_fsync(tmp_path, monkeypatch):
+    target = tmp_path / 'final_result.svg'
+    calls = _record_calls(monkeypatch)
+    atomic_write(str(target), lambda path: open(path, 'w').close(), durable=False)
+    assert [c[0] for c in calls] == ['replace']
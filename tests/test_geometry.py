@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.geometry import MAX_PRECISION, minify_path, parse_transform, path_bbox, path_commands
+from core.svg_processor import clean_and_extract_ids
+
+
+def test_compact_arc_flags_are_single_characters():
+    # 0110 10 = 大弧标志 0, 扫描标志 1, 终点 (10, 10)
+    assert list(path_commands('M0 0a5 5 0 0110 10')) == [
+        ('M', [0.0, 0.0]), ('A', [5.0, 5.0, 0.0, 0.0, 1.0, 10.0, 10.0])]
+    assert list(path_commands('M0 0A5,5,30,1,0,-3.5.5')) == [
+        ('M', [0.0, 0.0]), ('A', [5.0, 5.0, 30.0, 1.0, 0.0, -3.5, 0.5])]
+
+
+def test_minify_keeps_compact_arcs():
+    minified = minify_path('M 0.004 0 a5 5 0 0110 10 a 5 5 0 1 0 -10 -10 z', 2)
+    assert list(path_commands(minified)) == [
+        ('M', [0.0, 0.0]),
+        ('A', [5.0, 5.0, 0.0, 0.0, 1.0, 10.0, 10.0]),
+        ('A', [5.0, 5.0, 0.0, 1.0, 0.0, 0.0, 0.0]),
+        ('Z', []),
+    ]
+
+
+def test_minify_returns_unparseable_path_unchanged():
+    for d in ('M 0 0 L 10 10 L 20 # 5 Z',   # 无法识别的字符
+              'M 0 0 a5 5 0 2 1 10 10',      # 标志位只能是 0 或 1
+              'M 0 0 L 10',                  # 参数不足
+              '10 10 L 20 20'):              # 没有命令字母
+        assert minify_path(d, 2) == d
+
+
+def test_bbox_stops_at_first_error():
+    # 与浏览器一致：出错之前的部分照常计算
+    assert path_bbox('M 0 0 L 10 5 L 20 # 5 Z') == [0.0, 0.0, 10.0, 5.0]
+
+
+def test_parse_transform():
+    assert parse_transform('translate(10, -2.5) scale(2)') == (2.0, 0.0, 0.0, 2.0, 10.0, -2.5)
+    assert parse_transform('matrix(1 0 0 1 3e1 .5)') == (1.0, 0.0, 0.0, 1.0, 30.0, 0.5)
+
+
+def test_minify_rejects_out_of_range_precision():
+    # 负精度会把量化网格放大到 10，路径被改坏
+    for precision in (-1, MAX_PRECISION + 1, 1.5):
+        with pytest.raises(ValueError):
+            minify_path('M 10.5 20.25 L 30 40 L 50 60', precision)
+    assert list(path_commands(minify_path('M 10.5 20.25 L 30 40', 0))) == [('M', [11.0, 20.0]), ('L', [30.0, 40.0])]
+
+
+def test_clean_rejects_out_of_range_precision(tmp_path):
+    raw = tmp_path / 'raw.svg'
+    raw.write_text('<svg xmlns="http://www.w3.org/2000/svg"><path id="A-1" d="M 10.5 20.25 L 30 40" /></svg>')
+    with pytest.raises(ValueError):
+        clean_and_extract_ids(str(raw), str(tmp_path / 'cleaned.svg'), precision=-1)
+    assert not (tmp_path / 'cleaned.svg').exists()
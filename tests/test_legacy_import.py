@@ -0,0 +1,104 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import generate_legacy_csv
+from core import data_manager
+from core.data_manager import DataManager
+
+# 追加在合成数据后面的行：(内容, 期望的错误或 None)
+EXTRA_ROWS = [
+    ('PR00,D-000003,1,2,3', '选区ID重复'),
+    ('PR01,D-900001,12,abc,7', '第 4 列票数无效: abc'),
+    ('PR01', '列数不足'),
+    (',,5,5,5', '缺少选区ID'),
+    (',,,,', None),                         # 空行直接跳过
+    ('PR02,D-900002,"1,234",12.0,', None),  # 千分位 / 整数小数 / 空格都接受
+    ('PR02,D-900003,-4,1,1', '第 3 列票数无效: -4'),
+    ('PR03,D-900004,9', None),              # 缺少的政党列补 0
+]
+
+
+def _legacy(tmp_path, n=25):
+    path = str(tmp_path / 'legacy.csv')
+    generate_legacy_csv(path, n, 3, 4)
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        for line, _ in EXTRA_ROWS:
+            f.write(line + '\r\n')
+    return path
+
+
+def _tables(dm):
+    result = {}
+    for name in ('parties', 'districts', 'votes'):
+        with open(dm.files[name], 'rb') as f:
+            result[name] = f.read()
+    return result
+
+
+def test_chunked_import_matches_single_chunk(tmp_path, monkeypatch):
+    legacy = _legacy(tmp_path)
+
+    whole = DataManager(str(tmp_path / 'whole'))
+    assert whole.import_from_legacy_v2(legacy)[0]
+
+    monkeypatch.setattr(data_manager, 'IMPORT_CHUNK', 4)
+    progress = []
+    chunked = DataManager(str(tmp_path / 'chunked'))
+    ok, msg = chunked.import_from_legacy_v2(legacy, lambda *args: progress.append(args))
+    assert ok and '跳过 5 行错误数据' in msg
+
+    assert _tables(chunked) == _tables(whole)
+    assert chunked.last_import == whole.last_import
+    # 每 4 行写一批，外加最后一次
+    assert len(progress) == 27 // 4 + 1
+    assert progress[-1][:2] == (os.path.getsize(legacy), os.path.getsize(legacy))
+
+    report = chunked.last_import
+    assert report['rows'] == 27
+    first_extra = 25 + 3    # META + 表头 + 25 行
+    expected = [{'line': first_extra + k, 'error': err}
+                for k, (_, err) in enumerate(EXTRA_ROWS) if err is not None]
+    assert [{'line': e['line'], 'error': e['error']} for e in report['errors']] == expected
+    assert report['error_count'] == len(expected)
+
+    store = chunked._get_store()
+    assert list(store.row(store.index['D-900002'])) == [1234, 12, 0]
+    assert list(store.row(store.index['D-900004'])) == [9, 0, 0]
+    whole.close()
+    chunked.close()
+
+
+def test_failed_or_cancelled_import_leaves_no_tmp_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_manager, 'IMPORT_CHUNK', 4)
+    legacy = _legacy(tmp_path)
+    folder = str(tmp_path / 'data')
+    dm = DataManager(folder)
+    assert dm.import_from_legacy_v2(legacy)[0]
+    before = _tables(dm)
+    listing = sorted(os.listdir(folder))
+
+    class Cancelled(Exception):
+        pass
+
+    def cancel(done, total, rows, errors):
+        if rows >= 8:
+            raise Cancelled()
+
+    with pytest.raises(Cancelled):
+        dm.import_from_legacy_v2(legacy, cancel)
+    assert sorted(os.listdir(folder)) == listing
+    assert _tables(dm) == before
+
+    # 文件中途出现非 UTF-8 字节：导入失败，临时文件清理掉，原数据不变
+    broken = str(tmp_path / 'broken.csv')
+    with open(legacy, 'rb') as src, open(broken, 'wb') as dst:
+        dst.write(src.read() + b'PR09,D-999999,\xff\xfe,1,1\r\n')
+    ok, msg = dm.import_from_legacy_v2(broken)
+    assert not ok and '文件格式错误' in msg
+    assert sorted(os.listdir(folder)) == listing
+    assert _tables(dm) == before
+    dm.close()
@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.render_cache import RenderCache
+
+
+def _put(cache, key, mtime=None):
+    with open(cache.svg_path(key), 'w', encoding='utf-8') as f:
+        f.write(f'<svg id="{key}"/>')
+    cache.put(key, {'status': 'success', 'etag': key})
+    if mtime is not None:
+        os.utime(cache._gz_path(key, 'json'), (mtime, mtime))
+
+
+def test_prune_keeps_new_and_pinned_keys(tmp_path):
+    pinned = {'k0'}
+    cache = RenderCache(str(tmp_path), max_entries=2, pinned=lambda: pinned)
+    now = time.time()
+    for i in range(4):
+        _put(cache, f'k{i}', now - 100 + i)
+    # 刚写入的键即便修改时间最旧也不会被清理
+    _put(cache, 'old', now - 1000)
+    assert cache.has('old') and cache.has('k0')
+    assert sorted(k for k in ('k1', 'k2', 'k3') if cache.has(k)) == ['k3']
+    assert not os.path.exists(cache.svg_path('k1'))
+
+
+def test_touch_keeps_recently_read_key(tmp_path):
+    cache = RenderCache(str(tmp_path), max_entries=2)
+    now = time.time()
+    _put(cache, 'a', now - 30)
+    _put(cache, 'b', now - 20)
+    cache.touch('a')
+    _put(cache, 'c')
+    assert cache.has('a') and cache.has('c') and not cache.has('b')
+    cache.touch('b')   # 已被清理的键：什么都不做
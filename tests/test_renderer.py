@@ -0,0 +1,68 @@
+import io
+import os
+import sys
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import renderer
+
+SVG = '''<svg xmlns="http://www.w3.org/2000/svg" xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" viewBox="0 0 100 100">
+  <g id="空白区"><path id="Z" d="M0 0 L5 5" /></g>
+  <g id="A">
+    <path id="A-1" inkscape:label="一区 &amp; &lt;二&gt;" d="M0 0 L10 10" style="fill:#000" />
+    <path id="A-2" d="M10 10 L20 20" />%s
+  </g>
+  <path id="A" d="M0 0 L20 20" />
+</svg>'''
+
+
+def _canon(data):
+    return [(e.tag, sorted(e.attrib.items()), (e.text or '').strip(), (e.tail or '').strip())
+            for e in ET.fromstring(data).iter()]
+
+
+def _render(tmp_path, data, title, stroke='1.0'):
+    svg_path, out = str(tmp_path / 'cleaned.svg'), str(tmp_path / 'final_result.svg')
+    ok, _ = renderer.render_map_from_data(svg_path, out, data, {'甲': '#ff0000', '乙': '#0000ff'},
+                                          {'甲': 1, '乙': 2}, title, stroke)
+    assert ok
+    buf = io.BytesIO()
+    renderer.get_template(svg_path).tree.write(buf)
+    with open(out, 'rb') as f:
+        assert _canon(f.read()) == _canon(buf.getvalue())
+    return renderer.get_template(svg_path)
+
+
+def _renders(tmp_path):
+    one = {'seats': 1, 'color': '#ff0000', 'rate': 0.5, 'winner_name': '甲'}
+    two = {'seats': 3, 'color': '#0000ff', 'rate': 0.4, 'winner_name': '乙', 'allocation': {'乙': 2, '甲': 1}}
+    _render(tmp_path, {'A-1': one}, '标题 <1>')
+    _render(tmp_path, {'A-1': one, 'A-2': two}, '标题 & 2')
+    _render(tmp_path, {'A-2': dict(two, seats=0)}, '标题 3')
+    return _render(tmp_path, {'A-2': two}, '标题 4', '2.5')
+
+
+def test_incremental_output_matches_full_write(tmp_path):
+    (tmp_path / 'cleaned.svg').write_text(SVG % '', encoding='utf-8')
+    template = _renders(tmp_path)
+    assert template.splittable and template.legend_slot is not None
+    renderer.release_template(str(tmp_path / 'cleaned.svg'))
+
+
+def test_falls_back_when_district_has_children(tmp_path):
+    (tmp_path / 'cleaned.svg').write_text(SVG % '\n    <path id="A-3" d="M1 1 L2 2"><title>三区</title></path>',
+                                          encoding='utf-8')
+    template = _renders(tmp_path)
+    assert not template.splittable
+    renderer.release_template(str(tmp_path / 'cleaned.svg'))
+
+
+def test_legend_uses_color_ramp():
+    from core.color_utils import get_color_ramp, rate_bucket
+    root = ET.fromstring('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"/>')
+    renderer.add_top_legend(root, {'甲': '#3366cc'}, {'甲': 1}, '标题')
+    ramp = get_color_ramp('#3366cc')
+    fills = [rect.get('style').split(';')[0][len('fill:'):] for rect in root.iter('rect')
+             if rect.get('style', '').startswith('fill:') and 'stroke:#FFFFFF' in rect.get('style')]
+    assert fills == [ramp[rate_bucket(r)] for r in (0.3, 0.4, 0.5, 0.6, 0.7, 0.8)]
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.seat_allocation import allocate, method_for
+
+# 教科书例子 (各方法的维基百科条目)
+DIVISOR_VOTES = [100000, 80000, 30000, 20000]
+REMAINDER_VOTES = [47000, 16000, 15800, 12000, 6100, 3100]
+
+
+@pytest.mark.parametrize('method, votes, seats, expected', [
+    ('dhondt', DIVISOR_VOTES, 8, [4, 3, 1, 0]),
+    ('sainte_lague', DIVISOR_VOTES, 8, [3, 3, 1, 1]),
+    ('hare', REMAINDER_VOTES, 10, [5, 2, 1, 1, 1, 0]),
+    ('droop', REMAINDER_VOTES, 10, [5, 2, 2, 1, 0, 0]),
+    ('fptp', DIVISOR_VOTES, 3, [3, 0, 0, 0]),
+])
+def test_textbook_allocations(method, votes, seats, expected):
+    assert allocate(votes, seats, method) == expected
+    assert sum(expected) == seats
+
+
+@pytest.mark.parametrize('method', ['fptp', 'dhondt', 'sainte_lague', 'hare', 'droop'])
+def test_ties_and_zero_votes(method):
+    # 完全并列按列顺序
+    assert allocate([100, 100], 1, method) == [1, 0]
+    # 没有票的政党拿不到席位
+    assert allocate([0, 50, 0], 3, method) == [0, 3, 0]
+    # 无票 / 无席位
+    assert allocate([0, 0, 0], 3, method) == [0, 0, 0]
+    assert allocate([10, 20], 0, method) == [0, 0]
+
+
+def test_tie_breaks():
+    # 除数法：商相同时票数多者优先 (200/2 与 100/1)
+    assert allocate([200, 100], 2, 'dhondt') == [2, 0]
+    # 最大余额法：余数和票数都相同时按列顺序，零票政党余数为 0
+    assert allocate([0, 1, 1], 3, 'hare') == [0, 2, 1]
+
+
+def test_method_aliases():
+    cases = {
+        'FPTP': 'fptp', 'smd': 'fptp', 'WTA': 'fptp',
+        'DHONDT': 'dhondt', "d'hondt": 'dhondt', 'DH': 'dhondt', 'pr': 'dhondt',
+        'SAINTE-LAGUE': 'sainte_lague', 'sainte_lague': 'sainte_lague', ' SL ': 'sainte_lague', 'Webster': 'sainte_lague',
+        'LR': 'hare', 'hare': 'hare', 'LARGEST_REMAINDER': 'hare',
+        'Droop': 'droop',
+        # 未知 / 空类型按赢者通吃
+        'STV': 'fptp', '': 'fptp', None: 'fptp',
+    }
+    for d_type, method in cases.items():
+        assert method_for(d_type) == method, d_type
@@ -0,0 +1,102 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import simulation
+from core.seat_allocation import allocate
+from core.swing_engine import shift_row, swing_matrix, winner_col
+
+
+def _snapshot(n, p, seed=0):
+    rng = random.Random(seed)
+    snap = {'parties': [f'P{j}' for j in range(p)], 'ids': [], 'provinces': [], 'seats': [], 'methods': [],
+            'votes': []}
+    for i in range(n):
+        pr = rng.random() < 0.2
+        snap['ids'].append(f'D-{i}')
+        snap['provinces'].append(f'X{i % 5}')
+        snap['seats'].append(rng.randint(2, 6) if pr else 1)
+        snap['methods'].append('dhondt' if pr else 'fptp')
+        snap['votes'].append([rng.randint(1000, 30000) for _ in range(p)])
+    return snap
+
+
+def test_without_noise_matches_batch_swing_rule():
+    snap = _snapshot(500, 4)
+    for lock_total in (True, False):
+        result = simulation.run_simulation(snap, 1, 0.03, 0.0, 1000, 1, {'X2': -0.04}, lock_total)
+        assert result['iterations'] == 1000
+
+        matrix = [list(r) for r in snap['votes']]
+        swings = [-0.04 if pr == 'X2' else 0.03 for pr in snap['provinces']]
+        swing_matrix(matrix, 1, swings, lock_total)
+        expected = [0] * 4
+        flipped = set()
+        for k, row in enumerate(matrix):
+            for j, n in enumerate(allocate(row, snap['seats'][k], snap['methods'][k])):
+                expected[j] += n
+            if winner_col(row) != winner_col(snap['votes'][k]):
+                flipped.add(snap['ids'][k])
+
+        assert [result['parties'][name]['mean'] for name in snap['parties']] == expected
+        assert set(result['flip_probability']) == flipped
+
+
+def test_without_noise_matches_batch_swing_on_near_ties():
+    # 票数几乎打平、摇摆只有一两票：连续近似与整数取整会给出不同的胜者
+    rng = random.Random(3)
+    snap = {'parties': ['P0', 'P1', 'P2'], 'ids': [], 'provinces': [], 'seats': [], 'methods': [], 'votes': []}
+    for i in range(400):
+        a = rng.randint(500, 520)
+        snap['ids'].append(f'D-{i}')
+        snap['provinces'].append('X')
+        snap['seats'].append(1)
+        snap['methods'].append('fptp')
+        snap['votes'].append([a, a + rng.randint(-3, 3), rng.randint(0, a + 3)])
+    for swing in (-0.003, -0.001, 0.0, 0.0007, 0.001, 0.002, 0.004):
+        for lock_total in (True, False):
+            result = simulation.run_simulation(snap, 1, swing, 0.0, 10, 1, None, lock_total)
+            matrix = [list(r) for r in snap['votes']]
+            swing_matrix(matrix, 1, swing, lock_total)
+            expected = [0, 0, 0]
+            for row in matrix:
+                expected[winner_col(row)] += 1
+            assert [result['parties'][name]['mean'] for name in snap['parties']] == expected
+            assert result['parties']['P1']['histogram'] == {expected[1]: 10}
+
+
+def test_flip_delta_is_integer_threshold():
+    rng = random.Random(4)
+    for _ in range(300):
+        row = [rng.randint(0, 60) for _ in range(rng.randint(2, 5))]
+        if not sum(row):
+            continue
+        t = rng.randrange(len(row))
+        for lock_total in (True, False):
+            d = simulation._flip_delta(row, t, lock_total, rng.uniform(-30, 30))
+            wins = {delta: winner_col(shift_row(row, t, delta, lock_total)) == t
+                    for delta in range(-row[t], sum(row) + 2)}
+            if d is None:
+                assert wins[-row[t]]
+                continue
+            assert wins[d] and not wins[d - 1]
+            # 分摊取整可能让个别票数上的胜负来回跳，但只差在临界点附近的几票
+            assert sum(w != (delta >= d) for delta, w in wins.items()) <= len(row)
+
+
+def test_iterations_are_honored_and_bounded():
+    snap = _snapshot(300, 3)
+    result = simulation.run_simulation(snap, 0, 0.0, 0.05, 777, 3)
+    assert result['iterations'] == 777
+    total_seats = sum(snap['seats'])
+    for name in snap['parties']:
+        stats = result['parties'][name]
+        assert sum(stats['histogram'].values()) == 777
+        assert 0 <= stats['min'] <= stats['p50'] <= stats['max'] <= total_seats
+    for iterations in (0, simulation.MAX_ITERATIONS + 1):
+        with pytest.raises(ValueError):
+            simulation.run_simulation(snap, 0, 0.0, 0.05, iterations, 3)
@@ -0,0 +1,97 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import district_id, generate_legacy_csv
+from core.data_manager import DataManager
+from core.snapshot import MAGIC, load_snapshot, write_snapshot
+from core.vote_store import VoteStore
+
+STAMPS = [(1, 10), (2, 20), (3, 30)]
+
+
+def _columns(store):
+    return (store.parties, store.party_ids, store.party_col, store.index, store.district_ids,
+            store.province_ids, store.names, store.types, list(store.seats), list(store.votes),
+            bytes(store.has_meta), bytes(store.has_votes))
+
+
+def _store():
+    store = VoteStore()
+    store.parties = [{'Party_ID': 'P_01', 'Name_CN': '甲党', 'Color': '#d32f2f', 'Alliance': 'Default'},
+                     {'Party_ID': 'P_02', 'Name_CN': '乙党', 'Color': '#1565c0', 'Alliance': ''}]
+    store.party_ids = ['P_01', 'P_02']
+    store.party_col = {'P_01': 0, 'P_02': 1}
+    for i in range(50):
+        store.add_district(f'D-{i}', f'省{i % 3}', f'第 {i} 区', 'FPTP' if i % 4 else 'DHONDT', i % 5)
+        store.has_meta[i] = 1
+        store.has_votes[i] = i % 7 != 0
+        store.set_row(i, [i * 1000, 2 ** 40 + i])
+    return store
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'workspace.snap')
+    store = _store()
+    write_snapshot(path, store, STAMPS)
+    loaded = load_snapshot(path, STAMPS)
+    assert _columns(loaded) == _columns(store)
+    # 载入的数据可以继续写时复制编辑
+    edited = loaded.copy()
+    edited.seats[3] = 9
+    assert loaded.seats[3] == 3 and edited.seats[3] == 9
+
+    empty = VoteStore()
+    write_snapshot(path, empty, [None, None, None])
+    assert len(load_snapshot(path, [None, None, None])) == 0
+
+
+def test_rejects_stale_truncated_and_foreign_files(tmp_path):
+    path = str(tmp_path / 'workspace.snap')
+    assert load_snapshot(path, STAMPS) is None
+    write_snapshot(path, _store(), STAMPS)
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    # CSV 时间戳对不上 (被外部修改过)
+    assert load_snapshot(path, [(1, 10), (2, 20), (3, 31)]) is None
+    assert load_snapshot(path, [(1, 10), (2, 20), None]) is None
+
+    # 各个位置截断：头部内、段长度内、段内容内
+    for size in (3, len(MAGIC) + 10, len(MAGIC) + 70, len(data) // 2, len(data) - 1):
+        with open(path, 'wb') as f:
+            f.write(data[:size])
+        assert load_snapshot(path, STAMPS) is None, size
+
+    # 魔数不对 (其他文件 / 格式版本不同)
+    with open(path, 'wb') as f:
+        f.write(b'MSSNAP\x02\n' + data[len(MAGIC):])
+    assert load_snapshot(path, STAMPS) is None
+
+    # 头部的选区数与各段长度不一致
+    with open(path, 'wb') as f:
+        f.write(data[:len(MAGIC) + 48] + (51).to_bytes(8, 'little') + data[len(MAGIC) + 56:])
+    assert load_snapshot(path, STAMPS) is None
+
+
+def test_data_manager_ignores_stale_snapshot(tmp_path):
+    legacy = str(tmp_path / 'legacy.csv')
+    generate_legacy_csv(legacy, 20, 3, 2)
+    folder = str(tmp_path / 'data')
+    dm = DataManager(folder)
+    dm.import_from_legacy_v2(legacy)
+    dm.update_district_data(district_id(0), 2, {'P_01': 1})
+    dm.export_csv()     # 写回 CSV 并生成快照
+    dm.close()
+    assert os.path.exists(dm.snapshot_path)
+
+    # 用 Excel 改过 CSV：快照过期，重新解析 CSV
+    with open(dm.files['districts'], 'r', encoding='utf-8-sig') as f:
+        text = f.read()
+    with open(dm.files['districts'], 'w', encoding='utf-8-sig', newline='') as f:
+        f.write(text.replace(f'{district_id(0)},PR00,{district_id(0)},FPTP,2', f'{district_id(0)},PR00,改名,FPTP,5'))
+    reopened = DataManager(folder)
+    info = reopened.get_district_detail(district_id(0))['info']
+    assert (info['Name'], info['Seats']) == ('改名', '5')
+    reopened.close()
@@ -0,0 +1,109 @@
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import spatial_index
+from core.spatial_index import MODES, SpatialIndex, _edges_hit_box, point_in_polygon
+
+
+def _grid(n=12, size=10, gap=1):
+    """n×n 个方格选区，格子之间留缝；另有一个由两个相隔很远的 path 组成的选区"""
+    entries = [(f'C{r:02d}-{c:02d}', (c * size + gap, r * size + gap, (c + 1) * size - gap, (r + 1) * size - gap))
+               for r in range(n) for c in range(n)]
+    entries += [('MULTI', (2, 2 + n * size, 8, 8 + n * size)), ('MULTI', (n * size + 5, 5, n * size + 15, 15))]
+    return entries
+
+
+def _brute_rect(entries, rect, mode):
+    x0, x1 = sorted((rect[0], rect[2]))
+    y0, y1 = sorted((rect[1], rect[3]))
+    hits = set()
+    for d_id, (a, b, c, d) in entries:
+        if mode == 'center':
+            hit = x0 <= (a + c) / 2 <= x1 and y0 <= (b + d) / 2 <= y1
+        elif mode == 'within':
+            hit = x0 <= a and c <= x1 and y0 <= b and d <= y1
+        else:
+            hit = a <= x1 and x0 <= c and b <= y1 and y0 <= d
+        if hit:
+            hits.add(d_id)
+    return sorted(hits)
+
+
+def _brute_polygon(entries, polygon, mode):
+    hits = set()
+    for d_id, box in entries:
+        corners = [point_in_polygon(x, y, polygon) for x, y in ((box[0], box[1]), (box[2], box[1]),
+                                                               (box[2], box[3]), (box[0], box[3]))]
+        if mode == 'center':
+            hit = point_in_polygon((box[0] + box[2]) / 2, (box[1] + box[3]) / 2, polygon)
+        elif mode == 'within':
+            hit = all(corners) and not _edges_hit_box(polygon, box)
+        else:
+            hit = any(corners) or _edges_hit_box(polygon, box)
+        if hit:
+            hits.add(d_id)
+    return sorted(hits)
+
+
+def _star(rng, cx, cy):
+    """随机的星形 (一般是凹) 多边形"""
+    k = rng.randint(3, 9)
+    angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(k))
+    return [(cx + r * math.cos(t), cy + r * math.sin(t)) for t, r in ((t, rng.uniform(5, 60)) for t in angles)]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    # 节点很小，树有好几层
+    monkeypatch.setattr(spatial_index, 'NODE_CAPACITY', 4)
+    return SpatialIndex(_grid())
+
+
+def test_query_rect_matches_brute_force(index):
+    entries = _grid()
+    rng = random.Random(0)
+    for _ in range(100):
+        rect = [rng.uniform(-10, 140) for _ in range(4)]
+        for mode in MODES:
+            assert index.query_rect(rect, mode) == _brute_rect(entries, rect, mode)
+    # 边界恰好落在格子边上时算命中 (闭区间)
+    assert index.query_rect((11, 11, 19, 19), 'within') == ['C01-01']
+    assert index.query_rect((19, 19, 29, 29), 'intersects') == ['C01-01', 'C01-02', 'C02-01', 'C02-02']
+    assert index.query_rect((15, 15, 35, 25), 'center') == ['C01-01', 'C01-02', 'C01-03',
+                                                             'C02-01', 'C02-02', 'C02-03']
+    assert index.query_rect((15, 15, 35, 25), 'within') == []
+    # 多 path 选区：任一 path 命中即选中
+    assert index.query_rect((120, 0, 140, 20), 'within') == ['MULTI']
+
+
+def test_query_polygon_matches_brute_force(index):
+    entries = _grid()
+    rng = random.Random(1)
+    for _ in range(100):
+        polygon = _star(rng, rng.uniform(0, 130), rng.uniform(0, 130))
+        for mode in MODES:
+            assert index.query_polygon(polygon, mode) == _brute_polygon(entries, polygon, mode)
+
+
+def test_query_polygon_concave_shape(index):
+    # L 形：左下 6×3 格加上 3×3 格，凹角处的格子 (3,3) 不在内
+    ell = [(0, 0), (60, 0), (60, 30), (30, 30), (30, 60), (0, 60)]
+    expected = sorted([f'C{r:02d}-{c:02d}' for r in range(3) for c in range(6)] +
+                      [f'C{r:02d}-{c:02d}' for r in range(3, 6) for c in range(3)])
+    for mode in MODES:
+        assert index.query_polygon(ell, mode) == expected
+    # 对角线切过格子：within 只要完全在内的，intersects 包括被切到的
+    tri = [(0, 0), (40, 0), (0, 40)]
+    assert index.query_polygon(tri, 'within') == ['C00-00', 'C00-01', 'C00-02', 'C01-00', 'C01-01', 'C02-00']
+    assert index.query_polygon(tri, 'intersects') == sorted(
+        f'C{r:02d}-{c:02d}' for r in range(4) for c in range(4) if r + c <= 3)
+    with pytest.raises(ValueError):
+        index.query_polygon([(0, 0), (1, 1)])
+    with pytest.raises(ValueError):
+        index.query_rect((0, 0, 1, 1), 'touches')
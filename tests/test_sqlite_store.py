@@ -0,0 +1,96 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import district_id, generate_legacy_csv
+from core.data_manager import DataManager
+from core.sqlite_store import SqliteStore
+from core.vote_store import VoteStore
+
+
+def _columns(store):
+    return {
+        'parties': store.parties,
+        'party_ids': store.party_ids,
+        'district_ids': store.district_ids,
+        'province_ids': store.province_ids,
+        'names': store.names,
+        'types': store.types,
+        'seats': list(store.seats),
+        'has_meta': list(store.has_meta),
+        'has_votes': list(store.has_votes),
+        'votes': list(store.votes),
+    }
+
+
+def _workspace(tmp_path, name, backend, n=30):
+    legacy = str(tmp_path / 'legacy.csv')
+    if not os.path.exists(legacy):
+        generate_legacy_csv(legacy, n, 3, 3)
+    dm = DataManager(str(tmp_path / name), backend=backend)
+    assert dm.import_from_legacy_v2(legacy)[0]
+    return dm
+
+
+def test_save_rows_round_trip(tmp_path):
+    dm = _workspace(tmp_path, 'csv', 'csv')
+    store = VoteStore.from_csv(dm.files)
+    dm.close()
+    db = SqliteStore(str(tmp_path / 'store.sqlite'))
+    db.save_all(store)
+    assert _columns(db.load()) == _columns(store)
+
+    edited = store.copy(structural=True)
+    edited.set_row(2, [7, 8, 9])
+    edited.seats[5] = 3
+    i = edited.add_district('NEW-1', 'PR99', '新选区', 'DHONDT', 4)
+    edited.has_meta[i] = 1
+    edited.has_votes[i] = 1
+    edited.set_row(i, [100, 0, 50])
+    db.save_rows(edited, [2, 5, i])
+    assert _columns(db.load()) == _columns(edited)
+    db.close()
+
+
+def test_data_version_reloads_other_connection(tmp_path):
+    first = _workspace(tmp_path, 'db', 'sqlite')
+    second = DataManager(str(tmp_path / 'db'), backend='sqlite')
+    d_id = district_id(4)
+    assert second.get_district_detail(d_id) == first.get_district_detail(d_id)
+
+    db = SqliteStore(os.path.join(str(tmp_path / 'db'), 'workspace.sqlite'))
+    version = db.data_version()
+    first.update_district_data(d_id, 2, {'P_01': 12345})
+    # 其他连接提交后 data_version 变化，第二个 DataManager 据此重新载入
+    assert db.data_version() != version
+    detail = second.get_district_detail(d_id)
+    assert detail['info']['Seats'] == '2'
+    assert detail == first.get_district_detail(d_id)
+    db.close()
+    first.close()
+    second.close()
+
+
+def test_csv_export_matches_csv_backend(tmp_path):
+    managers = [_workspace(tmp_path, backend, backend) for backend in ('csv', 'sqlite')]
+    for dm in managers:
+        dm.update_district_data(district_id(1), 0, {'P_02': 1})
+        dm.bulk_update_districts([
+            {'district_id': district_id(7), 'seats': 3, 'votes': {'P_03': 777}},
+            {'district_id': 'NEW-1', 'province_id': 'PR99', 'name': '新选区', 'type': 'SAINTE_LAGUE',
+             'seats': 2, 'votes': {'P_01': 10, 'P_02': 20}},
+        ])
+        dm.batch_swing_update([district_id(k) for k in range(10)], 'P_01', 0.03)
+        dm.export_csv()
+
+    exported = []
+    for dm in managers:
+        tables = {}
+        for name in ('parties', 'districts', 'votes'):
+            with open(dm.files[name], 'rb') as f:
+                tables[name] = f.read()
+        exported.append(tables)
+        dm.close()
+    assert exported[0] == exported[1]
+    assert b'NEW-1' in exported[0]['districts']
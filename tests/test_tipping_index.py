@@ -0,0 +1,66 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import tipping_index
+from core.tipping_index import TippingIndex
+from core.vote_store import VoteStore
+
+
+def _store(n, p, rng):
+    store = VoteStore()
+    store.party_ids = [f'P_{k:02d}' for k in range(p)]
+    store.party_col = {pid: k for k, pid in enumerate(store.party_ids)}
+    for i in range(n):
+        d_type = rng.choice(['FPTP', 'FPTP', 'FPTP', 'DHONDT'])
+        store.add_district(f'D-{i}', 'X', None, d_type, rng.choice([0, 1, 1, 2]))
+        store.set_row(i, [rng.randint(0, 1000) for _ in range(p)])
+        store.has_votes[i] = 1
+        store.has_meta[i] = 1
+    return store
+
+
+def test_incremental_updates_match_rebuild(monkeypatch):
+    # 桶很小，编辑过程中会反复拆桶 / 删空桶
+    monkeypatch.setattr(tipping_index, 'BUCKET_LOAD', 4)
+    rng = random.Random(0)
+    store = _store(400, 3, rng)
+    index = TippingIndex(store)
+    for _ in range(200):
+        store = store.copy()
+        i = rng.randrange(len(store))
+        change = rng.random()
+        if change < 0.6:
+            store.set_row(i, [rng.randint(0, 1000) for _ in range(3)])
+        elif change < 0.8:
+            store.seats[i] = rng.choice([0, 1, 3])
+        else:
+            store.types[i] = rng.choice(['FPTP', 'SAINTE_LAGUE'])
+        index.rebase(store, [i])
+
+    fresh = TippingIndex(store)
+    for j in range(3):
+        for swing in (-0.5, -0.02, 0.0, 0.03, 0.5):
+            assert index.seats_at_swing(j, swing) == fresh.seats_at_swing(j, swing)
+            assert index.closest(j, swing, 8) == fresh.closest(j, swing, 8)
+
+
+def test_ties_at_zero_swing_match_joined_data(tmp_path):
+    from benchmarks.synthetic import generate_legacy_csv
+    from core.data_manager import DataManager
+
+    legacy = str(tmp_path / 'legacy.csv')
+    generate_legacy_csv(legacy, 40, 3, 2)
+    dm = DataManager(str(tmp_path / 'data'))
+    dm.import_from_legacy_v2(legacy)
+    # 两党并列、三党并列、并列但不是第一：winner_col 取列号靠前者
+    ties = [(500, 500, 100), (100, 500, 500), (500, 100, 500), (300, 300, 300), (100, 200, 200), (0, 0, 7)]
+    for k, votes in enumerate(ties):
+        dm.update_district_data(f'D-{k:06d}', k % 2 + 1, dict(zip(('P_01', 'P_02', 'P_03'), votes)))
+
+    _, party_colors, party_seats = dm.get_joined_data()
+    for pid, name in zip(('P_01', 'P_02', 'P_03'), party_colors):
+        assert dm.tipping_point(pid, 0.0)['seats'] == party_seats[name]
+    dm.close()
@@ -0,0 +1,62 @@
+import os
+import sys
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import vote_store
+from core.vote_store import ChunkedArray, VoteStore
+
+
+def _small_chunks(monkeypatch, shift=3):
+    monkeypatch.setattr(vote_store, 'CHUNK_SHIFT', shift)
+    monkeypatch.setattr(vote_store, 'CHUNK_SIZE', 1 << shift)
+    monkeypatch.setattr(vote_store, '_CHUNK_MASK', (1 << shift) - 1)
+
+
+def test_chunked_array_matches_array(monkeypatch):
+    _small_chunks(monkeypatch)
+    flat = array('q', range(30))
+    column = ChunkedArray('q', flat)
+    assert len(column) == 30 and list(column) == flat.tolist()
+    assert column[-1] == 29 and column.tobytes() == flat.tobytes()
+    for start, stop in ((0, 30), (3, 6), (6, 11), (5, 25), (29, 40), (12, 12)):
+        assert column[start:stop] == flat[start:stop]
+    column[6:11] = [-1] * 5
+    flat[6:11] = array('q', [-1] * 5)
+    column.append(30)
+    flat.append(30)
+    column.extend(range(31, 40))
+    flat.extend(range(31, 40))
+    assert column.to_array() == flat
+
+
+def test_copy_only_duplicates_written_chunks(monkeypatch):
+    _small_chunks(monkeypatch)
+    old = ChunkedArray('q', range(32))
+    new = old.copy()
+    assert all(a is b for a, b in zip(old.chunks, new.chunks))
+    new[9] = 100
+    new.append(32)
+    assert old[9] == 9 and len(old) == 32
+    assert new[9] == 100 and new[32] == 32
+    # 只有被写的块 (第 1 块) 和新追加的块不再共享
+    assert [a is b for a, b in zip(old.chunks, new.chunks)] == [True, False, True, True]
+    # 原列写入也要先复制，不能改到副本
+    old[0] = -5
+    assert new[0] == 0
+
+
+def test_store_rows_span_chunk_boundaries(monkeypatch):
+    _small_chunks(monkeypatch)
+    store = VoteStore()
+    store.party_ids = ['P_01', 'P_02', 'P_03']
+    store.party_col = {pid: j for j, pid in enumerate(store.party_ids)}
+    for i in range(11):
+        store.add_district(f'D-{i}')
+        store.set_row(i, [i, 10 * i, 100 * i])
+    copy = store.copy()
+    copy.set_row(5, [0, 0, 0])
+    assert [r.tolist() for r in store.rows()] == [[i, 10 * i, 100 * i] for i in range(11)]
+    assert [r.tolist() for r in copy.rows()] == [copy.row(i).tolist() for i in range(11)]
+    assert copy.row(5).tolist() == [0, 0, 0] and store.row(5).tolist() == [5, 50, 500]